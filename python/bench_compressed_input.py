@@ -0,0 +1,92 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from helper import open_input
+from helper import COMPRESSED_OPENERS
+from daily_git_data import get_daily_commit_data
+from synthetic_inputs import generate_class
+from synthetic_inputs import write_commit_log
+
+
+def write_logs(directory, students, seed):
+    """Writes one synthetic commit log uncompressed and in every compressed format
+
+    **Returns**:
+        list: The paths of the written logs, uncompressed first
+
+    """
+    raw_path = os.path.join(directory, "log.txt")
+    with open(raw_path, "w") as log_file:
+        write_commit_log(generate_class(students, seed=seed), log_file)
+    paths = [raw_path]
+    for extension in COMPRESSED_OPENERS:
+        path = raw_path + extension
+        with open(raw_path, "rb") as raw_file:
+            with COMPRESSED_OPENERS[extension](path, "wb") as compressed_file:
+                shutil.copyfileobj(raw_file, compressed_file)
+        paths.append(path)
+    return paths
+
+
+def time_best(function, repeat):
+    """Returns the fastest of **repeat** runs of **function**, in seconds"""
+    best = None
+    for run in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def read_lines(path):
+    """Reads every line of **path** without parsing it"""
+    with open_input(path) as input_file:
+        for line in input_file:
+            pass
+
+
+def parse_log(path):
+    """Parses **path** with get_daily_commit_data"""
+    with open_input(path) as input_file:
+        get_daily_commit_data(input_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--students", type=int, default=2000, help="class size")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per format")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths = write_logs(directory, args.students, args.seed)
+        raw_size = os.path.getsize(paths[0]) / 2 ** 20
+        print(
+            "{:<10} {:>10} {:>12} {:>12} {:>12}".format(
+                "format", "size (MB)", "read MB/s", "parse MB/s", "parse ratio"
+            )
+        )
+        raw_parse = None
+        for path in paths:
+            extension = os.path.splitext(path)[1] if path != paths[0] else "raw"
+            read_time = time_best(lambda: read_lines(path), args.repeat)
+            parse_time = time_best(lambda: parse_log(path), args.repeat)
+            if raw_parse is None:
+                raw_parse = parse_time
+            print(
+                "{:<10} {:>10.2f} {:>12.1f} {:>12.1f} {:>12.2f}".format(
+                    extension,
+                    os.path.getsize(path) / 2 ** 20,
+                    raw_size / read_time,
+                    raw_size / parse_time,
+                    parse_time / raw_parse,
+                )
+            )
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,57 @@
+import os
+import shutil
+import argparse
+import tempfile
+from helper import eprint
+from daily_git_data import get_daily_commit_data
+from fast_daily_git_data import get_daily_commit_data_fast
+from synthetic_inputs import generate_class
+from synthetic_inputs import write_commit_log
+from bench_compressed_input import time_best
+
+
+def parse_log(path, max_change, timeout):
+    """Parses **path** with get_daily_commit_data"""
+    with open(path, "r") as log_file:
+        return get_daily_commit_data(log_file, max_change=max_change, timeout=timeout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--students", type=int, default=5000, help="class size")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per parser")
+    parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+    parser.add_argument("-t", "--timeout", help="time spent timeout")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "log.txt")
+        with open(path, "w") as log_file:
+            write_commit_log(generate_class(args.students, seed=args.seed), log_file)
+        size = os.path.getsize(path) / 2 ** 20
+
+        expected = parse_log(path, args.limit, args.timeout)
+        result = get_daily_commit_data_fast(
+            path, max_change=args.limit, timeout=args.timeout
+        )
+        if result != expected:
+            eprint("Fast parser output differs from get_daily_commit_data")
+
+        text_time = time_best(
+            lambda: parse_log(path, args.limit, args.timeout), args.repeat
+        )
+        fast_time = time_best(
+            lambda: get_daily_commit_data_fast(
+                path, max_change=args.limit, timeout=args.timeout
+            ),
+            args.repeat,
+        )
+        print("log size: {:.2f} MB".format(size))
+        print("get_daily_commit_data: {:.1f} MB/s".format(size / text_time))
+        print("get_daily_commit_data_fast: {:.1f} MB/s".format(size / fast_time))
+        print("speedup: {:.2f}x".format(text_time / fast_time))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,110 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from start_end import commit_data as commit_times
+from daily_git_data import get_daily_commit_data as commit_list
+from test_completion import get_test_completion as test_completion
+from prefetch import prefetch_inputs
+from prefetch import throttled_opener
+from synthetic_inputs import generate_class
+from synthetic_inputs import write_commit_log
+from synthetic_inputs import write_commit_times
+from synthetic_inputs import write_test_scores
+
+
+def write_inputs(directory, students, seed):
+    """Writes a synthetic time file, commit log and test file
+
+    **Returns**:
+        list: The paths of the time file, commit log and test file
+
+    """
+    class_data = generate_class(students, seed=seed)
+    writers = [write_commit_times, write_commit_log, write_test_scores]
+    paths = []
+    for name, write in zip(["time.txt", "log.txt", "visible.txt"], writers):
+        path = os.path.join(directory, name)
+        with open(path, "w") as input_file:
+            write(class_data, input_file)
+        paths.append(path)
+    return paths
+
+
+def parse_inputs(time_file, log_file, test_file):
+    """Parses the inputs of get_statistics.py -p, one after the other"""
+    commit_times(time_file)
+    commit_list(log_file)
+    test_completion(test_file)
+
+
+def sequential(paths, opener):
+    """Opens and parses each input in turn, reading it while parsing it"""
+    inputs = []
+    for path in paths:
+        inputs.append(opener(path))
+    try:
+        parse_inputs(*inputs)
+    finally:
+        for input_file in inputs:
+            input_file.close()
+
+
+def prefetched(paths, opener):
+    """Parses the inputs while reader threads read all of them at once"""
+    readers = prefetch_inputs(paths, opener=opener)
+    try:
+        parse_inputs(*readers)
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+def time_best(function, repeat):
+    """Returns the fastest of **repeat** runs of **function**, in seconds"""
+    best = None
+    for run in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--students", type=int, default=2000, help="class size")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per mode")
+    parser.add_argument(
+        "-L", "--latency", type=float, default=2, help="milliseconds per read"
+    )
+    parser.add_argument(
+        "-b", "--bandwidth", type=float, default=20, help="megabytes per second"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths = write_inputs(directory, args.students, args.seed)
+        size = sum(os.path.getsize(path) for path in paths) / 2 ** 20
+        throttled = throttled_opener(args.latency / 1000, args.bandwidth * 2 ** 20)
+        print("{:.2f} MB of input".format(size))
+        print(
+            "{:<12} {:>12} {:>12} {:>8}".format(
+                "storage", "serial (s)", "prefetch (s)", "gain"
+            )
+        )
+        for storage, opener in (("local", open), ("throttled", throttled)):
+            serial_time = time_best(lambda: sequential(paths, opener), args.repeat)
+            prefetch_time = time_best(lambda: prefetched(paths, opener), args.repeat)
+            print(
+                "{:<12} {:>12.3f} {:>12.3f} {:>7.2f}x".format(
+                    storage, serial_time, prefetch_time, serial_time / prefetch_time
+                )
+            )
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import prefork_shim
+
+# Seconds to wait for the server to start listening
+STARTUP_TIMEOUT = 30
+
+
+def start_server(socket_path, workers, preload, parsed=None):
+    """Starts a prefork server and waits until it listens on **socket_path**
+
+    **Args**:
+        |  **preload** (list): Input files to read ahead
+        |  **parsed** (dict): Input files to parse ahead, by the server option
+        |      taking them, like "--logs"
+
+    """
+    server_path = os.path.join(prefork_shim.SCRIPT_DIR, "prefork_server.py")
+    command = [sys.executable, server_path, "serve", "-s", socket_path]
+    command += ["-w", str(workers)]
+    if preload:
+        command += ["-p"] + preload
+    for option, paths in (parsed or {}).items():
+        if paths:
+            command += [option] + paths
+    server = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while not os.path.exists(socket_path):
+        if server.poll() is not None or time.perf_counter() > deadline:
+            raise RuntimeError("Prefork server did not start")
+        time.sleep(0.05)
+    return server
+
+
+def time_commands(command, calls):
+    """Returns the mean time of running **command** **calls** times, in seconds"""
+    start = time.perf_counter()
+    for call in range(calls):
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / calls
+
+
+def time_requests(script, arguments, socket_path, calls):
+    """Returns the mean time of a request sent without starting a shim, in seconds
+
+    This is the part of a shim call spent outside interpreter startup.
+    """
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        start = time.perf_counter()
+        for call in range(calls):
+            prefork_shim.request(script, arguments, socket_path)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for descriptor in saved + [devnull]:
+            os.close(descriptor)
+    return elapsed / calls
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("script", help="endpoint script, like get_statistics.py")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help="its arguments")
+    parser.add_argument("-n", "--calls", type=int, default=20, help="calls per mode")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="server workers")
+    parser.add_argument(
+        "-p", "--preload", action="append", default=[], help="input file to read ahead"
+    )
+    parser.add_argument(
+        "--logs", action="append", default=[], help="commit log to parse ahead"
+    )
+    parser.add_argument(
+        "--times", action="append", default=[], help="commit time file to parse ahead"
+    )
+    parser.add_argument(
+        "--tests", action="append", default=[], help="test score file to parse ahead"
+    )
+
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    socket_path = os.path.join(directory, "bench.sock")
+    parsed = {"--logs": args.logs, "--times": args.times, "--tests": args.tests}
+    server = start_server(socket_path, args.workers, args.preload, parsed)
+    try:
+        script_path = os.path.join(prefork_shim.SCRIPT_DIR, args.script)
+        shim_path = os.path.join(prefork_shim.SCRIPT_DIR, "prefork_shim.py")
+        os.environ["ENCOURSE_SOCKET"] = socket_path
+        commands = {
+            "script": [script_path] + args.arguments,
+            "shim": [shim_path, args.script] + args.arguments,
+            "interpreter": ["-c", "pass"],
+        }
+        modes = []
+        for mode, command in commands.items():
+            seconds = time_commands([sys.executable] + command, args.calls)
+            modes.append((mode, seconds))
+        seconds = time_requests(args.script, args.arguments, socket_path, args.calls)
+        modes.append(("request", seconds))
+        for mode, seconds in modes:
+            print("{:<12} {:>10.1f} ms".format(mode, seconds * 1000))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory)
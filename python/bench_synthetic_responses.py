@@ -0,0 +1,182 @@
+import io
+import json
+import time
+import random
+import argparse
+from contextlib import redirect_stderr
+import get_add_del
+import get_class_activity
+import get_class_progress
+import get_git_commit_list
+import get_git_commits
+import get_similar_students
+import get_individual_progress
+import get_statistics
+import get_test_summary
+from response_cache import cached_response
+from response_encoding import ENCODINGS
+from synthetic_responses import SyntheticClass
+from synthetic_responses import CLASS_SIZE
+from synthetic_responses import TERM_DAYS
+from synthetic_responses import TEST_COUNT
+
+
+def statistics(synthetic, name):
+    """Formats a synthetic /statistics response, as get_statistics.py -O does"""
+    stats = get_statistics.sum_statistics(synthetic.commit_data([name]))
+    data = get_statistics.combine_statistics(
+        synthetic.commit_times([name]), stats, synthetic.test_scores(names=[name])
+    )
+    return json.dumps(data[name])
+
+
+def commits(synthetic, name):
+    """Formats a synthetic /commitCount response"""
+    return get_git_commits.jsonify(synthetic.commit_data([name])[name])
+
+
+def commit_list(synthetic, name):
+    """Formats a synthetic /commitList response"""
+    return get_git_commit_list.jsonify(synthetic.commit_data([name]))
+
+
+def add_del(synthetic, name):
+    """Formats a synthetic /diffs response"""
+    days = synthetic.commit_data([name])[name]
+    times = synthetic.commit_times([name])[name]
+    return get_add_del.jsonify_data(get_add_del.reformat(days), times)
+
+
+def progress(synthetic, name):
+    """Formats a synthetic /progress response"""
+    days = synthetic.commit_data([name])[name]
+    times = synthetic.commit_times([name])[name]
+    changes = get_individual_progress.extract_changes(days)
+    return json.dumps(get_individual_progress.jsonify(changes, times))
+
+
+def test_summary(synthetic, name):
+    """Formats a synthetic /testSummary response"""
+    visible = get_test_summary.jsonify(synthetic.test_scores(), False)
+    hidden = get_test_summary.jsonify(synthetic.test_scores(hidden=True), True)
+    return get_test_summary.merge_data(visible, hidden)
+
+
+def class_progress(synthetic, name):
+    """Formats a synthetic /classProgress response"""
+    visible = get_class_progress.jsonify(synthetic.test_scores())
+    hidden = get_class_progress.jsonify(synthetic.test_scores(hidden=True))
+    return get_class_progress.merge_data(visible, hidden)
+
+
+def class_activity(synthetic, name):
+    """Formats a synthetic /classActivity response"""
+    matrix = get_class_activity.activity_matrix(synthetic.commit_data())
+    statistics = get_class_activity.activity_statistics(matrix)
+    return get_class_activity.jsonify(matrix, statistics)
+
+
+def similar_students(synthetic, name):
+    """Formats a synthetic /similarStudents response"""
+    collector = get_similar_students.MinHashCollector()
+    synthetic.replay_files(collector)
+    pairs = get_similar_students.similar_pairs(collector)
+    return get_similar_students.jsonify(pairs, collector, "profile", 16)
+
+
+# Response function of each endpoint, taking a SyntheticClass and a student name
+RESPONSES = {
+    "statistics": statistics,
+    "commits": commits,
+    "commit_list": commit_list,
+    "add_del": add_del,
+    "progress": progress,
+    "test_summary": test_summary,
+    "class_progress": class_progress,
+    "class_activity": class_activity,
+    "similar_students": similar_students,
+}
+
+
+def run_requests(synthetic, endpoint, duration, encoding, seed=0):
+    """Serves synthetic requests for random students of the class for **duration**
+
+    Each request is formatted and encoded through cached_response without a cache,
+    like an endpoint script run with -O, but without starting a process.
+
+    **Returns**:
+        (int, int, float): The number of requests, the total size of their encoded
+        responses and the elapsed time in seconds
+
+    """
+    generator = random.Random(seed)
+    names = synthetic.names()
+    response = RESPONSES[endpoint]
+    requests = 0
+    size = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    # get_git_commit_list prints its data to standard error
+    with redirect_stderr(io.StringIO()) as errors:
+        while elapsed < duration:
+            name = generator.choice(names)
+            body, response_etag = cached_response(
+                None,
+                endpoint,
+                [name],
+                [],
+                lambda: response(synthetic, name),
+                None,
+                encoding,
+            )
+            requests += 1
+            size += len(body)
+            errors.seek(0)
+            errors.truncate()
+            elapsed = time.perf_counter() - start
+    return requests, size, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-E",
+        "--endpoint",
+        action="append",
+        choices=list(RESPONSES),
+        help="endpoint to benchmark, repeatable, all if omitted",
+    )
+    parser.add_argument(
+        "-t", "--duration", type=float, default=2.0, help="seconds per endpoint"
+    )
+    parser.add_argument(
+        "-e", "--encoding", choices=list(ENCODINGS), default="json", help="encoding"
+    )
+    parser.add_argument(
+        "-s", "--students", type=int, default=CLASS_SIZE, help="class size"
+    )
+    parser.add_argument(
+        "-d", "--days", type=int, default=TERM_DAYS, help="term length in days"
+    )
+    parser.add_argument(
+        "-T", "--tests", type=int, default=TEST_COUNT, help="visible tests"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+
+    args = parser.parse_args()
+
+    synthetic = SyntheticClass(args.seed, args.students, args.days, args.tests)
+    print(
+        "{:<16} {:>10} {:>14} {:>12}".format(
+            "endpoint", "requests", "requests/s", "mean bytes"
+        )
+    )
+    for endpoint in args.endpoint or list(RESPONSES):
+        requests, size, elapsed = run_requests(
+            synthetic, endpoint, args.duration, args.encoding, args.seed
+        )
+        print(
+            "{:<16} {:>10} {:>14.1f} {:>12.0f}".format(
+                endpoint, requests, requests / elapsed, size / requests
+            )
+        )
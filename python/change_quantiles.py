@@ -0,0 +1,227 @@
+import json
+import argparse
+from bisect import insort
+from helper import eprint
+from helper import date_string
+from helper import open_input
+from daily_git_data import get_daily_commit_data as get_progress
+
+
+class P2Quantile:
+    """Streaming estimate of a single quantile using the P-squared algorithm
+
+    Keeps five markers whose heights track the minimum, the quantile, the maximum
+    and two points in between, so the memory used does not grow with the number
+    of values. See Jain and Chlamtac, "The P-Square Algorithm for Dynamic
+    Calculation of Quantiles and Histograms Without Storing Observations" (1985).
+    """
+
+    def __init__(self, quantile):
+        self.quantile = quantile
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5]
+        self.increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+    def add(self, value):
+        """Adds **value** to the estimate"""
+        self.count += 1
+        heights = self.heights
+        if self.count <= 5:
+            insort(heights, value)
+            return
+        positions = self.positions
+
+        # Find the cell containing the value, extending the extremes if needed
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in range(1, 4):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (
+                offset <= -1 and positions[i - 1] - positions[i] < -1
+            ):
+                step = 1 if offset > 0 else -1
+                height = self.parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (
+                        positions[i + step] - positions[i]
+                    )
+                heights[i] = height
+                positions[i] += step
+
+    def parabolic(self, i, step):
+        """Returns the piecewise-parabolic prediction for marker **i** moved by **step**"""
+        heights = self.heights
+        positions = self.positions
+        return heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+            (positions[i] - positions[i - 1] + step)
+            * (heights[i + 1] - heights[i])
+            / (positions[i + 1] - positions[i])
+            + (positions[i + 1] - positions[i] - step)
+            * (heights[i] - heights[i - 1])
+            / (positions[i] - positions[i - 1])
+        )
+
+    def value(self):
+        """Returns the current estimate, or None if no values were added"""
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self.heights[int(round((self.count - 1) * self.quantile))]
+        return self.heights[2]
+
+
+class OutlierFilter:
+    """Flags file changes above a streaming quantile of the change sizes
+
+    An instance is passed as the **on_file** callback of get_daily_commit_data.
+    The size of a file change is the larger of its additions and deletions, the same
+    quantity compared against ``max_change``. Every size updates a class-wide and a
+    per-student P2Quantile, and a change is an outlier if its size is above the
+    estimate of the chosen scope. Since the estimates are built in the same pass, a
+    change is judged against the sizes seen before it.
+
+    **Args**:
+        |  **quantile** (float): The quantile above which changes are outliers,
+        |      such as 0.99
+        |  **scope** (str): "class" to compare against the class-wide estimate, or
+        |      "student" to compare against the student's own estimate
+        |  **exclude** (bool): If true, outliers are left out of the daily totals,
+        |      otherwise they are only reported
+        |  **min_samples** (int): The number of sizes an estimate needs before it is
+        |      used to judge changes
+    """
+
+    def __init__(self, quantile, scope="class", exclude=True, min_samples=50):
+        self.quantile = quantile
+        self.scope = scope
+        self.exclude = exclude
+        self.min_samples = min_samples
+        self.class_estimate = P2Quantile(quantile)
+        self.student_estimates = {}
+        self.outliers = []
+
+    def __call__(self, name, date, file_path, additions, deletions):
+        size = max(additions, deletions)
+        if name not in self.student_estimates:
+            self.student_estimates[name] = P2Quantile(self.quantile)
+        student_estimate = self.student_estimates[name]
+        estimate = self.class_estimate if self.scope == "class" else student_estimate
+        threshold = estimate.value() if estimate.count >= self.min_samples else None
+        self.class_estimate.add(size)
+        student_estimate.add(size)
+        if threshold is None or size <= threshold:
+            return False
+        self.outliers.append(
+            {
+                "name": name,
+                "date": date_string(date),
+                "file": file_path,
+                "additions": additions,
+                "deletions": deletions,
+                "threshold": threshold,
+            }
+        )
+        return self.exclude
+
+    def report(self):
+        """Reports the outliers and the final quantile estimates
+
+        **Returns**:
+            dict: A dictionary of the following form: ::
+
+                {
+                    "quantile": float,
+                    "scope": "class" or "student",
+                    "excluded": bool,
+                    "class_threshold": float,
+                    "student_thresholds": {"name1": float, ...},
+                    "outliers": [
+                        {
+                            "name": str,
+                            "date": "yyyy-mm-dd",
+                            "file": str,
+                            "additions": int,
+                            "deletions": int,
+                            "threshold": float
+                        },
+                        ...
+                    ]
+                }
+
+        """
+        return {
+            "quantile": self.quantile,
+            "scope": self.scope,
+            "excluded": self.exclude,
+            "class_threshold": self.class_estimate.value(),
+            "student_thresholds": {
+                name: self.student_estimates[name].value()
+                for name in self.student_estimates
+            },
+            "outliers": self.outliers,
+        }
+
+
+def report_outliers(outlier_filter, name):
+    """Prints how many outliers **outlier_filter** found, and those of **name**
+
+    Only the count is printed for the rest of the class, whose outliers are
+    reported in full by running this script on the log.
+
+    **Args**:
+        |  **outlier_filter** (OutlierFilter): The filter the log was parsed with
+        |  **name** (str): The student whose outliers are printed
+
+    """
+    report = outlier_filter.report()
+    eprint(
+        "{} file changes above the {} quantile {}".format(
+            len(report["outliers"]),
+            report["quantile"],
+            "excluded" if report["excluded"] else "flagged",
+        )
+    )
+    eprint(
+        json.dumps(
+            [outlier for outlier in report["outliers"] if outlier["name"] == name]
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logfile", help="path to commit log file")
+    parser.add_argument(
+        "-q", "--quantile", type=float, default=0.99, help="outlier quantile"
+    )
+    parser.add_argument(
+        "-s", "--scope", choices=["class", "student"], default="class", help="scope"
+    )
+    parser.add_argument(
+        "-f", "--flag", action="store_true", help="flag outliers without excluding"
+    )
+    parser.add_argument("-m", "--min-samples", type=int, default=50, help="warm-up")
+
+    args = parser.parse_args()
+
+    outlier_filter = OutlierFilter(
+        args.quantile, args.scope, not args.flag, args.min_samples
+    )
+    get_progress(open_input(args.logfile), on_file=outlier_filter)
+    print(json.dumps(outlier_filter.report()))
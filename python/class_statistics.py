@@ -0,0 +1,189 @@
+import os
+import json
+import heapq
+import argparse
+from bisect import bisect_left
+from bisect import bisect_right
+from helper import open_input
+from daily_git_data import get_daily_commit_data as commit_list
+from test_completion import get_test_completion as test_completion
+
+# Statistics with a class-wide distribution, mapped to their stat_name in get_statistics
+STATISTICS = {
+    "additions": "Additions",
+    "deletions": "Deletions",
+    "commit_count": "Commit Count",
+    "time_spent": "Estimated Time Spent",
+    "test_score": "Current Test Score",
+}
+
+
+def student_values(stats, tests):
+    """Collects the raw value of every statistic for every student
+
+    **Args**:
+        |  **stats** (dict): Cumulative statistics per student, returned by
+        |      get_statistics.sum_statistics
+        |  **tests** (dict): Test scores per student, returned by
+        |      test_completion.get_test_completion
+
+    **Returns**:
+        dict: A dictionary mapping each statistic to a dictionary of students
+        and their values: ::
+
+            {
+                "additions": {"name1": int, ...},
+                ...
+                "test_score": {"name1": float, ...}
+            }
+
+    """
+    values = {key: {} for key in STATISTICS}
+    for student in stats:
+        info = stats[student]
+        for key in ("additions", "deletions", "commit_count", "time_spent"):
+            values[key][student] = info[key]
+    for student in tests:
+        values["test_score"][student] = tests[student]["total"]
+    return values
+
+
+def class_distributions(stats, tests):
+    """Creates a sorted class-wide distribution for every statistic
+
+    The distributions are computed once per class and are then used for every
+    percentile and rank lookup.
+
+    **Returns**:
+        dict: A dictionary mapping each statistic to a sorted list of values: ::
+
+            {
+                "additions": [int, ...],
+                ...
+            }
+
+    """
+    values = student_values(stats, tests)
+    return {key: sorted(values[key].values()) for key in values}
+
+
+def percentile(distribution, value):
+    """Returns the percentage of the class with a value less than or equal to **value**"""
+    if len(distribution) == 0:
+        return 0
+    return bisect_right(distribution, value) * 100 / len(distribution)
+
+
+def rank(distribution, value):
+    """Returns the rank of **value** in **distribution**, where 1 is the largest value
+
+    Students with equal values share the same rank.
+    """
+    return len(distribution) - bisect_right(distribution, value) + 1
+
+
+def count_between(distribution, low, high):
+    """Returns the number of values v in **distribution** with low <= v <= high"""
+    return bisect_right(distribution, high) - bisect_left(distribution, low)
+
+
+def leaderboard(values, n):
+    """Returns the top **n** students by value
+
+    Keeps a min-heap of at most **n** entries, so memory is bounded by **n**
+    rather than the size of the class.
+
+    **Args**:
+        **values** (dict): A dictionary mapping students to a single statistic,
+        as found in the output of student_values
+
+    **Returns**:
+        list: A list of (student, value) tuples, largest value first
+
+    """
+    if n <= 0:
+        return []
+    heap = []
+    for student in values:
+        entry = (values[student], student)
+        if len(heap) < n:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    return [(student, value) for value, student in sorted(heap, reverse=True)]
+
+
+def source_key(paths, *params):
+    """Creates a key identifying the input files and parameters of a distribution"""
+    key = []
+    for path in paths:
+        info = os.stat(path)
+        key.append([os.path.abspath(path), info.st_size, info.st_mtime])
+    key.append([str(param) for param in params])
+    return json.dumps(key)
+
+
+def cached_distributions(cache_path, key, compute):
+    """Returns the distributions stored at **cache_path**, computing them if needed
+
+    **Args**:
+        |  **cache_path** (str): A path to a json file used as the cache
+        |  **key** (str): A key from source_key. The cache is only used if the
+        |      stored key matches.
+        |  **compute** (function): A function taking no arguments that returns the
+        |      output of class_distributions, or other json-compatible class data
+        |      such as the output of student_values
+
+    **Returns**:
+        dict: The output of **compute**
+
+    """
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "r") as cache_file:
+            try:
+                cached = json.load(cache_file)
+            except ValueError:
+                cached = {}
+        if cached.get("key") == key:
+            return cached["distributions"]
+    distributions = compute()
+    if cache_path:
+        temp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+        with open(temp_path, "w") as cache_file:
+            json.dump({"key": key, "distributions": distributions}, cache_file)
+        os.replace(temp_path, cache_path)
+    return distributions
+
+
+if __name__ == "__main__":
+    # Imported here since get_statistics imports this module
+    from get_statistics import sum_statistics
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logfile", help="path to commit log file")
+    parser.add_argument(
+        "statistic", choices=list(STATISTICS), help="statistic to rank by"
+    )
+    parser.add_argument("-n", "--top", type=int, default=10, help="leaderboard size")
+    parser.add_argument("-T", "--testfile", help="path to test score file")
+    parser.add_argument("-t", "--timeout", help="time spent timeout")
+    parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+    parser.add_argument("-c", "--cache", help="path to class values cache file")
+
+    args = parser.parse_args()
+
+    def compute_values():
+        student_data = commit_list(
+            open_input(args.logfile), max_change=args.limit, timeout=args.timeout
+        )
+        test_data = {}
+        if args.testfile:
+            test_data = test_completion(open_input(args.testfile))
+        return student_values(sum_statistics(student_data), test_data)
+
+    # Leaderboards of every statistic share the values, so only the first parses
+    inputs = [args.logfile] + ([args.testfile] if args.testfile else [])
+    key = source_key(inputs, "values", args.limit, args.timeout)
+    values = cached_distributions(args.cache, key, compute_values)
+    top = leaderboard(values[args.statistic], args.top)
+    print(json.dumps([{"name": name, "value": value} for name, value in top]))
@@ -1,11 +1,16 @@
 import json
+from helper import input_file
 
 
-def commit_counts(count_file):
+def commit_counts(count_file, directory=None):
     """Creates a mapping from users to commit counts
 
     Args:
-        count_file (file): A file which contains the commit count associated with each user
+        count_file (file): A file which contains the commit count associated with each user,
+            or a path to a plain, .gz, .bz2 or .xz copy of it
+        directory (StudentDirectory): If given, students are interned into directory
+            and the result is a StudentColumn indexed by their IDs. Duplicate
+            users are then reported by the directory.
 
     Returns:
         dict: A dictionary of mappings from student to commit counts::
@@ -17,7 +22,8 @@ def commit_counts(count_file):
             }
 
     """
-    counts = {}
+    count_file = input_file(count_file)
+    counts = directory.column("commit counts") if directory is not None else {}
     line = count_file.readline()
     line = line.strip("\n").strip(" ")
     while line != "":
@@ -25,10 +31,12 @@ def commit_counts(count_file):
         if len(words) == 2:
             user = words[0]
             count = words[1]
-            if user in counts:
+            if directory is not None:
+                directory.claim(user, "commit counts")
+            elif user in counts:
                 print(
                     "Multiple counts for user {}: ({}, {})".format(
-                        user, user[counts], count
+                        user, counts[user], count
                     )
                 )
             counts[user] = count
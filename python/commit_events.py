@@ -0,0 +1,554 @@
+import os
+import sys
+import json
+import signal
+import socket
+import argparse
+import threading
+import socketserver
+from datetime import datetime
+from datetime import timedelta
+from helper import eprint
+from helper import is_number
+from helper import date_string
+from helper import open_input
+from helper import input_file
+from helper import numstat_words
+from daily_git_data import create_day_dict
+from daily_git_data import select_best
+from sqlite_store import connect
+from sqlite_store import student_id
+from sqlite_store import student_ids
+from sqlite_store import commit_days
+from sqlite_store import start_end_dates
+from sqlite_store import insert_batches
+
+EVENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS event_state (student INTEGER PRIMARY KEY, state TEXT);
+"""
+
+# Seconds between flushes to the store while events are arriving
+FLUSH_INTERVAL = 2.0
+
+# Events received before a flush is started early
+BATCH_SIZE = 1000
+
+
+class StudentAggregate:
+    """The daily commit data of one student, updated one commit at a time
+
+    Holds the same running state as get_daily_commit_data keeps while it reads a
+    student's entry: the finished days, and the totals of the current day. Feeding
+    the commits of an entry in log order gives the same days as parsing it.
+    """
+
+    def __init__(self):
+        self.days = []
+        self.current_date = None
+        self.previous_time = None
+        self.files = {}
+        self.time_spent = 0
+        self.additions = 0
+        self.deletions = 0
+        self.commit_count = 0
+        self.start = None
+        self.end = None
+        self.hashes = set()
+
+    def add_commit(self, timestamp, changes, max_change, timeout_seconds):
+        """Adds a commit made at **timestamp** (datetime) with its file changes
+
+        **Args**:
+            |  **changes** (list): (additions, deletions, file path) tuples
+            |  **max_change** (int): As in get_daily_commit_data
+            |  **timeout_seconds** (float): The timeout, in seconds
+
+        """
+        date = timestamp.date()
+        time = timestamp.time()
+        if self.current_date is None:
+            self.current_date = date
+            self.commit_count += 1
+        elif date != self.current_date:
+            self.days.append(self.current_day())
+            self.current_date = date
+            self.commit_count = 1
+            self.time_spent = 0
+            self.additions = 0
+            self.deletions = 0
+            self.files = {}
+        else:
+            # A day reopened from the store has no time of its last commit
+            if self.previous_time is not None:
+                time_delta = datetime.combine(date, time) - datetime.combine(
+                    self.current_date, self.previous_time
+                )
+                if time_delta.total_seconds() < timeout_seconds:
+                    self.time_spent += time_delta.total_seconds()
+            self.commit_count += 1
+        self.previous_time = time
+
+        day = date_string(date)
+        self.start = day if self.start is None or day < self.start else self.start
+        self.end = day if self.end is None or day > self.end else self.end
+
+        for additions, deletions, file_path in changes:
+            if additions > max_change or deletions > max_change:
+                continue
+            if file_path in self.files:
+                self.files[file_path] += additions - deletions
+            else:
+                self.files[file_path] = additions - deletions
+            self.additions += additions
+            self.deletions += deletions
+
+    def current_day(self):
+        """Returns the day dictionary of the current day, as it stands"""
+        return create_day_dict(
+            self.current_date,
+            select_best(self.files),
+            self.time_spent,
+            self.additions,
+            self.deletions,
+            self.commit_count,
+        )
+
+    def daily_data(self):
+        """Returns the student's days, as returned by get_daily_commit_data"""
+        if self.current_date is None:
+            return list(self.days)
+        return self.days + [self.current_day()]
+
+    def to_state(self):
+        """Returns the running state as a json-compatible dictionary"""
+        return {
+            "days": [
+                dict(day, date=date_string(day["date"]), files=list(day["files"]))
+                for day in self.days
+            ],
+            "current_date": date_string(self.current_date)
+            if self.current_date
+            else None,
+            "previous_time": self.previous_time.isoformat()
+            if self.previous_time
+            else None,
+            "files": self.files,
+            "time_spent": self.time_spent,
+            "additions": self.additions,
+            "deletions": self.deletions,
+            "commit_count": self.commit_count,
+            "start": self.start,
+            "end": self.end,
+            "hashes": sorted(self.hashes),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Restores an aggregate saved with to_state"""
+        aggregate = cls()
+        for day in state["days"]:
+            files = day["files"]
+            # select_best returns a tuple for 3 files or more, and a list otherwise
+            files = tuple(files) if len(files) >= 3 else files
+            date = datetime.strptime(day["date"], "%Y-%m-%d").date()
+            aggregate.days.append(dict(day, date=date, files=files))
+        if state["current_date"]:
+            aggregate.current_date = datetime.strptime(
+                state["current_date"], "%Y-%m-%d"
+            ).date()
+        if state["previous_time"]:
+            aggregate.previous_time = datetime.strptime(
+                state["previous_time"], "%H:%M:%S"
+            ).time()
+        aggregate.files = state["files"]
+        aggregate.time_spent = state["time_spent"]
+        aggregate.additions = state["additions"]
+        aggregate.deletions = state["deletions"]
+        aggregate.commit_count = state["commit_count"]
+        aggregate.start = state["start"]
+        aggregate.end = state["end"]
+        aggregate.hashes = set(state["hashes"])
+        return aggregate
+
+    @classmethod
+    def from_store(cls, connection, name, max_change):
+        """Builds the aggregate of **name** from the data already in the store
+
+        Starts from the daily data and the start and end dates loaded by
+        sqlite_store's ingest, so events add to them instead of replacing them. The
+        last day is reopened, with its file totals summed from the file index, so a
+        commit made later that day is added to it. Its time spent does not count the
+        time up to that commit, since the time of the day's last commit is not kept.
+
+        **Args**:
+            |  **connection** (Connection): An open store
+            |  **max_change** (int): As in get_daily_commit_data
+
+        """
+        aggregate = cls()
+        try:
+            days = commit_days(connection, name)
+        except KeyError:
+            days = []
+        for day in days:
+            files = day["files"]
+            day["files"] = tuple(files) if len(files) >= 3 else files
+        try:
+            aggregate.start, aggregate.end = start_end_dates(connection, name)
+        except KeyError:
+            pass
+        if not days:
+            return aggregate
+        last = days.pop()
+        aggregate.days = days
+        aggregate.current_date = last["date"]
+        aggregate.time_spent = last["time_spent"]
+        aggregate.additions = last["additions"]
+        aggregate.deletions = last["deletions"]
+        aggregate.commit_count = last["commit_count"]
+        rows = connection.execute(
+            "SELECT path, additions, deletions FROM file_changes "
+            "WHERE student = ? AND date = ?",
+            (student_id(connection, name), date_string(last["date"])),
+        )
+        for file_path, additions, deletions in rows:
+            if additions > max_change or deletions > max_change:
+                continue
+            aggregate.files[file_path] = (
+                aggregate.files.get(file_path, 0) + additions - deletions
+            )
+        return aggregate
+
+
+class CommitEventAggregator:
+    """Applies commit events to per-student aggregates and tracks unflushed changes
+
+    An event is a dictionary of the following form: ::
+
+        {
+            "student": "name1",
+            "timestamp": "yyyy-mm-dd hh:mm:ss",
+            "hash": "commit hash",
+            "numstat": ["additions\\tdeletions\\tfile path", ...]
+        }
+
+    A commit whose hash was already applied for the student is ignored, so a hook
+    that retries a delivery does not count the commit twice. Hashes are only known
+    for commits received as events, not for the ones loaded by an ingest.
+
+    A student seen for the first time starts from their data in the store, when
+    **add** is given a connection to it, so events add to an ingested log.
+
+    **Args**:
+        |  **max_change** (int): As in get_daily_commit_data
+        |  **timeout** (float): As in get_daily_commit_data, in hours
+    """
+
+    def __init__(self, max_change=None, timeout=None):
+        self.max_change = int(max_change) if max_change else sys.maxsize
+        self.timeout_seconds = timedelta(hours=float(timeout or 24)).total_seconds()
+        self.students = {}
+        self.dirty = set()
+        self.file_changes = []
+        self.unflushed = 0
+        self.lock = threading.Lock()
+
+    def add(self, event, connection=None):
+        """Applies **event**, returning False if it was a repeated commit
+
+        **Args**:
+            |  **connection** (Connection): The store to start new students from
+
+        """
+        name = event["student"]
+        commit_hash = event.get("hash", "")
+        timestamp = datetime.strptime(event["timestamp"], "%Y-%m-%d %H:%M:%S")
+        changes = []
+        for line in event.get("numstat", []):
+            words = numstat_words(line)
+            if len(words) != 3:
+                eprint("Unknown line format with words {}".format(words))
+                continue
+            additions = int(words[0]) if is_number(words[0]) else 0
+            deletions = int(words[1]) if is_number(words[1]) else 0
+            changes.append((additions, deletions, words[2]))
+
+        with self.lock:
+            aggregate = self.students.get(name)
+            if aggregate is None:
+                if connection is None:
+                    aggregate = StudentAggregate()
+                else:
+                    aggregate = StudentAggregate.from_store(
+                        connection, name, self.max_change
+                    )
+                self.students[name] = aggregate
+            if commit_hash and commit_hash in aggregate.hashes:
+                return False
+            if commit_hash:
+                aggregate.hashes.add(commit_hash)
+            aggregate.add_commit(
+                timestamp, changes, self.max_change, self.timeout_seconds
+            )
+            for additions, deletions, file_path in changes:
+                self.file_changes.append(
+                    (name, timestamp.date(), file_path, additions, deletions)
+                )
+            self.dirty.add(name)
+            self.unflushed += 1
+        return True
+
+    def pending(self):
+        """Returns the number of students with unflushed changes"""
+        return len(self.dirty)
+
+    def daily_commit_data(self):
+        """Returns the daily data of every student, as get_daily_commit_data does"""
+        with self.lock:
+            return {name: self.students[name].daily_data() for name in self.students}
+
+    def load(self, connection):
+        """Restores the aggregates saved in the store by earlier flushes"""
+        connection.executescript(EVENT_SCHEMA)
+        rows = connection.execute(
+            "SELECT name, state FROM event_state "
+            "JOIN students ON students.id = event_state.student"
+        )
+        with self.lock:
+            for name, state in rows:
+                self.students[name] = StudentAggregate.from_state(json.loads(state))
+
+    def flush(self, connection):
+        """Writes the changed students to the store in one transaction
+
+        The daily data and the start and end dates of every changed student are
+        replaced, and the new file changes are appended to the file index. The
+        replacements include the data a student started from, see **add**.
+
+        **Returns**:
+            int: The number of students written
+
+        """
+        with self.lock:
+            names = list(self.dirty)
+            days = {name: self.students[name].daily_data() for name in names}
+            dates = {
+                name: (self.students[name].start, self.students[name].end)
+                for name in names
+            }
+            states = {name: self.students[name].to_state() for name in names}
+            file_changes = self.file_changes
+            self.dirty = set()
+            self.file_changes = []
+            self.unflushed = 0
+        if not names:
+            return 0
+        connection.executescript(EVENT_SCHEMA)
+        with connection:
+            ids = student_ids(connection, names)
+            connection.executemany(
+                "DELETE FROM commit_days WHERE student = ?",
+                [(ids[name],) for name in names],
+            )
+            insert_batches(
+                connection,
+                "INSERT INTO commit_days VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        ids[name],
+                        position,
+                        date_string(day["date"]),
+                        day["additions"],
+                        day["deletions"],
+                        day["commit_count"],
+                        day["time_spent"],
+                        json.dumps(list(day["files"])),
+                    )
+                    for name in names
+                    for position, day in enumerate(days[name])
+                ),
+            )
+            insert_batches(
+                connection,
+                "INSERT INTO file_changes VALUES (?, ?, ?, ?, ?)",
+                (
+                    (ids[name], date_string(day), file_path, additions, deletions)
+                    for name, day, file_path, additions, deletions in file_changes
+                ),
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO start_end VALUES (?, ?, ?)",
+                [(ids[name], dates[name][0], dates[name][1]) for name in names],
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO event_state VALUES (?, ?)",
+                [(ids[name], json.dumps(states[name])) for name in names],
+            )
+        return len(names)
+
+
+def events_from_log(progress_file):
+    """Yields a commit event for every commit in a commit log
+
+    Reads **progress_file** the way get_daily_commit_data does. This is useful for
+    seeding the store from an exported log, or as a stand-in for a git hook.
+    """
+    progress_file = input_file(progress_file)
+    name = ""
+    event = None
+    expect_time = False
+    for line in progress_file:
+        words = numstat_words(line)
+        if words == [""]:
+            expect_time = True
+            continue
+        if words[0] == "Start":
+            if event is not None:
+                yield event
+            event = None
+            expect_time = True
+            name = words[1]
+        elif words[0] == "End":
+            if event is not None:
+                yield event
+            event = None
+        elif expect_time:
+            expect_time = False
+            if event is not None:
+                yield event
+            event = {
+                "student": name,
+                "timestamp": "{} {}".format(words[0], words[1]),
+                "hash": words[2] if len(words) > 2 else "",
+                "numstat": [],
+            }
+        elif event is not None:
+            event["numstat"].append(line)
+    if event is not None:
+        yield event
+
+
+def serve(socket_path, database, max_change=None, timeout=None, flush_interval=None):
+    """Listens on a Unix socket for commit events and flushes them to **database**
+
+    Every connection sends one json event per line and receives one json status
+    line per event. Changes are flushed every **flush_interval** seconds, or as
+    soon as BATCH_SIZE events are waiting, by a single writer thread.
+    """
+    aggregator = CommitEventAggregator(max_change, timeout)
+    connection = connect(database)
+    aggregator.load(connection)
+    connection.close()
+    interval = flush_interval or FLUSH_INTERVAL
+    received = threading.Event()
+    stopped = threading.Event()
+
+    class EventHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            # Read by this handler's thread only, to start new students from
+            store = connect(database)
+            try:
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        added = aggregator.add(json.loads(line), store)
+                        status = {"status": "ok" if added else "duplicate"}
+                    except Exception as error:
+                        # A malformed event must not drop the rest of the connection
+                        eprint("Rejected event {!r}: {!r}".format(line, error))
+                        status = {"status": "error", "error": repr(error)}
+                    self.wfile.write((json.dumps(status) + "\n").encode())
+                    if aggregator.unflushed >= BATCH_SIZE:
+                        received.set()
+            finally:
+                store.close()
+
+    def flush_loop():
+        # sqlite connections belong to the thread that opened them
+        writer = connect(database)
+        while not stopped.is_set():
+            received.wait(interval)
+            received.clear()
+            written = aggregator.flush(writer)
+            if written:
+                eprint("Flushed {} students to {}".format(written, database))
+        aggregator.flush(writer)
+        writer.close()
+
+    flusher = threading.Thread(target=flush_loop)
+    flusher.start()
+    if os.path.exists(socket_path):
+        # Left behind by a listener that did not shut down cleanly
+        os.remove(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, EventHandler)
+    eprint("Listening for commit events on {}".format(socket_path))
+    # Stop cleanly on SIGTERM too, flushing everything received
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+        stopped.set()
+        received.set()
+        flusher.join()
+
+
+def send_events(socket_path, events):
+    """Sends **events** to a listening socket, returning their status dictionaries"""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path)
+    statuses = []
+
+    def send():
+        # Sent from a thread, so replies are read while a large batch is sent
+        for event in events:
+            client.sendall((json.dumps(event) + "\n").encode())
+        client.shutdown(socket.SHUT_WR)
+
+    with client, client.makefile("rb") as replies:
+        sender = threading.Thread(target=send)
+        sender.start()
+        for line in replies:
+            statuses.append(json.loads(line))
+        sender.join()
+    return statuses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    listen_parser = subparsers.add_parser("listen", help="receive commit events")
+    listen_parser.add_argument("socket", help="path to unix socket")
+    listen_parser.add_argument("database", help="path to sqlite database")
+    listen_parser.add_argument("-t", "--timeout", help="time spent timeout")
+    listen_parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+    listen_parser.add_argument(
+        "-i", "--interval", type=float, help="seconds between flushes"
+    )
+    send_parser = subparsers.add_parser("send", help="send commit events")
+    send_parser.add_argument("socket", help="path to unix socket")
+    send_parser.add_argument(
+        "--log", help="send every commit of a commit log, instead of json lines"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "listen":
+        serve(args.socket, args.database, args.limit, args.timeout, args.interval)
+    elif args.command == "send":
+        if args.log:
+            events = list(events_from_log(open_input(args.log)))
+        else:
+            events = [json.loads(line) for line in sys.stdin if line.strip()]
+        statuses = send_events(args.socket, events)
+        summary = {}
+        for status in statuses:
+            summary[status["status"]] = summary.get(status["status"], 0) + 1
+        print(json.dumps(summary))
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -1,5 +1,7 @@
 import sys
 from helper import is_number as is_number
+from helper import input_file
+from helper import preloadable
 from datetime import datetime
 from datetime import timedelta
 
@@ -46,23 +48,77 @@ def select_best(all_files: list):
     return top_files[:3]
 
 
-def get_daily_commit_data(progress_file, max_change=None, timeout=None):
+@preloadable("daily commit data")
+def get_daily_commit_data(
+    progress_file,
+    max_change=None,
+    timeout=None,
+    directory=None,
+    on_file=None,
+    paths=None,
+):
     """ Generates git commit statistics by day
 
     Uses the data in **progress_file** to generate git statistics by day
 
     **Args**:
-        |  **progress_file** (file): The file pointer to a commit log file.
+        The same as iter_daily_commit_data.
+
+    **Returns**:
+        **dict**: A map of students to data, returned from create_day_dict
+        If **directory** is given, the result is a StudentColumn indexed by the
+        students' IDs instead.
+
+    """
+    students = directory.column("commit log") if directory is not None else {}
+    for name, student_data in iter_daily_commit_data(
+        progress_file,
+        max_change,
+        timeout,
+        directory=directory,
+        on_file=on_file,
+        paths=paths,
+    ):
+        students[name] = student_data
+    return students
+
+
+def iter_daily_commit_data(
+    progress_file,
+    max_change=None,
+    timeout=None,
+    directory=None,
+    on_file=None,
+    paths=None,
+):
+    """ Generates git commit statistics by day, one student at a time
+
+    Parses **progress_file** like get_daily_commit_data, but yields each student's
+    data as soon as the student's entry ends, so callers can aggregate or discard
+    it without holding the whole class in memory.
+
+    **Args**:
+        |  **progress_file** (file): The file pointer to a commit log file, or a path
+        |      to a plain, .gz, .bz2 or .xz commit log file.
         |  **max_change** (int): The maximum additions or deletions for which a file 
         |      is counted.
         |  **timeout** (float): The amount of time between commits for which the 
         |      interval will still be added to the estimated time total.
-
-    **Returns**:
-        **dict**: A map of students to data, returned from create_day_dict
-        
+        |  **directory** (StudentDirectory): If given, students are claimed in
+        |      **directory** as their entries start.
+        |  **on_file** (function): If given, called as
+        |      ``on_file(name, date, file_path, additions, deletions)`` for every file
+        |      change in the log, including the ones above **max_change**. If it
+        |      returns True, the change is left out of the daily data.
+        |  **paths** (PathTable): If given, file paths are interned into **paths**,
+        |      so the daily data and **on_file** share one string per path.
+
+    **Yields**:
+        **tuple**: The name of a student and their list of days, each returned from
+        create_day_dict. A student with several entries is yielded once per entry.
 
     """
+    progress_file = input_file(progress_file)
     if not max_change:
         max_change = sys.maxsize
     else:
@@ -79,7 +135,6 @@ def get_daily_commit_data(progress_file, max_change=None, timeout=None):
     daily_additions = 0
     daily_deletions = 0
     daily_commit_count = 0
-    students = {}
     student_data = []
     for line in progress_file:
         # Clean line for parsing
@@ -101,6 +156,8 @@ def get_daily_commit_data(progress_file, max_change=None, timeout=None):
             daily_deletions = 0
             daily_commit_count = 0
             name = words[1]
+            if directory is not None:
+                directory.claim(name, "commit log")
         elif words[0] == "End":  # End of user
             # Add the last day to student's data
             student_data.append(
@@ -114,8 +171,8 @@ def get_daily_commit_data(progress_file, max_change=None, timeout=None):
                 )
             )
 
-            # Set the student's data
-            students[name] = student_data
+            # Hand over the student's data
+            yield name, student_data
         elif expect_time == True:  # New Data/Time/Code tuple
             expect_time = False
             if len(words) != 3:
@@ -168,16 +225,20 @@ def get_daily_commit_data(progress_file, max_change=None, timeout=None):
                 continue
             additions = int(words[0]) if is_number(words[0]) else 0
             deletions = int(words[1]) if is_number(words[1]) else 0
+            file_path = words[2]
+            if paths is not None:
+                file_path = paths.path(paths.intern(file_path))
+            if on_file is not None:
+                if on_file(name, current_date, file_path, additions, deletions):
+                    continue
 
             # Ignores files with more than max_changes lines changes
             if additions > max_change or deletions > max_change:
                 continue
 
-            file_path = words[2]  # Unused
             if file_path in daily_files:
                 daily_files[file_path] += additions - deletions
             else:
                 daily_files[file_path] = additions - deletions
             daily_additions += additions
             daily_deletions += deletions
-    return students
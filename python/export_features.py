@@ -0,0 +1,177 @@
+import sys
+import csv
+import argparse
+from datetime import datetime
+from helper import eprint
+from start_end import commit_data as commit_times
+from daily_git_data import get_daily_commit_data as commit_list
+from test_completion import get_test_completion as test_completion
+from get_statistics import sum_statistics
+from student_directory import StudentDirectory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Type of each fixed column, test result columns are of type "result"
+COLUMN_TYPES = {
+    "name": "str",
+    "start": "date",
+    "end": "date",
+    "additions": "int",
+    "deletions": "int",
+    "commit_count": "int",
+    "time_spent": "float",
+    "visible_total": "float",
+    "hidden_total": "float",
+}
+
+
+def test_names(test_data):
+    """Returns every test name in **test_data**, in the order they first appear"""
+    names = {}
+    for student_id in test_data.student_ids():
+        for test in test_data.at(student_id)["tests"]:
+            names[test] = None
+    return list(names)
+
+
+def feature_table(
+    log_file, time_file, visible_file, hidden_file, max_change=None, timeout=None
+):
+    """Joins the commit times, commit totals and test results of the whole class
+
+    Each input is parsed once, into columns of one StudentDirectory, so the join is
+    by student ID. Every student found in any input gets a row.
+
+    **Returns**:
+        (dict, dict): The columns, mapping column names to lists of values in row
+        order, and the type of each column. The columns are "name", "start" and
+        "end" (dates), "additions", "deletions", "commit_count", "time_spent"
+        (seconds), "visible_total" and "hidden_total" (percentages), then one
+        column per test named "visible_Test1", "hidden_Test1" and so on, holding 1
+        for a pass and 0 for a failure. Missing values are None, except that the
+        commit totals of a student without commits are 0.
+
+    """
+    directory = StudentDirectory()
+    dates = commit_times(time_file, directory=directory)
+    totals = sum_statistics(
+        commit_list(
+            log_file, max_change=max_change, timeout=timeout, directory=directory
+        ),
+        directory=directory,
+    )
+    tests = {
+        "visible": test_completion(visible_file, directory, "visible test scores"),
+        "hidden": test_completion(hidden_file, directory, "hidden test scores"),
+    }
+
+    columns = {column: [] for column in COLUMN_TYPES}
+    types = dict(COLUMN_TYPES)
+    kind_tests = {kind: test_names(tests[kind]) for kind in tests}
+    for kind in tests:
+        for test in kind_tests[kind]:
+            columns["{}_{}".format(kind, test)] = []
+            types["{}_{}".format(kind, test)] = "result"
+
+    for student_id, name in enumerate(directory.names):
+        columns["name"].append(name)
+        start_end = dates.at(student_id)
+        for column, index in (("start", 0), ("end", 1)):
+            value = None
+            # A student whose entry has no end keeps 0 as the end date
+            if start_end is not None and start_end[index]:
+                value = datetime.strptime(start_end[index], "%Y-%m-%d").date()
+            columns[column].append(value)
+        student_totals = totals.at(student_id, {})
+        for column in ("additions", "deletions", "commit_count", "time_spent"):
+            columns[column].append(student_totals.get(column, 0))
+        for kind in tests:
+            student_tests = tests[kind].at(student_id)
+            columns["{}_total".format(kind)].append(
+                student_tests["total"] if student_tests is not None else None
+            )
+            results = student_tests["tests"] if student_tests is not None else {}
+            for test in kind_tests[kind]:
+                result = results.get(test)
+                columns["{}_{}".format(kind, test)].append(
+                    None if result is None else int(result == "P")
+                )
+    return columns, types
+
+
+def write_csv(columns, csv_file):
+    """Writes the columns of feature_table as csv, leaving missing values empty"""
+    writer = csv.writer(csv_file)
+    writer.writerow(list(columns))
+    for row in zip(*columns.values()):
+        writer.writerow(["" if value is None else value for value in row])
+
+
+def write_npz(columns, types, npz_path):
+    """Writes the columns of feature_table to a NumPy .npz file, one array each
+
+    Dates are datetime64[D] with NaT for missing dates, test totals are float64 with
+    NaN for missing totals, and test results are int8 with -1 for missing results.
+    """
+    if numpy is None:
+        raise ImportError("Writing .npz files requires numpy")
+    arrays = {}
+    for column, values in columns.items():
+        kind = types[column]
+        if kind == "str":
+            arrays[column] = numpy.array(values, dtype=str)
+        elif kind == "date":
+            arrays[column] = numpy.array(
+                ["NaT" if value is None else value.isoformat() for value in values],
+                dtype="datetime64[D]",
+            )
+        elif kind == "int":
+            arrays[column] = numpy.array(values, dtype=numpy.int64)
+        elif kind == "float":
+            arrays[column] = numpy.array(
+                [numpy.nan if value is None else value for value in values],
+                dtype=numpy.float64,
+            )
+        else:
+            arrays[column] = numpy.array(
+                [-1 if value is None else value for value in values], dtype=numpy.int8
+            )
+    numpy.savez(npz_path, **arrays)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logfile", help="path to commit log file")
+    parser.add_argument("timefile", help="path to commit time file")
+    parser.add_argument("visible", help="path to visible test score file")
+    parser.add_argument("hidden", help="path to hidden test score file")
+    parser.add_argument("-o", "--output", help="path to csv file, stdout if omitted")
+    parser.add_argument("-n", "--npz", help="path to NumPy .npz file")
+    parser.add_argument("-t", "--timeout", help="time spent timeout")
+    parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+
+    args = parser.parse_args()
+
+    if args.npz and numpy is None:
+        eprint("Writing .npz files requires numpy")
+        sys.exit(1)
+
+    columns, types = feature_table(
+        args.logfile,
+        args.timefile,
+        args.visible,
+        args.hidden,
+        args.limit,
+        args.timeout,
+    )
+    if args.output:
+        with open(args.output, "w", newline="") as csv_file:
+            write_csv(columns, csv_file)
+    else:
+        write_csv(columns, sys.stdout)
+    if args.npz:
+        write_npz(columns, types, args.npz)
+    eprint("Exported {} students".format(len(columns["name"])))
@@ -0,0 +1,159 @@
+import posixpath
+
+# Directory path of the trie's root, the repository itself
+ROOT = "."
+
+
+class PathTable:
+    """Interns file paths into dense integer IDs and a trie of their directories
+
+    Like StudentDirectory, the first path interned gets ID 0, the next new path ID
+    1, and so on. Every path is stored once, so daily data that refers to a path by
+    its interned string shares that string with every other day and student.
+
+    Directories get node IDs of their own, with node 0 for the root. A directory is
+    always added before its subdirectories, so walking the nodes from the last to
+    the first visits every child before its parent.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.paths = []
+        self.path_directories = []
+        self.path_extensions = []
+        self.extensions = {}
+        self.directories = [ROOT]
+        self.parents = [-1]
+        self.depths = [0]
+        self.children = [{}]
+
+    def __len__(self):
+        return len(self.paths)
+
+    def intern(self, path):
+        """Returns the ID of **path**, giving it the next free ID if it is new"""
+        path_id = self.ids.get(path)
+        if path_id is None:
+            path_id = len(self.paths)
+            self.ids[path] = path_id
+            self.paths.append(path)
+            directory, file_name = posixpath.split(path)
+            self.path_directories.append(self.directory_node(directory))
+            extension = posixpath.splitext(file_name)[1]
+            self.path_extensions.append(
+                self.extensions.setdefault(extension, extension)
+            )
+        return path_id
+
+    def path(self, path_id):
+        """Returns the interned string of the path with ID **path_id**"""
+        return self.paths[path_id]
+
+    def directory_node(self, directory):
+        """Returns the trie node of **directory**, adding it and its parents if new"""
+        node = 0
+        if not directory:
+            return node
+        for name in directory.split("/"):
+            child = self.children[node].get(name)
+            if child is None:
+                child = len(self.directories)
+                parent_path = self.directories[node]
+                self.directories.append(
+                    name if node == 0 else "{}/{}".format(parent_path, name)
+                )
+                self.parents.append(node)
+                self.depths.append(self.depths[node] + 1)
+                self.children.append({})
+                self.children[node][name] = child
+            node = child
+        return node
+
+    def rollup(self, path_churn, depth=None):
+        """Totals the churn of each directory, including its subdirectories, and of
+        each extension
+
+        The churn of each path is added to its own directory, then each directory's
+        total is added to its parent's, one pass over the trie from the deepest
+        nodes up.
+
+        **Args**:
+            |  **path_churn** (dict): A dictionary mapping path IDs to lists of
+            |      [additions, deletions]
+            |  **depth** (int): If given, deeper directories are left out of the
+            |      result, although their churn still counts towards their parents
+
+        **Returns**:
+            (dict, dict): Dictionaries mapping directory paths and extensions to
+            [additions, deletions]. The root directory is ".", and paths without an
+            extension have the extension "". Directories without churn are left out.
+
+        """
+        additions = [0] * len(self.directories)
+        deletions = [0] * len(self.directories)
+        extensions = {}
+        for path_id, (path_additions, path_deletions) in path_churn.items():
+            node = self.path_directories[path_id]
+            additions[node] += path_additions
+            deletions[node] += path_deletions
+            totals = extensions.setdefault(self.path_extensions[path_id], [0, 0])
+            totals[0] += path_additions
+            totals[1] += path_deletions
+        for node in range(len(self.directories) - 1, 0, -1):
+            additions[self.parents[node]] += additions[node]
+            deletions[self.parents[node]] += deletions[node]
+
+        directories = {}
+        for node in sorted(
+            range(len(self.directories)), key=self.directories.__getitem__
+        ):
+            if depth is not None and self.depths[node] > depth:
+                continue
+            if additions[node] or deletions[node]:
+                directories[self.directories[node]] = [additions[node], deletions[node]]
+        return directories, extensions
+
+
+class PathChurn:
+    """Totals the additions and deletions of each student's file paths while parsing
+
+    An instance is passed as the **on_file** callback of get_daily_commit_data. It
+    interns every path into **paths** and keeps, per student, the churn of each
+    path ID, so directory and extension totals can be rolled up afterwards without
+    reparsing.
+
+    **Args**:
+        |  **paths** (PathTable): The table to intern paths into
+        |  **max_change** (int): If given, changes above it are ignored, like the
+        |      daily data ignores them
+    """
+
+    def __init__(self, paths, max_change=None):
+        self.paths = paths
+        self.max_change = int(max_change) if max_change else None
+        self.students = {}
+
+    def __call__(self, name, date, file_path, additions, deletions):
+        if self.max_change is not None and (
+            additions > self.max_change or deletions > self.max_change
+        ):
+            return False
+        path_id = self.paths.intern(file_path)
+        student = self.students.setdefault(name, {})
+        churn = student.get(path_id)
+        if churn is None:
+            student[path_id] = [additions, deletions]
+        else:
+            churn[0] += additions
+            churn[1] += deletions
+        return False
+
+    def class_churn(self):
+        """Returns the churn of each path ID summed over every student"""
+        totals = {}
+        for student in self.students.values():
+            for path_id, (additions, deletions) in student.items():
+                churn = totals.setdefault(path_id, [0, 0])
+                churn[0] += additions
+                churn[1] += deletions
+        return totals
@@ -7,8 +7,17 @@ from helper import time_string
 from helper import daterange
 from helper import date_string
 from helper import eprint
+from helper import open_input
 from daily_git_data import get_daily_commit_data as get_progress
 from start_end import commit_data
+from change_quantiles import OutlierFilter
+from change_quantiles import report_outliers
+from response_cache import add_cache_arguments
+from response_cache import respond
+from threshold_index import cached_index
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
 
 
 def reformat(commit_list) -> dict:
@@ -99,26 +108,55 @@ if __name__ == "__main__":
     parser.add_argument("timefile", help="path to commit time file")
     parser.add_argument("name", help="user name")
     parser.add_argument("-l", "--limit", help="ignore file changes above limit")
-    parser.add_argument("-O", "--obfuscate", action="store_true", help="obfuscate flag")
+    parser.add_argument(
+        "-q", "--quantile", type=float, help="ignore file changes above class quantile"
+    )
+    parser.add_argument(
+        "-i", "--index", help="path to threshold index file, unused with --quantile"
+    )
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
 
     args = parser.parse_args()
+    synthetic = synthetic_class(args)
 
-    commit_data_file = open(args.logfile, "r")
-    commit_times_file = open(args.timefile, "r")
-    student_id = args.name
-
-    data = (
-        get_progress(commit_data_file, max_change=int(args.limit))
-        if args.limit
-        else get_progress(commit_data_file)
+    def compute():
+        student_id = args.name
+        if synthetic is not None:
+            data = synthetic.commit_data([student_id])
+            commit_times = synthetic.commit_times([student_id])
+        else:
+            commit_data_file = open_input(args.logfile)
+            commit_times_file = open_input(args.timefile)
+
+            outlier_filter = OutlierFilter(args.quantile) if args.quantile else None
+            if args.index and outlier_filter is None:
+                index = cached_index(args.index, args.logfile)
+                data = {student_id: index.daily_data(student_id, args.limit)}
+            else:
+                data = (
+                    get_progress(
+                        commit_data_file,
+                        max_change=int(args.limit),
+                        on_file=outlier_filter,
+                    )
+                    if args.limit
+                    else get_progress(commit_data_file, on_file=outlier_filter)
+                )
+            if outlier_filter is not None:
+                report_outliers(outlier_filter, args.name)
+            commit_times = commit_data(commit_times_file)
+        individual_data = data[student_id]
+        # print("\n")
+        reformatted_data = reformat(individual_data)
+
+        eprint(commit_times)
+        individual_commit_times = commit_times[student_id]
+
+        api_json = jsonify_data(reformatted_data, individual_commit_times)
+        return api_json
+
+    arguments, inputs = cache_inputs(
+        synthetic, [args.name, args.limit, args.quantile], [args.logfile, args.timefile]
     )
-    individual_data = data[student_id]
-    # print("\n")
-    reformatted_data = reformat(individual_data)
-
-    commit_times = commit_data(commit_times_file)
-    eprint(commit_times)
-    individual_commit_times = commit_times[student_id]
-
-    api_json = jsonify_data(reformatted_data, individual_commit_times)
-    print(api_json)
+    respond(args, "add_del", arguments, inputs, compute)
@@ -0,0 +1,279 @@
+import json
+import argparse
+from datetime import datetime
+from datetime import timedelta
+from helper import date_string
+from fast_daily_git_data import get_daily_commit_data_fast as get_progress
+from response_cache import add_cache_arguments
+from response_cache import respond
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
+
+
+def activity_matrix(commit_data):
+    """Builds a dense students by days activity matrix
+
+    Every student's daily data is placed into a row of the matrix, with one column
+    per day between the earliest and latest commit date of the whole class. Days
+    without any commits are left as 0. A bitmap of active days is also built for
+    each student, where bit ``i`` is set if the student committed on day ``i``.
+
+    **Args**:
+        **commit_data** (dict): A dictionary containing the git commit list: ::
+
+            {
+                "name1": [
+                    {
+                        "date": datetime,
+                        "additions": int,
+                        "deletions": int,
+                        "commit_count": int,
+                    },
+                    ...
+                ],
+                ...
+            }
+
+    **Returns**:
+        dict: A dictionary of the following form: ::
+
+            {
+                "start": date,
+                "students": ["name1", ...],
+                "dates": [date, ...],
+                "commits": [[int, ...], ...],
+                "net_changes": [[int, ...], ...],
+                "bitmaps": [int, ...]
+            }
+
+        where the rows of "commits", "net_changes" and "bitmaps" follow the order
+        of "students"
+
+    """
+    # Students without commits only have a placeholder day at the minimum date
+    first = None
+    last = None
+    for student in commit_data:
+        for day in commit_data[student]:
+            if day["date"] == datetime(1, 1, 1).date():
+                continue
+            if first is None or day["date"] < first:
+                first = day["date"]
+            if last is None or day["date"] > last:
+                last = day["date"]
+    if first is None:
+        return {
+            "start": None,
+            "students": list(commit_data.keys()),
+            "dates": [],
+            "commits": [[] for student in commit_data],
+            "net_changes": [[] for student in commit_data],
+            "bitmaps": [0 for student in commit_data],
+        }
+
+    day_count = (last - first).days + 1
+    students = []
+    commits = []
+    net_changes = []
+    bitmaps = []
+    for student in commit_data:
+        commit_row = [0] * day_count
+        change_row = [0] * day_count
+        bitmap = 0
+        for day in commit_data[student]:
+            if day["date"] == datetime(1, 1, 1).date():
+                continue
+            index = (day["date"] - first).days
+            commit_row[index] += day["commit_count"]
+            change_row[index] += day["additions"] - day["deletions"]
+            if commit_row[index] > 0:
+                bitmap |= 1 << index
+        students.append(student)
+        commits.append(commit_row)
+        net_changes.append(change_row)
+        bitmaps.append(bitmap)
+
+    return {
+        "start": first,
+        "students": students,
+        "dates": [first + timedelta(n) for n in range(day_count)],
+        "commits": commits,
+        "net_changes": net_changes,
+        "bitmaps": bitmaps,
+    }
+
+
+def longest_run(bitmap):
+    """Returns the length of the longest run of set bits in **bitmap**
+
+    Each iteration shortens every run of set bits by one, so the number of
+    iterations is the length of the longest run rather than the number of days.
+    """
+    length = 0
+    while bitmap:
+        bitmap &= bitmap >> 1
+        length += 1
+    return length
+
+
+def longest_gap(bitmap):
+    """Returns the longest run of inactive days between the first and last active day"""
+    if bitmap == 0:
+        return 0
+    # Only the days between the first and last active days count as gaps
+    lowest = (bitmap & -bitmap).bit_length() - 1
+    span = bitmap >> lowest
+    inverted = ~span & ((1 << span.bit_length()) - 1)
+    return longest_run(inverted)
+
+
+def days_inactive(bitmap, index):
+    """Returns the number of days from the last active day up to day **index**
+
+    A student who committed on day **index** has been inactive for 0 days. A student
+    who never committed has been inactive for ``index + 1`` days.
+    """
+    active = bitmap & ((1 << (index + 1)) - 1)
+    return index + 1 - active.bit_length()
+
+
+def activity_statistics(matrix, as_of=None, inactive_days=5):
+    """Computes streak and gap statistics for every student in **matrix**
+
+    **Args**:
+        |  **matrix** (dict): An activity matrix returned by activity_matrix
+        |  **as_of** (date): The date that inactivity is measured up to. Defaults
+        |      to the last date of the matrix.
+        |  **inactive_days** (int): The number of days without commits after which a
+        |      student is reported as inactive
+
+    **Returns**:
+        dict: A dictionary of the following form: ::
+
+            {
+                "streaks": [int, ...],
+                "gaps": [int, ...],
+                "inactive_days": [int, ...],
+                "inactive": ["name1", ...]
+            }
+
+        where the lists of numbers follow the order of the students in **matrix**
+
+    """
+    dates = matrix["dates"]
+    if as_of is None:
+        index = len(dates) - 1
+    else:
+        index = (as_of - matrix["start"]).days if dates else -1
+    streaks = []
+    gaps = []
+    inactivity = []
+    inactive = []
+    for student, bitmap in zip(matrix["students"], matrix["bitmaps"]):
+        streaks.append(longest_run(bitmap))
+        gaps.append(longest_gap(bitmap))
+        if index < 0:
+            # The date precedes all commits, so nobody has been inactive yet
+            days = 0
+        else:
+            days = days_inactive(bitmap, index)
+        inactivity.append(days)
+        if days >= inactive_days:
+            inactive.append(student)
+    return {
+        "streaks": streaks,
+        "gaps": gaps,
+        "inactive_days": inactivity,
+        "inactive": inactive,
+    }
+
+
+def jsonify(matrix, statistics):
+    """Formats data for the /classActivity endpoint
+
+    **Args**:
+        |  **matrix** (dict): An activity matrix returned by activity_matrix
+        |  **statistics** (dict): Statistics returned by activity_statistics
+
+    **Returns**:
+        json: A json dictionary of the following form: ::
+
+            {
+                "dates": ["yyyy-mm-dd", ...],
+                "students": {
+                    "name1": {
+                        "commits": [int, ...],
+                        "net_changes": [int, ...],
+                        "longest_streak": int,
+                        "longest_gap": int,
+                        "days_inactive": int
+                    },
+                    ...
+                },
+                "inactive": ["name1", ...]
+            }
+
+    """
+    students = {}
+    for i, student in enumerate(matrix["students"]):
+        students[student] = {
+            "commits": matrix["commits"][i],
+            "net_changes": matrix["net_changes"][i],
+            "longest_streak": statistics["streaks"][i],
+            "longest_gap": statistics["gaps"][i],
+            "days_inactive": statistics["inactive_days"][i],
+        }
+    data = {
+        "dates": [date_string(date) for date in matrix["dates"]],
+        "students": students,
+        "inactive": statistics["inactive"],
+    }
+    return json.dumps(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logfile", help="path to commit log file")
+    parser.add_argument(
+        "-d", "--date", help="measure inactivity up to date (yyyy-mm-dd)"
+    )
+    parser.add_argument(
+        "-i",
+        "--inactive",
+        type=int,
+        default=5,
+        help="days without commits for inactivity",
+    )
+    parser.add_argument("-t", "--timeout", help="time spent timeout")
+    parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
+
+    args = parser.parse_args()
+    synthetic = synthetic_class(args)
+
+    def compute():
+        as_of = None
+        if args.date:
+            as_of = datetime.strptime(args.date, "%Y-%m-%d").date()
+
+        if synthetic is not None:
+            data = synthetic.commit_data()
+        else:
+            # Parsed from the file's bytes, with the same result as the text parser
+            data = get_progress(
+                args.logfile, max_change=args.limit, timeout=args.timeout
+            )
+        matrix = activity_matrix(data)
+        statistics = activity_statistics(
+            matrix, as_of=as_of, inactive_days=args.inactive
+        )
+
+        api_json = jsonify(matrix, statistics)
+        return api_json
+
+    arguments, inputs = cache_inputs(
+        synthetic, [args.date, args.inactive, args.limit, args.timeout], [args.logfile]
+    )
+    respond(args, "class_activity", arguments, inputs, compute)
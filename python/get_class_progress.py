@@ -7,8 +7,25 @@ from helper import time_string
 from helper import daterange
 from helper import date_string
 from helper import eprint
+from helper import open_input
 from test_completion import get_test_completion as get_test_scores
 from start_end import commit_data
+from response_cache import add_cache_arguments
+from response_cache import respond
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
+
+# Histogram bins of test totals, each with its inclusive upper bound
+HISTOGRAM_BINS = {"0-20%": 20, "20-40%": 40, "40-60%": 60, "60-80%": 80, "80-100%": 100}
+
+
+def histogram_bin(total):
+    """Returns the histogram bin of the test total **total**, a percentage"""
+    for label, bound in HISTOGRAM_BINS.items():
+        if total <= bound:
+            return label
+    return None
 
 
 def jsonify(test_data):
@@ -42,19 +59,11 @@ def jsonify(test_data):
         where each percentage bin contains a value 0 <= int <= 100
 
     """
-    histogram_data = {"0-20%": 0, "20-40%": 0, "40-60%": 0, "60-80%": 0, "80-100%": 0}
+    histogram_data = {label: 0 for label in HISTOGRAM_BINS}
     for student in test_data:
-        info = test_data[student]
-        if info["total"] <= 20:
-            histogram_data["0-20%"] += 1
-        elif info["total"] <= 40:
-            histogram_data["20-40%"] += 1
-        elif info["total"] <= 60:
-            histogram_data["40-60%"] += 1
-        elif info["total"] <= 80:
-            histogram_data["60-80%"] += 1
-        elif info["total"] <= 100:
-            histogram_data["80-100%"] += 1
+        label = histogram_bin(test_data[student]["total"])
+        if label is not None:
+            histogram_data[label] += 1
     return json.dumps(histogram_data)
 
 
@@ -71,17 +80,28 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("visible", help="path to visible test score file")
     parser.add_argument("hidden", help="path to hidden test score file")
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
 
     args = parser.parse_args()
-
-    visible_test_score_file = open(args.visible, "r")
-    hidden_test_score_file = open(args.hidden, "r")
-
-    visible_data = get_test_scores(visible_test_score_file)
-    hidden_data = get_test_scores(hidden_test_score_file)
-    # print(visible_data)
-
-    formatted_visible = jsonify(visible_data)
-    formatted_hidden = jsonify(hidden_data)
-    api_json = merge_data(formatted_visible, formatted_hidden)
-    print(api_json)
+    synthetic = synthetic_class(args)
+
+    def compute():
+        if synthetic is not None:
+            visible_data = synthetic.test_scores()
+            hidden_data = synthetic.test_scores(hidden=True)
+        else:
+            visible_test_score_file = open_input(args.visible)
+            hidden_test_score_file = open_input(args.hidden)
+
+            visible_data = get_test_scores(visible_test_score_file)
+            hidden_data = get_test_scores(hidden_test_score_file)
+        # print(visible_data)
+
+        formatted_visible = jsonify(visible_data)
+        formatted_hidden = jsonify(hidden_data)
+        api_json = merge_data(formatted_visible, formatted_hidden)
+        return api_json
+
+    arguments, inputs = cache_inputs(synthetic, [], [args.visible, args.hidden])
+    respond(args, "class_progress", arguments, inputs, compute)
@@ -1,11 +1,21 @@
 import sys
 import json
-import copy
 import argparse
 from datetime import datetime
 from helper import time_string
 from helper import eprint
+from helper import open_input
 from daily_git_data import get_daily_commit_data as get_progress
+from daily_git_data import iter_daily_commit_data
+from response_cache import add_cache_arguments
+from response_cache import respond
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
+from memory_report import add_memory_arguments
+from memory_report import memory_options
+from memory_report import measure
+from memory_report import report_memory
 
 
 def date_string(date):
@@ -38,13 +48,16 @@ def jsonify(git_data):
         properties are converted to human readable strings
 
     """
-    # Create complete copy. Copy module may be removed in the future
-    data = copy.deepcopy(git_data)
-    for student in data:
-        student_data = data[student]
-        for day in student_data:
+    # Copy only the days, sharing their unchanged values with **git_data**
+    data = {}
+    for student in git_data:
+        student_data = []
+        for day in git_data[student]:
+            day = dict(day)
             day["date"] = date_string(day["date"])
             day["time_spent"] = time_string(day["time_spent"])
+            student_data.append(day)
+        data[student] = student_data
     eprint(data)
     return json.dumps(data)
 
@@ -53,12 +66,36 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("logfile", help="path to commit log file")
     parser.add_argument("name", help="user name")
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
+    add_memory_arguments(parser)
 
     args = parser.parse_args()
+    synthetic = synthetic_class(args)
 
-    student_id = args.name
-    commit_data_file = open(args.logfile, "r")
-    data = get_progress(commit_data_file)
+    def compute():
+        student_id = args.name
+        memory_report, max_bytes = memory_options(args)
 
-    api_json = jsonify(data)[student_id]
-    print(api_json)
+        with measure(memory_report, "commit log"):
+            if synthetic is not None:
+                data = synthetic.commit_data([student_id])
+            elif max_bytes:
+                commit_data_file = open_input(args.logfile)
+                # Keep only the requested student's days while streaming the log
+                data = {}
+                for student, commits in iter_daily_commit_data(commit_data_file):
+                    if student == student_id:
+                        data[student] = commits
+            else:
+                data = get_progress(open_input(args.logfile))
+
+        with measure(memory_report, "jsonify"):
+            api_json = jsonify({student_id: data[student_id]})
+        if memory_report is not None:
+            report_memory(memory_report)
+            memory_report.stop()
+        return api_json
+
+    arguments, inputs = cache_inputs(synthetic, [args.name], [args.logfile])
+    respond(args, "commit_list", arguments, inputs, compute)
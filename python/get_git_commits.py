@@ -6,7 +6,13 @@ from datetime import datetime
 from helper import date_string
 from helper import daterange
 from helper import eprint
+from helper import open_input
 from daily_git_data import get_daily_commit_data as commit_list
+from response_cache import add_cache_arguments
+from response_cache import respond
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
 
 
 def jsonify(commit_data):
@@ -63,14 +69,22 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("logfile", help="path to commit log file")
     parser.add_argument("name", help="user name")
-    parser.add_argument("-O", "--obfuscate", action="store_true", help="obfuscate flag")
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
 
     args = parser.parse_args()
+    synthetic = synthetic_class(args)
 
-    commit_data_file = open(args.logfile, "r")
-    student_id = args.name
+    def compute():
+        student_id = args.name
+        if synthetic is not None:
+            data = synthetic.commit_data([student_id])[student_id]
+        else:
+            commit_data_file = open_input(args.logfile)
+            data = commit_list(commit_data_file)[student_id]
 
-    data = commit_list(commit_data_file)[student_id]
+        formatted_data = jsonify(data)
+        return formatted_data
 
-    formatted_data = jsonify(data)
-    print(formatted_data)
+    arguments, inputs = cache_inputs(synthetic, [args.name], [args.logfile])
+    respond(args, "commits", arguments, inputs, compute)
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import argparse
+from helper import eprint
+from helper import open_input
+from daily_git_data import iter_daily_commit_data
+from test_completion import get_test_completion as get_test_scores
+from groups import read_roster
+from groups import group_views
+from response_cache import add_cache_arguments
+from response_cache import respond
+from response_cache import cache_keys
+from response_cache import response_directory
+from response_cache import atomic_write
+from response_cache import evict
+from response_cache import EXTENSIONS
+from response_cache import DEFAULT_MAX_BYTES
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
+
+
+def jsonify(views, grouping, group=None):
+    """Formats the view of one group, or of every group of a grouping
+
+    **Args**:
+        |  **views** (dict): The output of groups.group_views
+        |  **grouping** (str): The roster column of the view, like "section"
+        |  **group** (str): The group to format, every group if None
+
+    """
+    if group is None:
+        return json.dumps(views[grouping])
+    return json.dumps(views[grouping][group])
+
+
+def cache_views(cache_dir, max_bytes, views, arguments, inputs):
+    """Caches every view of every grouping computed alongside the one requested
+
+    The views of a class are computed together, so after one request every other
+    group's view is answered from the response cache, under the key its own request
+    would have. Views already cached are left alone. The cache is evicted down to
+    **max_bytes** once, after every view is written, rather than once per view.
+
+    **Args**:
+        **arguments** (list): The arguments after the grouping and group, as
+        passed to respond
+
+    """
+    requests = []
+    for grouping in views:
+        requests.append((grouping, None))
+        requests += [(grouping, group) for group in views[grouping]]
+    argument_lists = [[grouping, group] + arguments for grouping, group in requests]
+    keys = cache_keys("group_views", argument_lists, inputs)
+    directory = response_directory(cache_dir)
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for (grouping, group), key in zip(requests, keys):
+        path = os.path.join(directory, key + EXTENSIONS["json"])
+        if not os.path.exists(path):
+            atomic_write(path, jsonify(views, grouping, group).encode())
+            written += 1
+    if written:
+        evict(cache_dir, DEFAULT_MAX_BYTES if max_bytes is None else max_bytes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logfile", help="path to commit log file")
+    parser.add_argument("visible", help="path to visible test score file")
+    parser.add_argument("hidden", help="path to hidden test score file")
+    parser.add_argument("roster", help="path to roster csv file")
+    parser.add_argument("grouping", help="roster column, like section, team or ta")
+    parser.add_argument("group", nargs="?", help="group name, every group if omitted")
+    parser.add_argument("-t", "--timeout", help="time spent timeout")
+    parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
+
+    args = parser.parse_args()
+    synthetic = synthetic_class(args)
+
+    arguments, inputs = cache_inputs(
+        synthetic, [args.limit, args.timeout], [args.logfile, args.visible, args.hidden]
+    )
+    # The roster is read even for synthetic data, which is generated for its names
+    inputs.append(args.roster)
+
+    def compute():
+        roster = read_roster(open_input(args.roster))
+        if args.grouping not in roster:
+            eprint("No grouping {} in roster".format(args.grouping))
+            sys.exit(1)
+        if synthetic is not None:
+            names = sorted({name for members in roster.values() for name in members})
+            student_days = synthetic.commit_data(names).items()
+            visible_data = synthetic.test_scores(names=names)
+            hidden_data = synthetic.test_scores(hidden=True, names=names)
+        else:
+            student_days = iter_daily_commit_data(
+                open_input(args.logfile), max_change=args.limit, timeout=args.timeout
+            )
+            visible_data = get_test_scores(open_input(args.visible))
+            hidden_data = get_test_scores(open_input(args.hidden))
+
+        views = group_views(roster, student_days, visible_data, hidden_data)
+        if args.group is not None and args.group not in views[args.grouping]:
+            eprint("No group {} in {}".format(args.group, args.grouping))
+            sys.exit(1)
+        if args.cache_dir:
+            max_bytes = int(args.cache_size * 2 ** 20) if args.cache_size else None
+            cache_views(args.cache_dir, max_bytes, views, arguments, inputs)
+        api_json = jsonify(views, args.grouping, args.group)
+        return api_json
+
+    respond(
+        args, "group_views", [args.grouping, args.group] + arguments, inputs, compute
+    )
@@ -7,8 +7,16 @@ from helper import time_string
 from helper import daterange
 from helper import date_string
 from helper import eprint
+from helper import open_input
 from daily_git_data import get_daily_commit_data as get_progress
 from start_end import commit_data
+from response_cache import add_cache_arguments
+from response_cache import respond
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
+from surviving_lines import load_lines
+from surviving_lines import save_lines
 
 
 def extract_changes(commit_data):
@@ -105,22 +113,53 @@ if __name__ == "__main__":
     parser.add_argument("logfile", help="path to commit log file")
     parser.add_argument("timefile", help="path to commit time file")
     parser.add_argument("name", help="user name")
-    parser.add_argument("-O", "--obfuscate", action="store_true", help="obfuscate flag")
+    parser.add_argument(
+        "-P", "--patch-log", help="path to patch log, measures surviving lines"
+    )
+    parser.add_argument("--lines-cache", help="path to line ownership cache file")
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
 
     args = parser.parse_args()
-
-    commit_data_file = open(args.logfile, "r")
-    commit_times_file = open(args.timefile, "r")
-    student_id = args.name
-
-    data = get_progress(commit_data_file)
-    individual_data = data[student_id]
-    # print("\n")
-    reformatted_data = extract_changes(individual_data)
-
-    commit_times = commit_data(commit_times_file)
-    individual_commit_times = commit_times[student_id]
-
-    api_formatted_data = jsonify(reformatted_data, individual_commit_times)
-    api_json = json.dumps(api_formatted_data)
-    print(api_json)
+    synthetic = synthetic_class(args)
+
+    def compute():
+        student_id = args.name
+        if synthetic is not None:
+            commit_times = synthetic.commit_times([student_id])
+        else:
+            commit_times = commit_data(open_input(args.timefile))
+        individual_commit_times = commit_times[student_id]
+
+        if args.patch_log and synthetic is None:
+            lines = load_lines(args.lines_cache)
+            applied = lines.add_patch_log(args.patch_log, {student_id})
+            if args.lines_cache and applied:
+                save_lines(args.lines_cache, lines)
+            if student_id in lines.students:
+                ownership = lines.students[student_id]
+                api_json = json.dumps(ownership.progress(individual_commit_times))
+                return api_json
+            eprint(
+                "No patch log entry for {}, counting additions minus deletions".format(
+                    student_id
+                )
+            )
+
+        if synthetic is not None:
+            data = synthetic.commit_data([student_id])
+        else:
+            data = get_progress(open_input(args.logfile))
+        individual_data = data[student_id]
+        # print("\n")
+        reformatted_data = extract_changes(individual_data)
+
+        api_formatted_data = jsonify(reformatted_data, individual_commit_times)
+        api_json = json.dumps(api_formatted_data)
+        return api_json
+
+    inputs = [args.logfile, args.timefile]
+    if args.patch_log:
+        inputs.append(args.patch_log)
+    arguments, inputs = cache_inputs(synthetic, [args.name], inputs)
+    respond(args, "progress", arguments, inputs, compute)
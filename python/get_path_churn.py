@@ -0,0 +1,86 @@
+import json
+import argparse
+from helper import eprint
+from helper import open_input
+from daily_git_data import get_daily_commit_data as get_progress
+from file_paths import PathTable
+from file_paths import PathChurn
+from response_cache import add_cache_arguments
+from response_cache import respond
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
+
+
+def jsonify(directories, extensions):
+    """Formats directory and extension totals for the /pathChurn endpoint
+
+    **Args**:
+        |  **directories**, **extensions** (dict): Totals returned by PathTable.rollup
+
+    **Returns**:
+        json: A json dictionary of the following form: ::
+
+            {
+                "directories": {
+                    ".": {"additions": int, "deletions": int},
+                    "src": {"additions": int, "deletions": int},
+                    ...
+                },
+                "extensions": {
+                    ".c": {"additions": int, "deletions": int},
+                    ...
+                }
+            }
+
+        where each directory includes its subdirectories, "." is the whole
+        repository and "" is the extension of files without one.
+
+    """
+    data = {
+        "directories": {
+            directory: {"additions": additions, "deletions": deletions}
+            for directory, (additions, deletions) in directories.items()
+        },
+        "extensions": {
+            extension: {"additions": additions, "deletions": deletions}
+            for extension, (additions, deletions) in sorted(extensions.items())
+        },
+    }
+    return json.dumps(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logfile", help="path to commit log file")
+    parser.add_argument("name", nargs="?", help="user name, the whole class if omitted")
+    parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+    parser.add_argument("-d", "--depth", type=int, help="deepest directory to report")
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
+
+    args = parser.parse_args()
+    synthetic = synthetic_class(args)
+
+    def compute():
+        paths = PathTable()
+        churn = PathChurn(paths, args.limit)
+        if synthetic is not None:
+            synthetic.replay_files(churn)
+        else:
+            get_progress(open_input(args.logfile), on_file=churn, paths=paths)
+        eprint("Interned {} paths".format(len(paths)))
+
+        if args.name is not None:
+            path_churn = churn.students[args.name]
+        else:
+            path_churn = churn.class_churn()
+        directories, extensions = paths.rollup(path_churn, args.depth)
+
+        api_json = jsonify(directories, extensions)
+        return api_json
+
+    arguments, inputs = cache_inputs(
+        synthetic, [args.name, args.limit, args.depth], [args.logfile]
+    )
+    respond(args, "path_churn", arguments, inputs, compute)
@@ -0,0 +1,331 @@
+import json
+import heapq
+import random
+import hashlib
+import argparse
+from operator import eq
+from itertools import islice
+from helper import eprint
+from helper import open_input
+from daily_git_data import get_daily_commit_data as get_progress
+from response_cache import add_cache_arguments
+from response_cache import respond
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
+
+# Modulus of the hash permutations, a Mersenne prime above every 60 bit hash
+PRIME = 2 ** 61 - 1
+
+
+def feature_hash(feature):
+    """Returns a stable 60 bit hash of the string **feature**
+
+    Python's own str hash changes between runs, which would make signatures from
+    different runs incomparable.
+    """
+    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") >> 4
+
+
+def size_bucket(additions, deletions):
+    """Returns the power of two bucket of a file change's size"""
+    return max(additions, deletions).bit_length()
+
+
+class MinHashCollector:
+    """Builds MinHash signatures of each student's touched files while parsing
+
+    An instance is passed as the **on_file** callback of get_daily_commit_data.
+    Every file change adds two features to the student: the file path to the
+    "files" signature, and the path with the size bucket of the change to the
+    "profile" signature. Each signature keeps, per hash permutation, the minimum
+    hash of the student's features, so the fraction of equal entries in two
+    signatures estimates the Jaccard similarity of the two feature sets.
+
+    The hashes of a feature are computed once for the whole class, and only the
+    first occurrence of a feature per student updates the signature.
+
+    **Args**:
+        |  **permutations** (int): The length of each signature
+        |  **seed** (int): The seed of the hash permutations
+    """
+
+    KINDS = ("files", "profile")
+
+    def __init__(self, permutations=128, seed=0):
+        generator = random.Random(seed)
+        self.permutations = permutations
+        self.parameters = [
+            (generator.randrange(1, PRIME), generator.randrange(0, PRIME))
+            for _ in range(permutations)
+        ]
+        self.hashes = {}
+        self.seen = {}
+        self.signatures = {kind: {} for kind in self.KINDS}
+
+    def feature_hashes(self, feature):
+        """Returns the permuted hashes of **feature**, computing them once"""
+        hashes = self.hashes.get(feature)
+        if hashes is None:
+            value = feature_hash(feature)
+            hashes = [(a * value + b) % PRIME for a, b in self.parameters]
+            self.hashes[feature] = hashes
+        return hashes
+
+    def add(self, kind, name, feature):
+        """Adds **feature** to the **kind** signature of **name**"""
+        seen = self.seen.setdefault(name, set())
+        key = (kind, feature)
+        if key in seen:
+            return
+        seen.add(key)
+        signatures = self.signatures[kind]
+        hashes = self.feature_hashes(feature)
+        if name in signatures:
+            signatures[name] = list(map(min, signatures[name], hashes))
+        else:
+            signatures[name] = list(hashes)
+
+    def __call__(self, name, date, file_path, additions, deletions):
+        self.add("files", name, file_path)
+        profile = "{}:{}".format(file_path, size_bucket(additions, deletions))
+        self.add("profile", name, profile)
+        return False
+
+
+def similarity(signature1, signature2):
+    """Returns the estimated Jaccard similarity of two MinHash signatures"""
+    return sum(map(eq, signature1, signature2)) / len(signature1)
+
+
+def signature_groups(signatures):
+    """Groups the students whose signatures are identical
+
+    Students working from the same starter code often touch exactly the same
+    files. Hashing one signature per group keeps such classes from filling the LSH
+    buckets with pairs that are already known to be identical.
+
+    **Returns**:
+        dict: A dictionary mapping each distinct signature (tuple) to a sorted list of
+        the students with that signature
+
+    """
+    groups = {}
+    for name in signatures:
+        groups.setdefault(tuple(signatures[name]), []).append(name)
+    for names in groups.values():
+        names.sort()
+    return groups
+
+
+def candidate_pairs(signatures, bands, max_bucket=None):
+    """Finds candidate similar pairs with locality sensitive hashing
+
+    Each signature is split into **bands** bands. Students whose signatures agree
+    on every row of at least one band fall into the same bucket of that band and
+    become a candidate pair. Pairs with similarity s become candidates with
+    probability ``1 - (1 - s ** rows) ** bands``, so dissimilar pairs are rarely
+    compared at all. The work is linear in the number of students, plus the number
+    of pairs sharing a bucket.
+
+    **Args**:
+        |  **signatures** (dict): A dictionary mapping students to signatures
+        |  **bands** (int): The number of bands. It must divide the signature length.
+        |  **max_bucket** (int): If given, buckets with more students are skipped,
+        |      so files everyone touches cannot make every pair a candidate
+
+    **Returns**:
+        set: A set of (name1, name2) tuples, with name1 < name2
+
+    """
+    pairs = set()
+    if not signatures:
+        return pairs
+    length = len(next(iter(signatures.values())))
+    if length % bands != 0:
+        raise ValueError("{} bands do not divide {} rows".format(bands, length))
+    rows = length // bands
+    for band in range(bands):
+        buckets = {}
+        start = band * rows
+        for name in signatures:
+            key = tuple(signatures[name][start : start + rows])
+            buckets.setdefault(key, []).append(name)
+        for bucket in buckets.values():
+            if len(bucket) < 2 or (max_bucket and len(bucket) > max_bucket):
+                continue
+            bucket.sort()
+            for i in range(len(bucket)):
+                for j in range(i + 1, len(bucket)):
+                    pairs.add((bucket[i], bucket[j]))
+    return pairs
+
+
+def group_pair_names(members1, members2, limit):
+    """Returns up to **limit** pairs of students from two groups, in name order
+
+    **Args**:
+        |  **members1**, **members2** (list): The sorted students of the two groups.
+        |      If they are the same list, the pairs within the group are returned.
+
+    """
+    if members1 is members2:
+        pairs = (
+            (members1[i], members1[j])
+            for i in range(len(members1))
+            for j in range(i + 1, len(members1))
+        )
+        return list(islice(pairs, limit))
+    pairs = ((min(a, b), max(a, b)) for a in members1 for b in members2)
+    return heapq.nsmallest(limit, pairs)
+
+
+def similar_pairs(
+    collector, by="profile", bands=16, threshold=0.7, top=20, max_bucket=None
+):
+    """Ranks the most similar pairs of students
+
+    Students with identical **by** signatures are grouped, and candidate pairs of
+    groups come from LSH over one signature per group, so neither identical nor
+    dissimilar students are compared pair by pair. Pairs of groups are visited from
+    the most to the least similar until **top** pairs are found. Ties are ordered
+    by name.
+
+    **Args**:
+        |  **collector** (MinHashCollector): A collector that was passed to the parser
+        |  **by** (str): The signature to rank by, "files" or "profile"
+        |  **bands** (int): The number of LSH bands
+        |  **threshold** (float): The minimum estimated similarity of a pair
+        |  **top** (int): The number of pairs to return
+        |  **max_bucket** (int): As in candidate_pairs
+
+    **Returns**:
+        list: A list of (files similarity, profile similarity, name1, name2) tuples,
+        most similar first
+
+    """
+    groups = signature_groups(collector.signatures[by])
+    representatives = {names[0]: signature for signature, names in groups.items()}
+    members = {names[0]: names for names in groups.values()}
+
+    group_pairs = [(1.0, name, name) for name in members if len(members[name]) > 1]
+    for name1, name2 in candidate_pairs(representatives, bands, max_bucket):
+        estimate = similarity(representatives[name1], representatives[name2])
+        if estimate >= threshold:
+            group_pairs.append((estimate, name1, name2))
+    group_pairs.sort(reverse=True)
+
+    found = []
+    for index, (estimate, group1, group2) in enumerate(group_pairs):
+        if len(found) >= top and estimate < group_pairs[index - 1][0]:
+            break
+        for name1, name2 in group_pair_names(members[group1], members[group2], top):
+            found.append((-estimate, name1, name2))
+    found.sort()
+
+    files = collector.signatures["files"]
+    profiles = collector.signatures["profile"]
+    return [
+        (
+            similarity(files[name1], files[name2]),
+            similarity(profiles[name1], profiles[name2]),
+            name1,
+            name2,
+        )
+        for estimate, name1, name2 in found[:top]
+    ]
+
+
+def jsonify(pairs, collector, by, bands):
+    """Formats data for the /similarStudents endpoint
+
+    **Returns**:
+        json: A json dictionary of the following form: ::
+
+            {
+                "students": int,
+                "permutations": int,
+                "by": "files" or "profile",
+                "bands": int,
+                "pairs": [
+                    {
+                        "students": ["name1", "name2"],
+                        "files_similarity": float,
+                        "profile_similarity": float
+                    },
+                    ...
+                ]
+            }
+
+    """
+    data = {
+        "students": len(collector.signatures["files"]),
+        "permutations": collector.permutations,
+        "by": by,
+        "bands": bands,
+        "pairs": [
+            {
+                "students": [name1, name2],
+                "files_similarity": round(file_similarity, 4),
+                "profile_similarity": round(profile_similarity, 4),
+            }
+            for file_similarity, profile_similarity, name1, name2 in pairs
+        ],
+    }
+    return json.dumps(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logfile", help="path to commit log file")
+    parser.add_argument("-n", "--top", type=int, default=20, help="pairs to report")
+    parser.add_argument(
+        "-p", "--permutations", type=int, default=128, help="signature length"
+    )
+    parser.add_argument(
+        "-B",
+        "--by",
+        choices=["files", "profile"],
+        default="profile",
+        help="signature to rank pairs by",
+    )
+    parser.add_argument("-b", "--bands", type=int, default=16, help="LSH bands")
+    parser.add_argument(
+        "-s", "--threshold", type=float, default=0.7, help="minimum similarity"
+    )
+    parser.add_argument(
+        "-m", "--max-bucket", type=int, help="skip LSH buckets with more students"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="hash permutation seed")
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
+
+    args = parser.parse_args()
+    synthetic = synthetic_class(args)
+
+    def compute():
+        collector = MinHashCollector(args.permutations, args.seed)
+        if synthetic is not None:
+            synthetic.replay_files(collector)
+        else:
+            get_progress(open_input(args.logfile), on_file=collector)
+        pairs = similar_pairs(
+            collector, args.by, args.bands, args.threshold, args.top, args.max_bucket
+        )
+        eprint("Found {} similar pairs".format(len(pairs)))
+
+        api_json = jsonify(pairs, collector, args.by, args.bands)
+        return api_json
+
+    arguments = [
+        args.top,
+        args.permutations,
+        args.by,
+        args.bands,
+        args.threshold,
+        args.max_bucket,
+        args.seed,
+    ]
+    arguments, inputs = cache_inputs(synthetic, arguments, [args.logfile])
+    respond(args, "similar_students", arguments, inputs, compute)
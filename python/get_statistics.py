@@ -1,14 +1,38 @@
 import sys
 import json
 import argparse
-import random
 from datetime import datetime
 from helper import time_string
+from helper import ordinal
 from helper import eprint
+from helper import open_input
 from start_end import commit_data as commit_times
 from daily_git_data import get_daily_commit_data as commit_list
+from daily_git_data import iter_daily_commit_data
 from test_completion import get_test_completion as test_completion
 from test_completion import get_test_completion_string as test_completion_string
+from class_statistics import STATISTICS
+from class_statistics import class_distributions
+from class_statistics import cached_distributions
+from class_statistics import source_key
+from class_statistics import percentile
+from class_statistics import rank
+from student_directory import StudentDirectory
+from student_directory import join_students
+from change_quantiles import OutlierFilter
+from change_quantiles import report_outliers
+from response_cache import add_cache_arguments
+from response_cache import respond
+from memory_report import SpillingDict
+from memory_report import add_memory_arguments
+from memory_report import memory_options
+from memory_report import measure
+from memory_report import report_memory
+from threshold_index import cached_index
+from prefetch import prefetch_inputs
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
 
 
 def combine_statistics(dates, stats, tests):
@@ -60,23 +84,21 @@ def combine_statistics(dates, stats, tests):
     """
 
     data = {}
-    for user in dates.keys():
-        user_dates = dates[user]
+    # Joins by student ID when the inputs were parsed with a StudentDirectory
+    for user, user_dates, info, test_info in join_students(dates, stats, tests):
         additions = 0
         deletions = 0
         count = 0
         time = 0
-        if user in stats:
-            info = stats[user]
+        if info is not None:
             additions = info["additions"]
             deletions = info["deletions"]
             count = info["commit_count"]
             time = info["time_spent"]
         test_score = 0
         # This if else is dumb, fix it. strings and files should both be handled gracefully
-        if user in tests:
-            info = tests[user]
-            test_score = info["total"]
+        if test_info is not None:
+            test_score = test_info["total"]
         elif "total" in tests:
             test_score = tests["total"]
         user_data = {}
@@ -98,6 +120,60 @@ def combine_statistics(dates, stats, tests):
     return data
 
 
+def rank_statistics(user, stats, tests, distributions):
+    """Creates percentile and rank statistics for **user**
+
+    Places the user's values from **stats** and **tests** within the class-wide
+    **distributions**, using a binary search per statistic.
+
+    **Args**:
+        |  **user** (str): The name of the user
+        |  **stats** (dict): Cumulative statistics per student, returned by sum_statistics
+        |  **tests** (dict): The user's test data, or test data per student
+        |  **distributions** (dict): Class distributions, returned by
+        |      class_statistics.class_distributions
+
+    **Returns**
+        list: A list of statistics of the form: ::
+
+            {
+                "stat_name": str,
+                "stat_value": str,
+            }
+
+    """
+    values = {}
+    if user in stats:
+        for key in ("additions", "deletions", "commit_count", "time_spent"):
+            values[key] = stats[user][key]
+    if user in tests:
+        values["test_score"] = tests[user]["total"]
+    elif "total" in tests:
+        values["test_score"] = tests["total"]
+
+    array_data = []
+    for key in STATISTICS:
+        distribution = distributions[key]
+        if key not in values or len(distribution) == 0:
+            continue
+        stat_name = STATISTICS[key]
+        user_percentile = int(percentile(distribution, values[key]))
+        user_rank = rank(distribution, values[key])
+        array_data.append(
+            {
+                "stat_name": "{} Percentile".format(stat_name),
+                "stat_value": "{} percentile".format(ordinal(user_percentile)),
+            }
+        )
+        array_data.append(
+            {
+                "stat_name": "{} Rank".format(stat_name),
+                "stat_value": "{} of {}".format(user_rank, len(distribution)),
+            }
+        )
+    return array_data
+
+
 def format_date(date):
     """Converts a git date string to the iso format date string"""
 
@@ -105,7 +181,7 @@ def format_date(date):
     return date_data.date().isoformat()
 
 
-def sum_statistics(commit_data):
+def sum_statistics(commit_data, directory=None):
     """Converts data per student per commit into cumulative statistics per student
 
     **Args**:
@@ -138,9 +214,12 @@ def sum_statistics(commit_data):
                 }
                 ...
             }
+
+        If **directory** is given, the result is a StudentColumn of **directory**
+        instead of a dictionary.
         
     """
-    new_data = {}
+    new_data = directory.column("statistics") if directory is not None else {}
     for student in commit_data:
         commits = commit_data[student]
         total_add = 0
@@ -170,66 +249,159 @@ if __name__ == "__main__":
     parser.add_argument("tests", help="test case string")
     parser.add_argument("-t", "--timeout", help="time spent timeout")
     parser.add_argument("-l", "--limit", help="ignore file changes above limit")
-    parser.add_argument("-O", "--obfuscate", action="store_true", help="obfuscate flag")
+    parser.add_argument(
+        "-q", "--quantile", type=float, help="ignore file changes above class quantile"
+    )
+    parser.add_argument(
+        "-p",
+        "--percentiles",
+        action="store_true",
+        help="add class percentiles and ranks",
+    )
+    parser.add_argument("-T", "--testfile", help="path to class test score file")
+    parser.add_argument("-c", "--cache", help="path to class distribution cache file")
+    parser.add_argument(
+        "-i", "--index", help="path to threshold index file, unused with --quantile"
+    )
+    parser.add_argument(
+        "-P",
+        "--prefetch",
+        action="store_true",
+        help="read every input file at once on reader threads while parsing",
+    )
+    add_cache_arguments(parser)
+    add_memory_arguments(parser)
+    add_synthetic_arguments(parser)
 
     args = parser.parse_args()
-
-    if args.obfuscate:
-        fake_data = [
-            {
-                "stat_name": "Start Date",
-                "stat_value": "2018-08-0{}".format(random.randint(1, 9)),
-            },
-            {
-                "stat_name": "End Date",
-                "stat_value": "2018-09-0{}".format(random.randint(1, 9)),
-            },
-            {
-                "stat_name": "Additions",
-                "stat_value": "{} lines".format(random.randint(2000, 5000)),
-            },
-            {
-                "stat_name": "Deletions",
-                "stat_value": "{} lines".format(random.randint(0, 2000)),
-            },
-            {
-                "stat_name": "Commit Count",
-                "stat_value": "{} commits".format(random.randint(0, 200)),
-            },
-            {
-                "stat_name": "Estimated Time Spent",
-                "stat_value": "{} hours".format(random.randint(0, 36)),
-            },
-            {
-                "stat_name": "Current Test Score",
-                "stat_value": "{}%".format(10 * random.randint(0, 10)),
-            },
-        ]
-        print(json.dumps(fake_data))
-        sys.exit()
+    synthetic = synthetic_class(args)
 
     student_id = args.name
-    commit_date_file = open(args.timefile, "r")
-    commit_data_file = open(args.logfile, "r")
     test_case_string = args.tests
 
-    dates_dict = commit_times(commit_date_file)
-    # for user in dates_dict.keys():
-    #    start_end = dates_dict[user]
-    #    print("{} -> {}".format(user, start_end))
+    def synthetic_statistics():
+        # Only the requested student is generated, unless the class is ranked
+        names = None if args.percentiles else [student_id]
+        formatted_student_data = sum_statistics(synthetic.commit_data(names))
+        test_data = synthetic.test_scores(names=[student_id])
+        data = combine_statistics(
+            synthetic.commit_times([student_id]), formatted_student_data, test_data
+        )
+        if args.percentiles:
+            distributions = class_distributions(
+                formatted_student_data, synthetic.test_scores()
+            )
+            data[student_id] += rank_statistics(
+                student_id, formatted_student_data, test_data, distributions
+            )
+        return json.dumps(data[student_id])
 
-    # print(counts_dict)
+    def compute():
+        if synthetic is not None:
+            return synthetic_statistics()
+        memory_report, max_bytes = memory_options(args)
+        class_test_file = None
+        if args.prefetch:
+            # Start reading every input before parsing the first
+            paths = [args.timefile, args.logfile]
+            if args.percentiles and args.testfile:
+                paths.append(args.testfile)
+            readers = prefetch_inputs(paths)
+            commit_date_file, commit_data_file = readers[:2]
+            if len(readers) > 2:
+                class_test_file = readers[2]
+        else:
+            commit_date_file = open_input(args.timefile)
+            commit_data_file = open_input(args.logfile)
 
-    student_data = commit_list(
-        commit_data_file, max_change=args.limit, timeout=args.timeout
-    )
-    formatted_student_data = sum_statistics(student_data)
-    # TODO: check for valid dicts
+        directory = StudentDirectory()
+        with measure(memory_report, "commit times"):
+            dates_dict = commit_times(commit_date_file, directory=directory)
+        # for user in dates_dict.keys():
+        #    start_end = dates_dict[user]
+        #    print("{} -> {}".format(user, start_end))
+
+        # print(counts_dict)
+
+        outlier_filter = OutlierFilter(args.quantile) if args.quantile else None
+        with measure(memory_report, "commit log"):
+            if args.index and outlier_filter is None:
+                index = cached_index(args.index, args.logfile)
+                formatted_student_data = index.statistics(args.limit, args.timeout)
+            elif max_bytes:
+                # Sum each student as their entry ends, spilling over the budget
+                formatted_student_data = SpillingDict(max_bytes)
+                for student, commits in iter_daily_commit_data(
+                    commit_data_file,
+                    max_change=args.limit,
+                    timeout=args.timeout,
+                    directory=directory,
+                    on_file=outlier_filter,
+                ):
+                    formatted_student_data[student] = sum_statistics(
+                        {student: commits}
+                    )[student]
+            else:
+                student_data = commit_list(
+                    commit_data_file,
+                    max_change=args.limit,
+                    timeout=args.timeout,
+                    directory=directory,
+                    on_file=outlier_filter,
+                )
+                formatted_student_data = sum_statistics(
+                    student_data, directory=directory
+                )
+        if outlier_filter is not None:
+            report_outliers(outlier_filter, args.name)
+        # TODO: check for valid dicts
+
+        test_data = test_completion_string(test_case_string)
+
+        with measure(memory_report, "combine"):
+            data = combine_statistics(dates_dict, formatted_student_data, test_data)
+        # print(data)
+        if args.percentiles:
+            inputs = [args.logfile] + ([args.testfile] if args.testfile else [])
+            key = source_key(inputs, args.limit, args.timeout, args.quantile)
+
+            def compute_distributions():
+                class_tests = {}
+                if class_test_file is not None:
+                    class_tests = test_completion(class_test_file)
+                elif args.testfile:
+                    class_tests = test_completion(open_input(args.testfile))
+                return class_distributions(formatted_student_data, class_tests)
 
-    test_data = test_completion_string(test_case_string)
+            with measure(memory_report, "percentiles"):
+                distributions = cached_distributions(
+                    args.cache, key, compute_distributions
+                )
+                data[student_id] += rank_statistics(
+                    student_id, formatted_student_data, test_data, distributions
+                )
+        if isinstance(formatted_student_data, SpillingDict):
+            formatted_student_data.close()
+        if args.prefetch:
+            # Readers of unused inputs, like the log with --index, stop reading ahead
+            for reader in readers:
+                reader.close()
+        if memory_report is not None:
+            report_memory(memory_report)
+            memory_report.stop()
+        return json.dumps(data[student_id])
 
-    data = combine_statistics(dates_dict, formatted_student_data, test_data)
-    # print(data)
-    json = json.dumps(data[student_id])
+    inputs = [args.logfile, args.timefile]
+    if args.percentiles and args.testfile:
+        inputs.append(args.testfile)
+    arguments = [
+        student_id,
+        test_case_string,
+        args.limit,
+        args.timeout,
+        args.percentiles,
+        args.quantile,
+    ]
+    arguments, inputs = cache_inputs(synthetic, arguments, inputs)
     # Outputs json to stdout
-    print(json)
+    respond(args, "statistics", arguments, inputs, compute)
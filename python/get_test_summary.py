@@ -7,8 +7,14 @@ from helper import time_string
 from helper import daterange
 from helper import date_string
 from helper import eprint
+from helper import open_input
 from test_completion import get_test_completion as get_test_scores
 from start_end import commit_data
+from response_cache import add_cache_arguments
+from response_cache import respond
+from synthetic_responses import add_synthetic_arguments
+from synthetic_responses import synthetic_class
+from synthetic_responses import cache_inputs
 
 
 def jsonify(test_data, hidden):
@@ -94,17 +100,27 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("visible", help="path to visible test score file")
     parser.add_argument("hidden", help="path to hidden test score file")
-    parser.add_argument("-O", "--obfuscate", action="store_true", help="obfuscate flag")
+    add_cache_arguments(parser)
+    add_synthetic_arguments(parser)
 
     args = parser.parse_args()
+    synthetic = synthetic_class(args)
 
-    visible_test_score_file = open(args.visible, "r")
-    hidden_test_score_file = open(args.hidden, "r")
+    def compute():
+        if synthetic is not None:
+            visible_data = synthetic.test_scores()
+            hidden_data = synthetic.test_scores(hidden=True)
+        else:
+            visible_test_score_file = open_input(args.visible)
+            hidden_test_score_file = open_input(args.hidden)
 
-    visible_data = get_test_scores(visible_test_score_file)
-    hidden_data = get_test_scores(hidden_test_score_file)
+            visible_data = get_test_scores(visible_test_score_file)
+            hidden_data = get_test_scores(hidden_test_score_file)
 
-    formatted_visible = jsonify(visible_data, False)
-    formatted_hidden = jsonify(hidden_data, True)
-    api_json = merge_data(formatted_visible, formatted_hidden)
-    print(api_json)
+        formatted_visible = jsonify(visible_data, False)
+        formatted_hidden = jsonify(hidden_data, True)
+        api_json = merge_data(formatted_visible, formatted_hidden)
+        return api_json
+
+    arguments, inputs = cache_inputs(synthetic, [], [args.visible, args.hidden])
+    respond(args, "test_summary", arguments, inputs, compute)
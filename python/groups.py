@@ -0,0 +1,198 @@
+import csv
+from helper import eprint
+from helper import input_file
+from helper import date_string
+from get_class_progress import histogram_bin
+from get_class_progress import HISTOGRAM_BINS
+
+# Roster column naming the student of each row, every other column is a grouping
+STUDENT_COLUMN = "student"
+
+# Daily data summed into each group's statistics and daily series
+TOTALS = ("additions", "deletions", "commit_count", "time_spent")
+
+
+def read_roster(roster_file):
+    """Reads a roster mapping students to their groups
+
+    **Args**:
+        **roster_file** (file): A csv file, or a path to a plain, .gz, .bz2 or .xz
+        csv file, with a header row. The student column names each student and
+        every other column is a grouping, like a lab section, project team or TA.
+        The following is a sample of one of these files: ::
+
+            student,section,team,ta
+            name1,L01,team3,ta1
+            name2,L02,team3,ta2
+
+        A student without a group in a grouping, an empty cell, is left out of
+        that grouping.
+
+    **Returns**:
+        dict: A dictionary mapping each grouping to a dictionary of students and
+        their groups: ::
+
+            {
+                "section": {"name1": "L01", "name2": "L02"},
+                ...
+            }
+
+    """
+    reader = csv.DictReader(input_file(roster_file))
+    if reader.fieldnames is None or STUDENT_COLUMN not in reader.fieldnames:
+        raise ValueError("Roster has no {} column".format(STUDENT_COLUMN))
+    groupings = [name for name in reader.fieldnames if name != STUDENT_COLUMN]
+    roster = {grouping: {} for grouping in groupings}
+    students = set()
+    for row in reader:
+        student = row[STUDENT_COLUMN].strip()
+        if not student:
+            continue
+        if student in students:
+            eprint("Multiple entries for user {} in roster".format(student))
+        students.add(student)
+        for grouping in groupings:
+            group = (row[grouping] or "").strip()
+            if group:
+                roster[grouping][student] = group
+    return roster
+
+
+def empty_view():
+    """Creates the view of a group without members"""
+    return {
+        "members": 0,
+        "statistics": {total: 0 for total in TOTALS},
+        "test_scores": {"visible": [0, 0], "hidden": [0, 0]},
+        "histogram": {label: 0 for label in HISTOGRAM_BINS},
+        "daily": {},
+    }
+
+
+def group_views(roster, student_days, visible, hidden):
+    """Aggregates the daily data and test results of every group of every grouping
+
+    The daily data is read once for all groupings, each student's days being added
+    to the totals and daily series of each of their groups in turn. A student with
+    several entries in the log is counted by their last one, like
+    get_daily_commit_data does.
+
+    **Args**:
+        |  **roster** (dict): The output of read_roster
+        |  **student_days** (iterable): (name, days) tuples of daily data, as yielded
+        |      by iter_daily_commit_data
+        |  **visible** (dict): Visible test results, from get_test_completion
+        |  **hidden** (dict): Hidden test results, from get_test_completion
+
+    **Returns**:
+        dict: A dictionary mapping every grouping to its groups and every group to
+        its view, of the following form: ::
+
+            {
+                "section": {
+                    "group1": {
+                        "members": int,
+                        "statistics": {
+                            "additions": int,
+                            "deletions": int,
+                            "commit_count": int,
+                            "time_spent": float (seconds),
+                            "mean_visible_score": float (percentage),
+                            "mean_hidden_score": float (percentage)
+                        },
+                        "histogram": {"0-20%": int, ...},
+                        "daily": [
+                            {
+                                "date": "yyyy-mm-dd",
+                                "additions": int,
+                                "deletions": int,
+                                "commit_count": int,
+                                "time_spent": float (seconds),
+                                "progress": int
+                            },
+                            ...
+                        ]
+                    },
+                    ...
+                },
+                ...
+            }
+
+        The histogram counts visible and hidden test totals like /classProgress,
+        and the progress of each day is the group's cumulative additions minus
+        deletions, as a percentage of the final total like /progress.
+
+    """
+    views = {grouping: {} for grouping in roster}
+    student_views = {}
+    for grouping, members in roster.items():
+        for student, group in members.items():
+            view = views[grouping].get(group)
+            if view is None:
+                view = views[grouping][group] = empty_view()
+            student_views.setdefault(student, []).append(view)
+
+    for student, student_view_list in student_views.items():
+        for kind, tests in (("visible", visible), ("hidden", hidden)):
+            info = tests.get(student)
+            if info is None:
+                continue
+            label = histogram_bin(info["total"])
+            for view in student_view_list:
+                view["test_scores"][kind][0] += info["total"]
+                view["test_scores"][kind][1] += 1
+                if label is not None:
+                    view["histogram"][label] += 1
+        for view in student_view_list:
+            view["members"] += 1
+
+    last_days = {}
+    for student, days in student_days:
+        if student in last_days:
+            eprint("Multiple entries for user {} in commit log".format(student))
+        last_days[student] = days
+
+    unlisted = 0
+    for student, days in last_days.items():
+        student_view_list = student_views.get(student)
+        if student_view_list is None:
+            unlisted += 1
+            continue
+        for day in days:
+            # Students without commits have a single day without commits
+            if day["commit_count"] == 0:
+                continue
+            for view in student_view_list:
+                totals = view["daily"].get(day["date"])
+                if totals is None:
+                    totals = view["daily"][day["date"]] = [0, 0, 0, 0]
+                for index, total in enumerate(TOTALS):
+                    totals[index] += day[total]
+                    view["statistics"][total] += day[total]
+    if unlisted:
+        eprint("{} students with daily data are not in the roster".format(unlisted))
+
+    for groups in views.values():
+        for view in groups.values():
+            for kind, (score_sum, count) in view.pop("test_scores").items():
+                mean = score_sum / count if count else 0
+                view["statistics"]["mean_{}_score".format(kind)] = mean
+            view["daily"] = daily_series(view["daily"])
+    return views
+
+
+def daily_series(daily):
+    """Orders a group's daily totals by date, adding their cumulative progress"""
+    series = []
+    progress = 0
+    for date in sorted(daily):
+        totals = daily[date]
+        entry = {"date": date_string(date)}
+        for index, total in enumerate(TOTALS):
+            entry[total] = totals[index]
+        progress += entry["additions"] - entry["deletions"]
+        entry["progress"] = progress
+        series.append(entry)
+    for entry in series:
+        entry["progress"] = round(entry["progress"] / progress * 100) if progress else 0
+    return series
@@ -1,6 +1,25 @@
 from __future__ import print_function
 from datetime import date, timedelta
+import io
+import os
 import sys
+import bz2
+import gzip
+import lzma
+import inspect
+import functools
+
+# Compressed input formats, by file extension
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+# Decompressed text of input files read ahead by preload_input, by absolute path
+PRELOADED_INPUTS = {}
+
+# Results of preloadable parsers on preloaded inputs, by kind, path and parameters
+PRELOADED_RESULTS = {}
+
+# Parameter types a preloadable parser's result can be kept for
+KEY_TYPES = (str, int, float, bool)
 
 
 def is_number(string):
@@ -41,6 +60,15 @@ def time_string(seconds):
     return "{} hours".format(int(hours))
 
 
+def ordinal(number):
+    """Converts an int into its ordinal string, such as 1st or 80th"""
+    if 10 <= number % 100 <= 20:
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(number % 10, "th")
+    return "{}{}".format(number, suffix)
+
+
 def daterange(start, end):
     """Returns a list of every date between **start** and **end**
         
@@ -59,6 +87,164 @@ def daterange(start, end):
         yield start + timedelta(n)
 
 
+def open_input(path):
+    """Opens an input file for reading as text
+
+    Paths ending in .gz, .bz2 or .xz are decompressed while they are read, one chunk
+    at a time, so compressed logs never have to be decompressed to disk. Inputs read
+    ahead by preload_input are served from memory.
+
+    **Args**:
+        **path** (str): A path to a plain or compressed input file
+
+    **Returns**:
+        file: A text file object
+
+    """
+    if PRELOADED_INPUTS:
+        text = preloaded_text(path)
+        if text is not None:
+            return PreloadedInput(os.path.abspath(path), text)
+    for extension in COMPRESSED_OPENERS:
+        if path.endswith(extension):
+            return COMPRESSED_OPENERS[extension](path, "rt")
+    return open(path, "r")
+
+
+def preloaded_text(path):
+    """Returns the text preload_input read from **path**, or None
+
+    None is also returned once the file's size or modification time changed.
+    """
+    preloaded = PRELOADED_INPUTS.get(os.path.abspath(path))
+    if preloaded is None:
+        return None
+    info = os.stat(path)
+    if preloaded[:2] != (info.st_size, info.st_mtime_ns):
+        return None
+    return preloaded[2]
+
+
+class PreloadedInput:
+    """A preloaded input opened by open_input, read from memory like a text file
+
+    The text is only copied into a file object once it is read, so a preloadable
+    parser given this input and serving a preloaded result never copies it.
+    """
+
+    def __init__(self, path, text):
+        self.path = path
+        self.text = text
+        self.file = None
+
+    def opened(self):
+        """Returns the file object reading the text, creating it on first use"""
+        if self.file is None:
+            self.file = io.StringIO(self.text)
+        return self.file
+
+    def __getattr__(self, name):
+        return getattr(self.opened(), name)
+
+    def __iter__(self):
+        return iter(self.opened())
+
+    def __next__(self):
+        return next(self.opened())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def preload_input(path, parsers=()):
+    """Reads an input file into memory, for open_input to serve from then on
+
+    The text is served until the file's size or modification time changes, after
+    which the file is read again like any other input. Each of **parsers**, which
+    must be preloadable, is run on the input with its default parameters, so its
+    result is served as well.
+    """
+    info = os.stat(path)
+    with open_input(path) as preloaded_file:
+        text = preloaded_file.read()
+    PRELOADED_INPUTS[os.path.abspath(path)] = (info.st_size, info.st_mtime_ns, text)
+    for parser in parsers:
+        parser(path)
+
+
+def preloadable(kind):
+    """Makes a parser serve the results it returned for preloaded inputs
+
+    The parser takes its input first, as a path or a file from open_input. When the
+    input is preloaded and every other parameter is None, a string or a number,
+    the result is kept, and later calls with the same parameters return it without
+    parsing. Parsers of the same **kind** return equal results for equal
+    parameters, and share what is kept.
+
+    Results are shared rather than copied. They are kept for prefork_server, whose
+    workers are each forked from the process that preloaded them, serve one
+    request and exit, so no worker sees what another changed.
+    """
+
+    def decorator(parser):
+        signature = inspect.signature(parser)
+
+        @functools.wraps(parser)
+        def parse(*args, **kwargs):
+            if not PRELOADED_INPUTS:
+                return parser(*args, **kwargs)
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            values = list(arguments.arguments.items())
+            source, parameters = values[0][1], values[1:]
+            if isinstance(source, PreloadedInput):
+                path = source.path
+            elif isinstance(source, str) and preloaded_text(source) is not None:
+                path = os.path.abspath(source)
+            else:
+                return parser(*args, **kwargs)
+            if not all(
+                value is None or isinstance(value, KEY_TYPES)
+                for name, value in parameters
+            ):
+                return parser(*args, **kwargs)
+            key = (kind, path) + tuple(
+                (name, value) for name, value in parameters if value is not None
+            )
+            if key not in PRELOADED_RESULTS:
+                PRELOADED_RESULTS[key] = parser(*args, **kwargs)
+            return PRELOADED_RESULTS[key]
+
+        return parse
+
+    return decorator
+
+
+def input_file(file):
+    """Returns **file** if it is a file object, otherwise opens it with open_input"""
+    if isinstance(file, str):
+        return open_input(file)
+    return file
+
+
 def eprint(*args, **kwargs):
     """A duplicate of the python print method that instead prints to standard error"""
     print(*args, file=sys.stderr, **kwargs)
+
+
+def numstat_words(line):
+    """Splits a numstat line the way get_daily_commit_data does
+
+    **Returns**:
+        list: The words of the line, which is a valid numstat line if there are 3
+
+    """
+    line = line.strip("\n").strip(" ")
+    return " ".join(line.split("\t")).split(" ")
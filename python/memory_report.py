@@ -0,0 +1,253 @@
+import os
+import json
+import shelve
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from helper import eprint
+from helper import open_input
+from daily_git_data import get_daily_commit_data
+from daily_git_data import iter_daily_commit_data
+
+# Entries stored between checks of the traced memory in a SpillingDict
+CHECK_INTERVAL = 64
+
+
+class MemoryReport:
+    """Records the peak traced memory of each phase of a script
+
+    Starts tracemalloc if it is not already tracing. Each phase resets the peak, so
+    the peak of a phase is the most memory allocated at once while it ran.
+    """
+
+    def __init__(self):
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """Measures the peak memory of the code run inside the ``with`` block"""
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            retained = current - before
+            self.phases.append(
+                {"phase": name, "peak_bytes": peak, "retained_bytes": retained}
+            )
+
+    def report(self):
+        """Returns the phases measured so far
+
+        **Returns**:
+            list: A list of dictionaries of the following form, in the order the
+            phases ran: ::
+
+                {
+                    "phase": str,
+                    "peak_bytes": int,
+                    "retained_bytes": int
+                }
+
+        """
+        return self.phases
+
+    def stop(self):
+        """Stops tracemalloc if this report started it"""
+        if self.started and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def report_memory(memory_report):
+    """Prints the phases of **memory_report** to standard error"""
+    for phase in memory_report.report():
+        eprint(
+            "Memory {}: peak {:.1f} MB, retained {:.1f} MB".format(
+                phase["phase"],
+                phase["peak_bytes"] / 2 ** 20,
+                phase["retained_bytes"] / 2 ** 20,
+            )
+        )
+
+
+class SpillingDict:
+    """A dictionary of per-student results that spills to disk over a memory budget
+
+    Values are kept in memory until the traced memory exceeds **max_bytes**, at
+    which point every in-memory value is moved to a shelve file in a temporary
+    directory. Iteration order is insertion order, like a dict, wherever the
+    values are stored. Measuring the budget keeps tracemalloc running, which
+    makes parsing a few times slower.
+
+    **Args**:
+        **max_bytes** (int): The memory budget, measured with tracemalloc
+    """
+
+    def __init__(self, max_bytes):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.max_bytes = max_bytes
+        self.memory = {}
+        self.order = {}
+        self.shelf = None
+        self.directory = None
+        self.unchecked = 0
+
+    def __setitem__(self, name, value):
+        self.order[name] = None
+        self.memory[name] = value
+        self.unchecked += 1
+        if self.unchecked >= CHECK_INTERVAL:
+            self.unchecked = 0
+            if tracemalloc.get_traced_memory()[0] > self.max_bytes:
+                self.spill()
+
+    def __getitem__(self, name):
+        if name in self.memory:
+            return self.memory[name]
+        if name in self.order:
+            return self.shelf[name]
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        return name in self.order
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def get(self, name, default=None):
+        """Returns the value of **name**, or **default** if there is none"""
+        return self[name] if name in self.order else default
+
+    def keys(self):
+        """Returns the names, in insertion order"""
+        return self.order.keys()
+
+    def items(self):
+        """Yields (name, value) pairs, in insertion order"""
+        for name in self.order:
+            yield name, self[name]
+
+    def spill(self):
+        """Moves every value held in memory to the shelve file"""
+        if self.shelf is None:
+            self.directory = tempfile.mkdtemp(prefix="encourse-spill-")
+            self.shelf = shelve.open(os.path.join(self.directory, "spill"))
+        for name in self.memory:
+            self.shelf[name] = self.memory[name]
+        self.memory = {}
+
+    def spilled(self):
+        """Returns True if any value has been moved to disk"""
+        return self.shelf is not None
+
+    def close(self):
+        """Removes the shelve file, if one was created"""
+        if self.shelf is not None:
+            self.shelf.close()
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.shelf = None
+        self.memory = {}
+        self.order = {}
+
+
+def bounded_commit_data(progress_file, max_bytes, max_change=None, timeout=None):
+    """Parses a commit log into a SpillingDict bounded by **max_bytes**
+
+    Returns the same data as get_daily_commit_data, but students are handed over
+    one at a time and spilled to disk once the budget is exceeded.
+    """
+    students = SpillingDict(max_bytes)
+    for name, student_data in iter_daily_commit_data(
+        progress_file, max_change, timeout
+    ):
+        students[name] = student_data
+    return students
+
+
+def add_memory_arguments(parser):
+    """Adds the memory reporting and budget options to an endpoint's argument parser"""
+    parser.add_argument(
+        "-M",
+        "--memory-report",
+        action="store_true",
+        help="print the peak memory of each phase",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=float,
+        help="memory budget in megabytes, streams and spills",
+    )
+
+
+def memory_options(args):
+    """Returns the MemoryReport and byte budget requested by the parsed **args**
+
+    **Returns**:
+        (MemoryReport, int): The report, or None without --memory-report, and the
+        budget in bytes, or None without --max-memory
+
+    """
+    memory_report = MemoryReport() if args.memory_report else None
+    max_bytes = None
+    if args.max_memory:
+        max_bytes = int(args.max_memory * 2 ** 20)
+    return memory_report, max_bytes
+
+
+@contextmanager
+def measure(memory_report, name):
+    """Measures a phase of **memory_report**, or does nothing if it is None"""
+    if memory_report is None:
+        yield
+    else:
+        with memory_report.phase(name):
+            yield
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logfile", help="path to commit log file")
+    parser.add_argument("-t", "--timeout", help="time spent timeout")
+    parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+    parser.add_argument(
+        "--max-memory",
+        type=float,
+        help="memory budget in megabytes, streams and spills",
+    )
+
+    args = parser.parse_args()
+
+    memory_report = MemoryReport()
+    with memory_report.phase("parse"):
+        if args.max_memory:
+            data = bounded_commit_data(
+                open_input(args.logfile),
+                int(args.max_memory * 2 ** 20),
+                args.limit,
+                args.timeout,
+            )
+        else:
+            data = get_daily_commit_data(
+                open_input(args.logfile), args.limit, args.timeout
+            )
+    print(
+        json.dumps(
+            {
+                "students": len(data),
+                "spilled": args.max_memory is not None and data.spilled(),
+                "phases": memory_report.report(),
+            }
+        )
+    )
+    if args.max_memory:
+        data.close()
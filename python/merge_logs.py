@@ -0,0 +1,137 @@
+import sys
+import argparse
+from helper import eprint
+from helper import input_file
+from helper import numstat_words
+
+
+def iter_log_entries(progress_file):
+    """Yields every student entry of a commit log with its commits
+
+    Reads **progress_file** the way get_daily_commit_data does, keeping the hash on
+    each commit's header line, which the parser ignores.
+
+    **Yields**:
+        **tuple**: The name of a student and a list of their commits, each a
+        dictionary of the following form: ::
+
+            {
+                "timestamp": "yyyy-mm-dd hh:mm:ss",
+                "hash": str,
+                "numstat": ["additions\\tdeletions\\tpath", ...]
+            }
+
+        A student with several entries is yielded once per entry, and a student
+        without commits is yielded with an empty list.
+
+    """
+    progress_file = input_file(progress_file)
+    name = None
+    commits = []
+    expect_time = False
+    for line in progress_file:
+        words = numstat_words(line)
+        if words == [""]:
+            expect_time = True
+            continue
+        if words[0] == "Start":
+            if name is not None:
+                yield name, commits
+            name = words[1]
+            commits = []
+            expect_time = True
+        elif words[0] == "End":
+            if name is not None:
+                yield name, commits
+            name = None
+        elif expect_time:
+            expect_time = False
+            commits.append(
+                {
+                    "timestamp": "{} {}".format(words[0], words[1]),
+                    "hash": words[2] if len(words) > 2 else "",
+                    "numstat": [],
+                }
+            )
+        elif commits:
+            commits[-1]["numstat"].append(line.rstrip("\n"))
+    if name is not None:
+        yield name, commits
+
+
+def commit_key(commit):
+    """Returns the key that identifies a commit across logs
+
+    The hash identifies a commit. A commit from a log without hashes is identified
+    by its time and its changes instead.
+    """
+    if commit["hash"]:
+        return commit["hash"]
+    return (commit["timestamp"],) + tuple(commit["numstat"])
+
+
+def merge_commit_logs(progress_files):
+    """Merges partial and overlapping commit logs into one entry per student
+
+    Every commit is kept once per student, however many logs or entries contain
+    it, and each student's commits are ordered by time. Commits with equal times
+    keep the order in which they were first read.
+
+    **Args**:
+        **progress_files** (list): Commit log files, or paths to plain, .gz, .bz2 or
+        .xz commit log files
+
+    **Returns**:
+        dict: A dictionary mapping students, in the order they first appear, to
+        their sorted commits, as yielded by iter_log_entries
+
+    """
+    students = {}
+    seen = {}
+    duplicates = 0
+    for progress_file in progress_files:
+        for name, commits in iter_log_entries(progress_file):
+            student_commits = students.setdefault(name, [])
+            student_seen = seen.setdefault(name, set())
+            for commit in commits:
+                key = commit_key(commit)
+                if key in student_seen:
+                    duplicates += 1
+                    continue
+                student_seen.add(key)
+                student_commits.append(commit)
+    if duplicates:
+        eprint("Dropped {} duplicate commits".format(duplicates))
+    for name in students:
+        students[name].sort(key=lambda commit: commit["timestamp"])
+    return students
+
+
+def write_commit_log(students, log_file):
+    """Writes merged commits in the commit log format, one entry per student"""
+    for name in students:
+        log_file.write("Start {}\n".format(name))
+        for commit in students[name]:
+            header = commit["timestamp"]
+            if commit["hash"]:
+                header = "{} {}".format(header, commit["hash"])
+            log_file.write("\n{}\n".format(header))
+            for line in commit["numstat"]:
+                log_file.write("{}\n".format(line))
+        log_file.write("End {}\n".format(name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output", help="path to merged commit log file, - for stdout")
+    parser.add_argument("logfiles", nargs="+", help="paths to partial commit log files")
+
+    args = parser.parse_args()
+
+    students = merge_commit_logs(args.logfiles)
+    if args.output == "-":
+        write_commit_log(students, sys.stdout)
+    else:
+        with open(args.output, "w") as log_file:
+            write_commit_log(students, log_file)
+    eprint("Merged {} students".format(len(students)))
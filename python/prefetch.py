@@ -0,0 +1,169 @@
+import io
+import time
+import queue
+import threading
+from helper import open_input
+
+# Characters read from an input per chunk
+CHUNK_SIZE = 1 << 20
+
+# Chunks read ahead of the parser before a reader thread waits
+QUEUE_CHUNKS = 8
+
+# Marks the end of an input in a reader thread's queue
+END = None
+
+
+class PrefetchReader:
+    """Reads an input file on a background thread, ahead of the parser consuming it
+
+    A reader thread opens the input and reads it in large chunks into a bounded
+    queue, so blocking reads on slow storage overlap with parsing instead of
+    stalling it, and never run more than **depth** chunks ahead of it. The reader
+    yields lines like a text file, and has a readline method, so it can be passed
+    to any parser in place of the file itself.
+
+    **Args**:
+        |  **path** (str): A path to a plain, .gz, .bz2 or .xz input file
+        |  **chunk_size** (int): Characters read per chunk
+        |  **depth** (int): Chunks read ahead before the reader thread waits
+        |  **opener** (function): Opens **path** as a text file, open_input if None
+
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, depth=QUEUE_CHUNKS, opener=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(maxsize=depth)
+        self.opener = opener if opener is not None else open_input
+        self.closed = threading.Event()
+        self.lines = []
+        self.position = 0
+        self.partial = ""
+        self.finished = False
+        self.thread = threading.Thread(
+            target=self.read_chunks, name="prefetch {}".format(path), daemon=True
+        )
+        self.thread.start()
+
+    def read_chunks(self):
+        """Reads every chunk of the input into the queue, then END
+
+        An error while opening or reading is passed through the queue, and raised
+        by the consuming thread when it reaches that point of the input.
+        """
+        try:
+            with self.opener(self.path) as input_file:
+                while not self.closed.is_set():
+                    chunk = input_file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    self.put(chunk)
+        except Exception as error:
+            self.put(error)
+        self.put(END)
+
+    def put(self, item):
+        """Queues **item**, giving up once the reader is closed"""
+        while not self.closed.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def next_chunk(self):
+        """Splits the next chunk into lines, returning False at the end of the input"""
+        if self.finished:
+            return False
+        chunk = self.chunks.get()
+        if isinstance(chunk, Exception):
+            self.finished = True
+            raise chunk
+        if chunk is END:
+            self.finished = True
+            self.lines = [self.partial] if self.partial else []
+            self.partial = ""
+        else:
+            lines = (self.partial + chunk).split("\n")
+            self.partial = lines.pop()
+            self.lines = [line + "\n" for line in lines]
+        self.position = 0
+        return True
+
+    def readline(self):
+        """Returns the next line, or "" at the end of the input, like a text file"""
+        while self.position >= len(self.lines):
+            if not self.next_chunk():
+                return ""
+        line = self.lines[self.position]
+        self.position += 1
+        return line
+
+    def __iter__(self):
+        # Lines are yielded a chunk at a time, so a parser iterates over the reader
+        # or calls readline, without mixing the two
+        while True:
+            lines = self.lines[self.position :]
+            self.position = len(self.lines)
+            yield from lines
+            if not self.next_chunk():
+                return
+
+    def close(self):
+        """Stops the reader thread, discarding whatever it has read ahead"""
+        self.closed.set()
+        self.finished = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def prefetch_inputs(paths, chunk_size=CHUNK_SIZE, depth=QUEUE_CHUNKS, opener=None):
+    """Starts reading every input at once, each on its own reader thread
+
+    **Returns**:
+        list: A PrefetchReader per path, in the order of **paths**
+
+    """
+    return [PrefetchReader(path, chunk_size, depth, opener) for path in paths]
+
+
+class ThrottledInput(io.RawIOBase):
+    """A local file read as if from slow storage, for benchmarks
+
+    Every read waits **latency** seconds, plus the time **bandwidth** bytes per
+    second takes to transfer what it read. The wait is a sleep, which, like a
+    blocking read, lets other threads run meanwhile.
+    """
+
+    def __init__(self, path, latency, bandwidth):
+        self.raw = open(path, "rb")
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        time.sleep(self.latency + count / self.bandwidth)
+        return count
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def throttled_opener(latency, bandwidth):
+    """Returns an opener reading plain text files through ThrottledInput"""
+
+    def open_throttled(path):
+        return io.TextIOWrapper(
+            io.BufferedReader(ThrottledInput(path, latency, bandwidth))
+        )
+
+    return open_throttled
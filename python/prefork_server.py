@@ -0,0 +1,292 @@
+import gc
+import os
+import sys
+import glob
+import signal
+import socket
+import argparse
+import builtins
+import importlib
+import traceback
+from helper import eprint
+from helper import preload_input
+from fast_daily_git_data import get_daily_commit_data_fast
+from start_end import commit_data as commit_times
+from test_completion import get_test_completion
+import prefork_shim
+
+# Directory of the endpoint scripts
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Workers waiting for requests at any time
+WORKERS = 4
+
+# Largest request the shim sends, its working directory and arguments
+MAX_REQUEST = 2 ** 16
+
+# Status of a request for a script that is not an endpoint
+USAGE_STATUS = 2
+
+
+def endpoint_scripts(script_dir=SCRIPT_DIR):
+    """Returns the file names of the endpoint scripts, every get_*.py script"""
+    return sorted(
+        os.path.basename(path)
+        for path in glob.glob(os.path.join(script_dir, "get_*.py"))
+    )
+
+
+class PreforkServer:
+    """Runs endpoint scripts in workers forked from a warm zygote process
+
+    The zygote imports every endpoint module, with everything those import, and
+    compiles every endpoint script, before forking any worker. It can also read
+    input files ahead with preload_input, and parse commit logs, commit time files
+    and test score files ahead too. Workers share all of it with the zygote, so a
+    request pays neither interpreter startup nor imports. For a preloaded input, it
+    pays neither reading nor decompressing the file. For a parsed input, it also
+    skips parsing, as long as the endpoint uses the default parsing parameters.
+
+    Each worker serves one request and exits, so no request sees state left by
+    another, and the zygote forks a replacement while the others keep serving.
+    A request runs the script as its __main__, with the requesting shim's
+    arguments, working directory and standard streams, so its output, including
+    anything it prints to standard error and its exit status, is exactly that of
+    running the script.
+
+    **Args**:
+        |  **socket_path** (str): The path of the Unix socket to listen on
+        |  **workers** (int): The number of workers waiting for requests
+        |  **script_dir** (str): The directory of the endpoint scripts
+
+    """
+
+    def __init__(self, socket_path, workers=WORKERS, script_dir=SCRIPT_DIR):
+        self.socket_path = socket_path
+        self.workers = workers
+        self.script_dir = script_dir
+        self.scripts = {}
+        self.worker_pids = set()
+        self.listener = None
+
+    def load(self):
+        """Imports and compiles every endpoint script"""
+        if self.script_dir not in sys.path:
+            sys.path.insert(0, self.script_dir)
+        for script in endpoint_scripts(self.script_dir):
+            path = os.path.join(self.script_dir, script)
+            importlib.import_module(os.path.splitext(script)[0])
+            with open(path) as script_file:
+                self.scripts[script] = (path, compile(script_file.read(), path, "exec"))
+        eprint("Loaded {} endpoints".format(len(self.scripts)))
+
+    def warm(self):
+        """Runs every endpoint once with -h, discarding its help
+
+        Much of what code does the first time it runs in a process, like
+        specializing its bytecode and filling caches built on first use, then
+        happens once in the zygote rather than in every worker.
+        """
+        saved = [os.dup(1), os.dup(2)]
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        try:
+            os.dup2(devnull, 1)
+            os.dup2(devnull, 2)
+            for script in self.scripts:
+                self.run(script, ["-h"])
+        finally:
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            for descriptor in saved + [devnull]:
+                os.close(descriptor)
+
+    def preload(self, paths, parsers=()):
+        """Reads input files into memory, to be served to every worker
+
+        **Args**:
+            **parsers** (list): Preloadable parsers whose results on the inputs
+            are served as well, as in preload_input
+
+        """
+        for path in paths:
+            preload_input(path, parsers)
+        if paths:
+            eprint("Preloaded {} inputs".format(len(paths)))
+
+    def serve_forever(self):
+        """Listens on the socket, keeping **workers** workers forked until stopped"""
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.listener.bind(self.socket_path)
+        self.listener.listen(128)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        # Keeps the collector in workers from touching, and so copying, every
+        # object loaded by the zygote
+        gc.freeze()
+        try:
+            for worker in range(self.workers):
+                self.fork_worker()
+            while True:
+                pid, status = os.wait()
+                if pid in self.worker_pids:
+                    self.worker_pids.remove(pid)
+                    self.fork_worker()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for pid in self.worker_pids:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    # Reaped by a wait that the stop signal interrupted
+                    pass
+            self.listener.close()
+            os.remove(self.socket_path)
+
+    def fork_worker(self):
+        """Forks a worker that serves one request, then exits"""
+        # Output buffered before the fork would otherwise be written by the worker
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # Holds off stopping the zygote until the worker is recorded, so that it is
+        # stopped along with the zygote
+        stop_signals = {signal.SIGTERM, signal.SIGINT}
+        signal.pthread_sigmask(signal.SIG_BLOCK, stop_signals)
+        pid = os.fork()
+        if pid:
+            self.worker_pids.add(pid)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, stop_signals)
+            return
+        status = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, stop_signals)
+            connection, address = self.listener.accept()
+            self.listener.close()
+            self.handle(connection)
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        finally:
+            os._exit(status)
+
+    def handle(self, connection):
+        """Runs the request on **connection** and replies with its exit status"""
+        message, descriptors, flags, address = socket.recv_fds(
+            connection, MAX_REQUEST, 3
+        )
+        cwd, script, *arguments = message.decode().split("\0")
+        for target, descriptor in enumerate(descriptors):
+            os.dup2(descriptor, target)
+            os.close(descriptor)
+        if script in self.scripts:
+            os.chdir(cwd)
+            status = self.run(script, arguments)
+        else:
+            eprint("Unknown endpoint {}".format(script))
+            status = USAGE_STATUS
+        try:
+            connection.send(str(status).encode())
+        except OSError:
+            # The shim is gone, so nobody waits for the status
+            pass
+        connection.close()
+
+    def run(self, script, arguments):
+        """Runs an endpoint script as __main__ in this process
+
+        **Returns**:
+            int: The exit status the script would have exited with
+
+        """
+        path, code = self.scripts[script]
+        sys.argv = [path] + arguments
+        status = 0
+        try:
+            exec(
+                code,
+                {"__name__": "__main__", "__file__": path, "__builtins__": builtins},
+            )
+        except SystemExit as exit:
+            if exit.code is None:
+                status = 0
+            elif isinstance(exit.code, int):
+                status = exit.code
+            else:
+                eprint(exit.code)
+                status = 1
+        except BaseException as error:
+            # Leaves out this frame, so the traceback is the script's own
+            traceback.print_exception(type(error), error, error.__traceback__.tb_next)
+            status = 1
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (BrokenPipeError, ValueError):
+                pass
+        return status
+
+
+def install_shims(directory, script_dir=SCRIPT_DIR):
+    """Writes a shim named like each endpoint script into **directory**
+
+    Pointing the web backend at **directory** instead of the scripts' directory
+    makes every request go through the prefork server, with the same command
+    lines. The shims run the scripts themselves whenever the server is down.
+    """
+    with open(prefork_shim.__file__) as shim_file:
+        source = shim_file.read()
+    source = source.replace(
+        "SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))",
+        "SCRIPT_DIR = {!r}".format(script_dir),
+    )
+    os.makedirs(directory, exist_ok=True)
+    for script in endpoint_scripts(script_dir):
+        with open(os.path.join(directory, script), "w") as shim:
+            shim.write(source)
+    eprint("Installed {} shims".format(len(endpoint_scripts(script_dir))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    serve_parser = subparsers.add_parser("serve", help="run the prefork server")
+    serve_parser.add_argument(
+        "-s", "--socket", default=prefork_shim.SOCKET_PATH, help="path to Unix socket"
+    )
+    serve_parser.add_argument(
+        "-w", "--workers", type=int, default=WORKERS, help="workers kept waiting"
+    )
+    serve_parser.add_argument(
+        "-p", "--preload", nargs="*", default=[], help="input files to read ahead"
+    )
+    serve_parser.add_argument(
+        "--logs", nargs="*", default=[], help="commit logs to parse ahead"
+    )
+    serve_parser.add_argument(
+        "--times", nargs="*", default=[], help="commit time files to parse ahead"
+    )
+    serve_parser.add_argument(
+        "--tests", nargs="*", default=[], help="test score files to parse ahead"
+    )
+    shims_parser = subparsers.add_parser("shims", help="install endpoint shims")
+    shims_parser.add_argument("directory", help="directory to write the shims to")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = PreforkServer(args.socket, args.workers)
+        server.load()
+        server.warm()
+        server.preload(args.preload)
+        server.preload(args.logs, [get_daily_commit_data_fast])
+        server.preload(args.times, [commit_times])
+        server.preload(args.tests, [get_test_completion])
+        server.serve_forever()
+    elif args.command == "shims":
+        install_shims(args.directory)
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -0,0 +1,81 @@
+import os
+import sys
+import _socket
+
+# Only builtin modules are imported, so starting the shim costs little more than
+# starting the interpreter
+
+# Directory of the endpoint scripts, run directly when no server is listening
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Path of the prefork server's Unix socket, unless ENCOURSE_SOCKET is set
+SOCKET_PATH = "/tmp/encourse.sock"
+
+# Exit status when the server accepted the request but no status came back
+LOST_STATUS = 70
+
+
+def request(script, arguments, socket_path=None):
+    """Has a prefork server worker run **script** with **arguments**
+
+    The shim's standard input, output and error are passed to the worker, which
+    runs the endpoint with them as its own, so the endpoint writes its response
+    straight to the shim's standard output.
+
+    **Returns**:
+        int: The exit status of the endpoint, None if no server is listening, or
+        LOST_STATUS if the worker exited without reporting one
+
+    """
+    connection = _socket.socket(_socket.AF_UNIX, _socket.SOCK_SEQPACKET)
+    try:
+        connection.connect(
+            socket_path or os.environ.get("ENCOURSE_SOCKET", SOCKET_PATH)
+        )
+    except OSError:
+        connection.close()
+        return None
+    message = "\0".join([os.getcwd(), script] + arguments).encode()
+    descriptors = b"".join(fd.to_bytes(4, sys.byteorder) for fd in (0, 1, 2))
+    try:
+        connection.sendmsg(
+            [message], [(_socket.SOL_SOCKET, _socket.SCM_RIGHTS, descriptors)]
+        )
+    except OSError:
+        # Nothing ran, like when no server is listening
+        connection.close()
+        return None
+    try:
+        reply = connection.recv(16)
+    except OSError:
+        reply = b""
+    finally:
+        connection.close()
+    return int(reply) if reply else LOST_STATUS
+
+
+def main():
+    """Runs the endpoint named by the shim's file name, or by its first argument
+
+    A copy of the shim named like an endpoint, get_statistics.py for instance, takes
+    that endpoint's arguments. The shim itself takes the endpoint's file name first.
+    """
+    script = os.path.basename(__file__)
+    arguments = sys.argv[1:]
+    if not script.startswith("get_"):
+        if not arguments:
+            sys.stderr.write("usage: prefork_shim.py endpoint [arguments ...]\n")
+            sys.exit(2)
+        script = os.path.basename(arguments.pop(0))
+    status = request(script, arguments)
+    if status is None:
+        # No server, so the endpoint runs as it always has
+        path = os.path.join(SCRIPT_DIR, script)
+        os.execv(sys.executable, [sys.executable, path] + arguments)
+    if status == LOST_STATUS:
+        sys.stderr.write("Prefork server worker exited during the request\n")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
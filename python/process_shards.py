@@ -0,0 +1,300 @@
+import os
+import sys
+import json
+import argparse
+from multiprocessing import Pool
+from helper import eprint
+from helper import open_input
+from start_end import commit_data as commit_times
+from daily_git_data import get_daily_commit_data as commit_list
+from test_completion import get_test_completion as test_completion
+from get_statistics import sum_statistics
+from get_class_progress import jsonify as histogram
+from get_class_progress import merge_data as merge_histograms
+
+# Totals that are summed across students, shards and rollups
+TOTALS = ("additions", "deletions", "commit_count", "time_spent")
+
+# Test scores, averaged over only the students with results
+SCORES = ("visible", "hidden")
+
+
+def load_manifest(manifest_path):
+    """Reads a course/term manifest
+
+    Relative input paths are resolved against the directory of the manifest. Two
+    shards with the same course and term would store their results in the same
+    directory, so they raise ValueError.
+
+    **Args**:
+        **manifest_path** (str): A path to a json manifest of the following form: ::
+
+            {
+                "output": "path/to/results",
+                "shards": [
+                    {
+                        "course": "cs252",
+                        "term": "fall2018",
+                        "logfile": "path/to/commit/log",
+                        "timefile": "path/to/commit/times",
+                        "visible": "path/to/visible/tests",
+                        "hidden": "path/to/hidden/tests",
+                        "limit": int (optional),
+                        "timeout": float (optional)
+                    },
+                    ...
+                ]
+            }
+
+    **Returns**:
+        dict: The manifest, with every path made absolute
+
+    """
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    root = os.path.dirname(os.path.abspath(manifest_path))
+    manifest["output"] = os.path.join(root, manifest.get("output", "shards"))
+    shard_names = set()
+    for shard in manifest["shards"]:
+        shard_name = (shard["course"], shard["term"])
+        if shard_name in shard_names:
+            raise ValueError(
+                "Multiple shards for {} {} in manifest".format(*shard_name)
+            )
+        shard_names.add(shard_name)
+        for key in ("logfile", "timefile", "visible", "hidden"):
+            if shard.get(key):
+                shard[key] = os.path.join(root, shard[key])
+    return manifest
+
+
+def shard_directory(output, shard):
+    """Returns the directory where the results of **shard** are stored"""
+    return os.path.join(output, shard["course"], shard["term"])
+
+
+def process_shard(shard):
+    """Parses the inputs of a single course/term and compiles its results
+
+    **Args**:
+        **shard** (dict): A single shard entry from the manifest
+
+    **Returns**:
+        (dict, dict): A tuple of per-student results and the shard summary.
+        The per-student results have the following form: ::
+
+            {
+                "name1": {
+                    "start": "yyyy-mm-dd",
+                    "end": "yyyy-mm-dd",
+                    "additions": int,
+                    "deletions": int,
+                    "commit_count": int,
+                    "time_spent": int (seconds),
+                    "visible": float (percentage) or None without results,
+                    "hidden": float (percentage) or None without results
+                },
+                ...
+            }
+
+        The summary has the form: ::
+
+            {
+                "course": str,
+                "term": str,
+                "students": int,
+                "additions": int,
+                "deletions": int,
+                "commit_count": int,
+                "time_spent": int (seconds),
+                "visible": float (sum of percentages),
+                "hidden": float (sum of percentages),
+                "visible_students": int (students with visible results),
+                "hidden_students": int (students with hidden results),
+                "histogram": {"0-20%": int, ...}
+            }
+
+    """
+    with open_input(shard["logfile"]) as commit_data_file:
+        stats = sum_statistics(
+            commit_list(
+                commit_data_file,
+                max_change=shard.get("limit"),
+                timeout=shard.get("timeout"),
+            )
+        )
+    dates = {}
+    if shard.get("timefile"):
+        with open_input(shard["timefile"]) as commit_date_file:
+            dates = commit_times(commit_date_file)
+    tests = {}
+    for kind in SCORES:
+        tests[kind] = {}
+        if shard.get(kind):
+            with open_input(shard[kind]) as test_file:
+                tests[kind] = test_completion(test_file)
+
+    students = {}
+    for student in sorted(
+        set(stats) | set(dates) | set(tests["visible"]) | set(tests["hidden"])
+    ):
+        student_data = {"start": None, "end": None}
+        if student in dates and len(dates[student]) == 2:
+            student_data["start"] = dates[student][0]
+            student_data["end"] = dates[student][1]
+        for key in TOTALS:
+            student_data[key] = stats[student][key] if student in stats else 0
+        for kind in SCORES:
+            info = tests[kind].get(student)
+            student_data[kind] = info["total"] if info else None
+        students[student] = student_data
+
+    summary = {
+        "course": shard["course"],
+        "term": shard["term"],
+        "students": len(students),
+    }
+    for key in TOTALS:
+        summary[key] = sum(students[student][key] for student in students)
+    for kind in SCORES:
+        scores = [
+            students[student][kind]
+            for student in students
+            if students[student][kind] is not None
+        ]
+        summary[kind] = sum(scores)
+        summary[kind + "_students"] = len(scores)
+    summary["histogram"] = json.loads(
+        merge_histograms(histogram(tests["visible"]), histogram(tests["hidden"]))
+    )
+    return students, summary
+
+
+def run_shard(job):
+    """Processes one shard and stores its results, returning the shard summary"""
+    output, shard = job
+    students, summary = process_shard(shard)
+    directory = shard_directory(output, shard)
+    os.makedirs(directory, exist_ok=True)
+    for file_name, data in (("students.json", students), ("summary.json", summary)):
+        path = os.path.join(directory, file_name)
+        with open(path + ".tmp", "w") as result_file:
+            json.dump(data, result_file)
+        os.replace(path + ".tmp", path)
+    return summary
+
+
+def run_manifest(manifest, processes=None):
+    """Processes every shard of **manifest** in parallel across a process pool
+
+    **Returns**:
+        list: The summaries of every shard, in manifest order
+
+    """
+    jobs = [(manifest["output"], shard) for shard in manifest["shards"]]
+    with Pool(processes) as pool:
+        return pool.map(run_shard, jobs)
+
+
+def load_summaries(output):
+    """Reads the stored summary of every shard below **output**"""
+    summaries = []
+    for root, directories, files in os.walk(output):
+        directories.sort()
+        if "summary.json" in files:
+            with open(os.path.join(root, "summary.json"), "r") as summary_file:
+                summaries.append(json.load(summary_file))
+    return summaries
+
+
+def rollup(summaries, by=None):
+    """Combines shard summaries into cross-course or cross-term rollups
+
+    Only the stored summaries are used, so no logs are parsed again.
+
+    **Args**:
+        |  **summaries** (list): Shard summaries, returned by load_summaries
+        |  **by** (str): "course", "term", or None to combine every shard
+
+    **Returns**:
+        dict: A dictionary mapping each group to its combined totals and means.
+        The means of test scores are over the students with results. ::
+
+            {
+                "cs252": {
+                    "shards": int,
+                    "students": int,
+                    "additions": int,
+                    ...
+                    "means": {"additions": float, ...},
+                    "histogram": {"0-20%": int, ...}
+                },
+                ...
+            }
+
+    """
+    groups = {}
+    for summary in summaries:
+        group = summary[by] if by else "all"
+        if group not in groups:
+            groups[group] = {"shards": 0, "students": 0, "histogram": {}}
+            for key in TOTALS + SCORES:
+                groups[group][key] = 0
+            for kind in SCORES:
+                groups[group][kind + "_students"] = 0
+        combined = groups[group]
+        combined["shards"] += 1
+        combined["students"] += summary["students"]
+        for key in TOTALS + SCORES:
+            combined[key] += summary[key]
+        for kind in SCORES:
+            # Summaries stored before these counts counted every student
+            combined[kind + "_students"] += summary.get(
+                kind + "_students", summary["students"]
+            )
+        for bin_name in summary["histogram"]:
+            combined["histogram"][bin_name] = (
+                combined["histogram"].get(bin_name, 0) + summary["histogram"][bin_name]
+            )
+    for group in groups:
+        combined = groups[group]
+        count = combined["students"]
+        combined["means"] = {
+            key: combined[key] / count if count else 0 for key in TOTALS
+        }
+        for kind in SCORES:
+            count = combined[kind + "_students"]
+            combined["means"][kind] = combined[kind] / count if count else 0
+    return groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser("run", help="process every shard of a manifest")
+    run_parser.add_argument("manifest", help="path to course/term manifest")
+    run_parser.add_argument("-j", "--jobs", type=int, help="number of worker processes")
+    rollup_parser = subparsers.add_parser(
+        "rollup", help="combine stored shard summaries"
+    )
+    rollup_parser.add_argument("output", help="path to shard results directory")
+    rollup_parser.add_argument(
+        "-b", "--by", choices=["course", "term"], help="group by"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        try:
+            manifest = load_manifest(args.manifest)
+        except ValueError as error:
+            eprint(error)
+            sys.exit(1)
+        summaries = run_manifest(manifest, processes=args.jobs)
+        eprint("Processed {} shards into {}".format(len(summaries), manifest["output"]))
+        print(json.dumps(rollup(summaries)))
+    elif args.command == "rollup":
+        print(json.dumps(rollup(load_summaries(args.output), by=args.by)))
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import fcntl
+import hashlib
+import argparse
+import tempfile
+from helper import eprint
+from response_encoding import ENCODINGS
+from response_encoding import EXTENSIONS
+from response_encoding import encode
+from response_encoding import negotiate
+from response_encoding import write_response
+
+# Default size bound of a cache directory, in bytes
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+
+# Exit status of a script whose response matches the --if-none-match ETag
+NOT_MODIFIED_STATUS = 3
+
+# Bytes read at a time when hashing input files
+HASH_CHUNK_SIZE = 2 ** 20
+
+
+def content_hash(path):
+    """Returns the sha256 hex digest of the contents of the file at **path**"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        chunk = input_file.read(HASH_CHUNK_SIZE)
+        while chunk:
+            digest.update(chunk)
+            chunk = input_file.read(HASH_CHUNK_SIZE)
+    return digest.hexdigest()
+
+
+def cache_key(endpoint, arguments, inputs):
+    """Creates the cache key of a response
+
+    **Args**:
+        |  **endpoint** (str): The name of the endpoint, such as "statistics"
+        |  **arguments** (list): Every argument that changes the response, such as the
+        |      user name, --limit, --timeout or the test string
+        |  **inputs** (list): Paths to every input file the response is computed from
+
+    **Returns**:
+        str: A hex digest that changes whenever the endpoint, an argument, or the
+        contents of an input file change
+
+    """
+    return cache_keys(endpoint, [arguments], inputs)[0]
+
+
+def cache_keys(endpoint, argument_lists, inputs):
+    """Creates the cache keys of several responses computed from the same inputs
+
+    Each input file is hashed once, however many keys are created.
+
+    **Returns**:
+        list: The cache_key of each list of arguments in **argument_lists**
+
+    """
+    hashes = [content_hash(path) for path in inputs]
+    keys = []
+    for arguments in argument_lists:
+        key = [endpoint, [str(argument) for argument in arguments], hashes]
+        keys.append(hashlib.sha256(json.dumps(key).encode()).hexdigest())
+    return keys
+
+
+def etag(body):
+    """Returns the ETag of a response body, given as a string or encoded bytes"""
+    if isinstance(body, str):
+        body = body.encode()
+    return '"{}"'.format(hashlib.sha256(body).hexdigest()[:32])
+
+
+def response_directory(cache_dir):
+    """Returns the directory that holds the cached responses of **cache_dir**"""
+    return os.path.join(cache_dir, "responses")
+
+
+def atomic_write(path, data):
+    """Writes **data** (bytes) to **path** so other processes never see a partial file"""
+    directory = os.path.dirname(path)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def lookup(cache_dir, key, encoding="json"):
+    """Returns the cached response body for **key**, or None on a miss
+
+    The json body is returned as a string, and the other encodings as bytes. A hit
+    refreshes the modification time of the entry, which is the recency used for
+    least recently used eviction.
+    """
+    path = os.path.join(response_directory(cache_dir), key + EXTENSIONS[encoding])
+    try:
+        with open(path, "rb") as response_file:
+            body = response_file.read()
+        os.utime(path)
+    except FileNotFoundError:
+        # Missing, or evicted by another process between the open and utime
+        return None
+    return body.decode() if encoding == "json" else body
+
+
+def store(cache_dir, key, body, max_bytes=DEFAULT_MAX_BYTES, encoding="json"):
+    """Stores **body** as the response for **key** and evicts down to **max_bytes**"""
+    directory = response_directory(cache_dir)
+    os.makedirs(directory, exist_ok=True)
+    data = body.encode() if isinstance(body, str) else body
+    atomic_write(os.path.join(directory, key + EXTENSIONS[encoding]), data)
+    evict(cache_dir, max_bytes)
+
+
+def entries(cache_dir):
+    """Returns (modification time, size, path) for every cached response, oldest first"""
+    directory = response_directory(cache_dir)
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for file_name in os.listdir(directory):
+        if file_name.endswith(".tmp"):
+            continue
+        path = os.path.join(directory, file_name)
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            continue
+        found.append((info.st_mtime, info.st_size, path))
+    found.sort()
+    return found
+
+
+def evict(cache_dir, max_bytes):
+    """Removes the least recently used responses until the cache fits in **max_bytes**"""
+    found = entries(cache_dir)
+    total = sum(size for mtime, size, path in found)
+    for mtime, size, path in found:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def record(cache_dir, hit):
+    """Adds a hit or a miss to the counters of **cache_dir**
+
+    The counters are updated under an exclusive lock, so concurrent processes
+    never lose an update.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, "stats.json"), "a+") as stats_file:
+        fcntl.flock(stats_file, fcntl.LOCK_EX)
+        stats_file.seek(0)
+        try:
+            stats = json.loads(stats_file.read())
+        except ValueError:
+            stats = {"hits": 0, "misses": 0}
+        stats["hits" if hit else "misses"] += 1
+        stats_file.seek(0)
+        stats_file.truncate()
+        stats_file.write(json.dumps(stats))
+
+
+def cache_stats(cache_dir):
+    """Reports the hit and miss rates and the size of **cache_dir**
+
+    **Returns**:
+        dict: A dictionary of the following form: ::
+
+            {
+                "hits": int,
+                "misses": int,
+                "hit_rate": float,
+                "miss_rate": float,
+                "entries": int,
+                "bytes": int
+            }
+
+    """
+    stats = {"hits": 0, "misses": 0}
+    path = os.path.join(cache_dir, "stats.json")
+    if os.path.exists(path):
+        with open(path, "r") as stats_file:
+            fcntl.flock(stats_file, fcntl.LOCK_SH)
+            try:
+                stats = json.loads(stats_file.read())
+            except ValueError:
+                pass
+    requests = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / requests if requests else 0
+    stats["miss_rate"] = stats["misses"] / requests if requests else 0
+    found = entries(cache_dir)
+    stats["entries"] = len(found)
+    stats["bytes"] = sum(size for mtime, size, path in found)
+    return stats
+
+
+def cached_response(
+    cache_dir, endpoint, arguments, inputs, compute, max_bytes=None, encoding="json"
+):
+    """Returns the response of an endpoint, computing and caching it on a miss
+
+    Encoded variants are cached alongside the json body, so a gzip or MessagePack
+    hit is served without decoding, re-encoding or compressing anything.
+
+    **Args**:
+        |  **cache_dir** (str): The cache directory, or None to always compute
+        |  **endpoint**, **arguments**, **inputs**: As in cache_key
+        |  **compute** (function): A function taking no arguments that returns the
+        |      response body as a string
+        |  **max_bytes** (int): The size bound of the cache directory
+        |  **encoding** (str): "json", "gzip" or "msgpack"
+
+    **Returns**:
+        (str or bytes, str): The response body, as a string for json and bytes for
+        the other encodings, and its ETag
+
+    """
+    if not cache_dir:
+        body = compute()
+        if encoding != "json":
+            body = encode(body, encoding)
+        return body, etag(body)
+    if max_bytes is None:
+        max_bytes = DEFAULT_MAX_BYTES
+    key = cache_key(endpoint, arguments, inputs)
+    if encoding != "json":
+        payload = lookup(cache_dir, key, encoding)
+        if payload is not None:
+            record(cache_dir, True)
+            return payload, etag(payload)
+    body = lookup(cache_dir, key)
+    record(cache_dir, body is not None)
+    if body is None:
+        body = compute()
+        store(cache_dir, key, body, max_bytes)
+    if encoding != "json":
+        body = encode(body, encoding)
+        store(cache_dir, key, body, max_bytes, encoding)
+    return body, etag(body)
+
+
+def add_cache_arguments(parser):
+    """Adds the response cache options to an endpoint's argument parser"""
+    parser.add_argument("-C", "--cache-dir", help="path to response cache directory")
+    parser.add_argument(
+        "--cache-size", type=float, help="response cache size bound in megabytes"
+    )
+    parser.add_argument(
+        "-E", "--if-none-match", help="exit with status 3 if the response ETag matches"
+    )
+    parser.add_argument(
+        "--encoding", choices=list(ENCODINGS), help="response encoding, overrides -A"
+    )
+    parser.add_argument("-A", "--accept", help="HTTP Accept header of the request")
+    parser.add_argument(
+        "--accept-encoding", help="HTTP Accept-Encoding header of the request"
+    )
+
+
+def respond(args, endpoint, arguments, inputs, compute):
+    """Prints an endpoint's response, using the cache options parsed into **args**
+
+    The response is encoded as **args.encoding**, or as negotiated from the
+    **args.accept** and **args.accept_encoding** headers. The ETag, and the content
+    type of an encoded response, are printed to standard error. If the ETag matches
+    **args.if_none_match**, nothing is printed to standard output and the script
+    exits with NOT_MODIFIED_STATUS, so the web tier can answer with a 304.
+    """
+    max_bytes = None
+    if args.cache_size:
+        max_bytes = int(args.cache_size * 2 ** 20)
+    encoding = args.encoding or negotiate(args.accept, args.accept_encoding)
+    body, response_etag = cached_response(
+        args.cache_dir, endpoint, arguments, inputs, compute, max_bytes, encoding
+    )
+    eprint("ETag: {}".format(response_etag))
+    if encoding != "json":
+        content_type, content_encoding = ENCODINGS[encoding]
+        eprint("Content-Type: {}".format(content_type))
+        if content_encoding:
+            eprint("Content-Encoding: {}".format(content_encoding))
+    if args.if_none_match and args.if_none_match.strip('"') == response_etag.strip('"'):
+        sys.exit(NOT_MODIFIED_STATUS)
+    write_response(body, encoding)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["stats", "evict"], help="cache command")
+    parser.add_argument("cache_dir", help="path to response cache directory")
+    parser.add_argument("--cache-size", type=float, help="size bound in megabytes")
+
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(json.dumps(cache_stats(args.cache_dir)))
+    elif args.command == "evict":
+        max_bytes = DEFAULT_MAX_BYTES
+        if args.cache_size is not None:
+            max_bytes = int(args.cache_size * 2 ** 20)
+        evict(args.cache_dir, max_bytes)
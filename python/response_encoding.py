@@ -0,0 +1,297 @@
+import sys
+import gzip
+import json
+import struct
+import argparse
+
+# Media type and content encoding of each response encoding
+ENCODINGS = {
+    "json": ("application/json", None),
+    "gzip": ("application/json", "gzip"),
+    "msgpack": ("application/msgpack", None),
+}
+
+# File extension of each encoding's cached variant
+EXTENSIONS = {"json": ".json", "gzip": ".json.gz", "msgpack": ".msgpack"}
+
+# Media types in an Accept header that select MessagePack
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def pack(value, out):
+    """Appends the MessagePack encoding of **value** to the bytearray **out**"""
+    if value is None:
+        out.append(0xC0)
+    elif value is True:
+        out.append(0xC3)
+    elif value is False:
+        out.append(0xC2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -32 <= value < 0:
+            out.append(value & 0xFF)
+        elif 0 <= value < 2 ** 8:
+            out += struct.pack(">BB", 0xCC, value)
+        elif 0 <= value < 2 ** 16:
+            out += struct.pack(">BH", 0xCD, value)
+        elif 0 <= value < 2 ** 32:
+            out += struct.pack(">BI", 0xCE, value)
+        elif 0 <= value < 2 ** 64:
+            out += struct.pack(">BQ", 0xCF, value)
+        elif -(2 ** 7) <= value:
+            out += struct.pack(">Bb", 0xD0, value)
+        elif -(2 ** 15) <= value:
+            out += struct.pack(">Bh", 0xD1, value)
+        elif -(2 ** 31) <= value:
+            out += struct.pack(">Bi", 0xD2, value)
+        elif -(2 ** 63) <= value:
+            out += struct.pack(">Bq", 0xD3, value)
+        else:
+            raise ValueError("Integer {} does not fit in 64 bits".format(value))
+    elif isinstance(value, float):
+        out += struct.pack(">Bd", 0xCB, value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        length = len(data)
+        if length < 32:
+            out.append(0xA0 | length)
+        elif length < 2 ** 8:
+            out += struct.pack(">BB", 0xD9, length)
+        elif length < 2 ** 16:
+            out += struct.pack(">BH", 0xDA, length)
+        else:
+            out += struct.pack(">BI", 0xDB, length)
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        length = len(value)
+        if length < 2 ** 8:
+            out += struct.pack(">BB", 0xC4, length)
+        elif length < 2 ** 16:
+            out += struct.pack(">BH", 0xC5, length)
+        else:
+            out += struct.pack(">BI", 0xC6, length)
+        out += value
+    elif isinstance(value, (list, tuple)):
+        length = len(value)
+        if length < 16:
+            out.append(0x90 | length)
+        elif length < 2 ** 16:
+            out += struct.pack(">BH", 0xDC, length)
+        else:
+            out += struct.pack(">BI", 0xDD, length)
+        for item in value:
+            pack(item, out)
+    elif isinstance(value, dict):
+        length = len(value)
+        if length < 16:
+            out.append(0x80 | length)
+        elif length < 2 ** 16:
+            out += struct.pack(">BH", 0xDE, length)
+        else:
+            out += struct.pack(">BI", 0xDF, length)
+        for key in value:
+            pack(key, out)
+            pack(value[key], out)
+    else:
+        raise TypeError("Cannot encode {} as MessagePack".format(type(value)))
+
+
+def packb(value):
+    """Returns the MessagePack encoding of **value** as bytes
+
+    Supports None, bool, int, float, str, bytes, lists, tuples and dictionaries,
+    which covers every value the endpoints put in their json.
+    """
+    out = bytearray()
+    pack(value, out)
+    return bytes(out)
+
+
+# Fixed-width MessagePack formats: type byte to (struct format, size)
+FIXED_FORMATS = {
+    0xCA: (">f", 4),
+    0xCB: (">d", 8),
+    0xCC: (">B", 1),
+    0xCD: (">H", 2),
+    0xCE: (">I", 4),
+    0xCF: (">Q", 8),
+    0xD0: (">b", 1),
+    0xD1: (">h", 2),
+    0xD2: (">i", 4),
+    0xD3: (">q", 8),
+}
+
+# Length-prefixed MessagePack formats: type byte to (kind, length format, size)
+LENGTH_FORMATS = {
+    0xC4: ("bin", ">B", 1),
+    0xC5: ("bin", ">H", 2),
+    0xC6: ("bin", ">I", 4),
+    0xD9: ("str", ">B", 1),
+    0xDA: ("str", ">H", 2),
+    0xDB: ("str", ">I", 4),
+    0xDC: ("array", ">H", 2),
+    0xDD: ("array", ">I", 4),
+    0xDE: ("map", ">H", 2),
+    0xDF: ("map", ">I", 4),
+}
+
+
+def unpack(data, offset):
+    """Decodes the MessagePack value at **offset** of **data**
+
+    **Returns**:
+        (object, int): The value and the offset just past it
+
+    """
+    first = data[offset]
+    offset += 1
+    if first < 0x80:
+        return first, offset
+    if first >= 0xE0:
+        return first - 0x100, offset
+    if 0xA0 <= first <= 0xBF:
+        kind, length = "str", first & 0x1F
+    elif 0x90 <= first <= 0x9F:
+        kind, length = "array", first & 0x0F
+    elif 0x80 <= first <= 0x8F:
+        kind, length = "map", first & 0x0F
+    elif first == 0xC0:
+        return None, offset
+    elif first == 0xC2:
+        return False, offset
+    elif first == 0xC3:
+        return True, offset
+    elif first in FIXED_FORMATS:
+        fmt, size = FIXED_FORMATS[first]
+        return struct.unpack_from(fmt, data, offset)[0], offset + size
+    elif first in LENGTH_FORMATS:
+        kind, fmt, size = LENGTH_FORMATS[first]
+        length = struct.unpack_from(fmt, data, offset)[0]
+        offset += size
+    else:
+        raise ValueError("Unsupported MessagePack type 0x{:02x}".format(first))
+
+    if kind == "str":
+        return bytes(data[offset : offset + length]).decode("utf-8"), offset + length
+    if kind == "bin":
+        return bytes(data[offset : offset + length]), offset + length
+    if kind == "array":
+        items = []
+        for _ in range(length):
+            item, offset = unpack(data, offset)
+            items.append(item)
+        return items, offset
+    mapping = {}
+    for _ in range(length):
+        key, offset = unpack(data, offset)
+        mapping[key], offset = unpack(data, offset)
+    return mapping, offset
+
+
+def unpackb(data):
+    """Decodes bytes produced by packb"""
+    value, offset = unpack(data, 0)
+    if offset != len(data):
+        raise ValueError(
+            "{} extra bytes after MessagePack value".format(len(data) - offset)
+        )
+    return value
+
+
+def encode(body, encoding):
+    """Encodes a json response **body** (str) as **encoding**
+
+    **Returns**:
+        bytes: The body as utf-8 json, gzip-compressed json, or MessagePack. The gzip
+        header has no timestamp, so equal bodies compress to equal bytes.
+
+    """
+    if encoding == "json":
+        return body.encode()
+    if encoding == "gzip":
+        return gzip.compress(body.encode(), mtime=0)
+    if encoding == "msgpack":
+        return packb(json.loads(body))
+    raise ValueError("Unknown response encoding {}".format(encoding))
+
+
+def quality(media_range):
+    """Splits an Accept header entry into its value and its q parameter"""
+    parts = media_range.split(";")
+    value = parts[0].strip().lower()
+    q = 1.0
+    for parameter in parts[1:]:
+        name, _, number = parameter.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                q = float(number)
+            except ValueError:
+                q = 0.0
+    return value, q
+
+
+def negotiate(accept=None, accept_encoding=None):
+    """Picks a response encoding from HTTP Accept and Accept-Encoding headers
+
+    MessagePack is chosen if the Accept header lists it with a higher quality than
+    application/json. Being more specific, it wins over wildcards. Otherwise
+    gzip is chosen if Accept-Encoding allows it. Without either header, the
+    response is plain json.
+
+    **Returns**:
+        str: "json", "gzip" or "msgpack"
+
+    """
+    if accept:
+        best_msgpack = 0.0
+        best_json = 0.0
+        for media_range in accept.split(","):
+            value, q = quality(media_range)
+            if value in MSGPACK_TYPES:
+                best_msgpack = max(best_msgpack, q)
+            elif value == "application/json":
+                best_json = max(best_json, q)
+        if best_msgpack > best_json:
+            return "msgpack"
+    if accept_encoding:
+        for coding in accept_encoding.split(","):
+            value, q = quality(coding)
+            if value in ("gzip", "x-gzip") and q > 0:
+                return "gzip"
+    return "json"
+
+
+def write_response(payload, encoding):
+    """Writes an encoded response to standard output
+
+    Plain json is printed as text, like every endpoint has always done. The other
+    encodings are written as raw bytes to the binary standard output.
+    """
+    if encoding == "json":
+        print(payload.decode() if isinstance(payload, bytes) else payload)
+        return
+    sys.stdout.flush()
+    sys.stdout.buffer.write(payload)
+    sys.stdout.buffer.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["encode", "decode"], help="direction")
+    parser.add_argument(
+        "-e", "--encoding", choices=list(ENCODINGS), default="msgpack", help="encoding"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "encode":
+        write_response(encode(sys.stdin.read(), args.encoding), args.encoding)
+    else:
+        data = sys.stdin.buffer.read()
+        if args.encoding == "gzip":
+            print(gzip.decompress(data).decode())
+        elif args.encoding == "msgpack":
+            print(json.dumps(unpackb(data)))
+        else:
+            print(data.decode())
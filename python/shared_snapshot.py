@@ -0,0 +1,328 @@
+import sys
+import json
+import time
+import struct
+import argparse
+from array import array
+from datetime import date
+from datetime import timedelta
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+from helper import eprint
+from helper import date_string
+from helper import open_input
+from daily_git_data import get_daily_commit_data as get_progress
+from test_completion import get_test_completion as get_test_scores
+
+# Header of a snapshot segment: magic, generation, metadata length
+HEADER = struct.Struct("<8sQQ")
+MAGIC = b"ENCOURSE"
+
+# Control segment holding the generation of the current snapshot
+CONTROL = struct.Struct("<Q")
+
+# Typecodes of the day columns, each a students by days array
+DAY_COLUMNS = {
+    "commit_count": "q",
+    "additions": "q",
+    "deletions": "q",
+    "time_spent": "d",
+}
+
+# Attempts to attach before giving up, when a snapshot is replaced mid-attach
+ATTACH_ATTEMPTS = 5
+
+
+def untrack(segment):
+    """Stops the resource tracker from unlinking **segment** when this process exits
+
+    Snapshots outlive the loader that publishes them, and workers only attach to
+    them, so neither should remove the segment on exit.
+    """
+    resource_tracker.unregister(segment._name, "shared_memory")
+
+
+def segment_name(prefix, generation):
+    """Returns the name of the data segment of **generation**"""
+    return "{}-{}".format(prefix, generation)
+
+
+def control_name(prefix):
+    """Returns the name of the control segment of **prefix**"""
+    return "{}-control".format(prefix)
+
+
+def align(offset):
+    """Rounds **offset** up to a multiple of 8 bytes"""
+    return (offset + 7) // 8 * 8
+
+
+def build_layout(commit_data, visible, hidden):
+    """Lays out the class data as a metadata dictionary and a list of arrays
+
+    **Returns**:
+        (dict, list): The metadata and a list of (name, typecode, values) arrays,
+        in the order they are stored
+
+    """
+    students = list(commit_data.keys())
+    for test_data in (visible, hidden):
+        for student in test_data:
+            if student not in commit_data and student not in students:
+                students.append(student)
+    first = None
+    last = None
+    for student in commit_data:
+        for day in commit_data[student]:
+            if day["date"] == date(1, 1, 1):
+                continue
+            first = day["date"] if first is None or day["date"] < first else first
+            last = day["date"] if last is None or day["date"] > last else last
+    day_count = (last - first).days + 1 if first is not None else 0
+
+    columns = {column: [0] * (len(students) * day_count) for column in DAY_COLUMNS}
+    for row, student in enumerate(students):
+        for day in commit_data.get(student, []):
+            if day["date"] == date(1, 1, 1):
+                continue
+            index = row * day_count + (day["date"] - first).days
+            for column in DAY_COLUMNS:
+                columns[column][index] += day[column]
+
+    metadata = {
+        "students": students,
+        "start": date_string(first) if first is not None else None,
+        "days": day_count,
+        "tests": {},
+    }
+    arrays = [(column, DAY_COLUMNS[column], columns[column]) for column in columns]
+    for kind, test_data in (("visible", visible), ("hidden", hidden)):
+        tests = []
+        for student in test_data:
+            for test in test_data[student]["tests"]:
+                if test not in tests:
+                    tests.append(test)
+        row_bytes = (len(tests) + 7) // 8
+        bitmaps = bytearray(len(students) * row_bytes)
+        for row, student in enumerate(students):
+            if student not in test_data:
+                continue
+            results = test_data[student]["tests"]
+            for index, test in enumerate(tests):
+                if results.get(test) == "P":
+                    bitmaps[row * row_bytes + index // 8] |= 1 << (index % 8)
+        metadata["tests"][kind] = tests
+        arrays.append((kind, "B", bitmaps))
+    return metadata, arrays
+
+
+def publish(prefix, commit_data, visible, hidden):
+    """Publishes the class data as a new shared memory snapshot
+
+    The snapshot is written to a new segment. Only once it is complete is the
+    generation in the control segment updated, so workers switch to it atomically.
+    The previous snapshot's name is then removed; workers still attached to it keep
+    their mapping until they detach.
+
+    **Args**:
+        |  **prefix** (str): The name shared by the snapshots of one class
+        |  **commit_data** (dict): Daily commit data, from get_daily_commit_data
+        |  **visible**, **hidden** (dict): Test data, from get_test_completion
+
+    **Returns**:
+        int: The generation of the published snapshot
+
+    """
+    try:
+        control = shared_memory.SharedMemory(control_name(prefix))
+    except FileNotFoundError:
+        control = shared_memory.SharedMemory(
+            control_name(prefix), create=True, size=CONTROL.size
+        )
+        CONTROL.pack_into(control.buf, 0, 0)
+    untrack(control)
+    previous = CONTROL.unpack_from(control.buf, 0)[0]
+    generation = previous + 1
+
+    # Array offsets are relative to the aligned end of the metadata
+    metadata, arrays = build_layout(commit_data, visible, hidden)
+    metadata["arrays"] = {}
+    size = 0
+    for name, typecode, values in arrays:
+        metadata["arrays"][name] = [typecode, size, len(values)]
+        size = align(size + struct.calcsize(typecode) * len(values))
+    encoded = json.dumps(metadata).encode()
+    data_start = align(HEADER.size + len(encoded))
+
+    segment = shared_memory.SharedMemory(
+        segment_name(prefix, generation), create=True, size=data_start + size
+    )
+    untrack(segment)
+    HEADER.pack_into(segment.buf, 0, MAGIC, generation, len(encoded))
+    segment.buf[HEADER.size : HEADER.size + len(encoded)] = encoded
+    for name, typecode, values in arrays:
+        typecode, start, length = metadata["arrays"][name]
+        start += data_start
+        view = segment.buf[start : start + struct.calcsize(typecode) * length]
+        view.cast(typecode)[:] = array(typecode, values)
+        view.release()
+    segment.close()
+
+    CONTROL.pack_into(control.buf, 0, generation)
+    control.close()
+    if previous:
+        try:
+            # unlink also unregisters the segment from the resource tracker
+            old = shared_memory.SharedMemory(segment_name(prefix, previous))
+            old.close()
+            old.unlink()
+        except FileNotFoundError:
+            pass
+    return generation
+
+
+class Snapshot:
+    """A read-only, zero-copy view of a published class snapshot
+
+    The day columns and test bitmaps are memoryviews into the shared segment, so no
+    worker holds its own copy of the class data.
+    """
+
+    def __init__(self, prefix, segment):
+        self.prefix = prefix
+        self.segment = segment
+        magic, self.generation, length = HEADER.unpack_from(segment.buf, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a class snapshot".format(segment.name))
+        metadata = json.loads(bytes(segment.buf[HEADER.size : HEADER.size + length]))
+        self.students = metadata["students"]
+        self.rows = {student: row for row, student in enumerate(self.students)}
+        self.start = (
+            date.fromisoformat(metadata["start"]) if metadata["start"] else None
+        )
+        self.days = metadata["days"]
+        self.tests = metadata["tests"]
+        buffer = segment.buf.toreadonly()
+        data_start = align(HEADER.size + length)
+        self.arrays = {}
+        for name in metadata["arrays"]:
+            typecode, start, length = metadata["arrays"][name]
+            start += data_start
+            end = start + struct.calcsize(typecode) * length
+            self.arrays[name] = buffer[start:end].cast(typecode)
+
+    def dates(self):
+        """Returns the calendar of the snapshot, one date per day column"""
+        return [self.start + timedelta(n) for n in range(self.days)]
+
+    def day_row(self, column, student):
+        """Returns a memoryview of **column** for every day of **student**"""
+        row = self.rows[student]
+        return self.arrays[column][row * self.days : (row + 1) * self.days]
+
+    def passed(self, kind, student, test):
+        """Returns True if **student** passed the **kind** ("visible" or "hidden") test"""
+        index = self.tests[kind].index(test)
+        row_bytes = (len(self.tests[kind]) + 7) // 8
+        byte = self.arrays[kind][self.rows[student] * row_bytes + index // 8]
+        return bool(byte & (1 << (index % 8)))
+
+    def is_stale(self):
+        """Returns True if a newer snapshot has been published"""
+        return current_generation(self.prefix) != self.generation
+
+    def close(self):
+        """Releases the views and detaches from the segment"""
+        for name in self.arrays:
+            self.arrays[name].release()
+        self.arrays = {}
+        self.segment.close()
+
+
+def current_generation(prefix):
+    """Returns the generation of the current snapshot of **prefix**"""
+    control = shared_memory.SharedMemory(control_name(prefix))
+    untrack(control)
+    generation = CONTROL.unpack_from(control.buf, 0)[0]
+    control.close()
+    return generation
+
+
+def attach(prefix):
+    """Attaches to the current snapshot of **prefix**
+
+    If the snapshot is replaced between reading the generation and attaching, the
+    generation is read again.
+    """
+    for attempt in range(ATTACH_ATTEMPTS):
+        generation = current_generation(prefix)
+        try:
+            segment = shared_memory.SharedMemory(segment_name(prefix, generation))
+        except FileNotFoundError:
+            time.sleep(0.01)
+            continue
+        untrack(segment)
+        return Snapshot(prefix, segment)
+    raise FileNotFoundError("No snapshot published for {}".format(prefix))
+
+
+def refresh(snapshot):
+    """Returns **snapshot**, or the newest snapshot if a newer one was published"""
+    if not snapshot.is_stale():
+        return snapshot
+    newer = attach(snapshot.prefix)
+    snapshot.close()
+    return newer
+
+
+def unlink(prefix):
+    """Removes the current snapshot and the control segment of **prefix**"""
+    generation = current_generation(prefix)
+    for name in (segment_name(prefix, generation), control_name(prefix)):
+        try:
+            segment = shared_memory.SharedMemory(name)
+        except FileNotFoundError:
+            continue
+        segment.close()
+        segment.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    publish_parser = subparsers.add_parser(
+        "publish", help="load and publish a snapshot"
+    )
+    publish_parser.add_argument("prefix", help="shared memory name prefix")
+    publish_parser.add_argument("logfile", help="path to commit log file")
+    publish_parser.add_argument("visible", help="path to visible test score file")
+    publish_parser.add_argument("hidden", help="path to hidden test score file")
+    show_parser = subparsers.add_parser("show", help="print a student's day columns")
+    show_parser.add_argument("prefix", help="shared memory name prefix")
+    show_parser.add_argument("name", help="user name")
+    unlink_parser = subparsers.add_parser("unlink", help="remove a snapshot")
+    unlink_parser.add_argument("prefix", help="shared memory name prefix")
+
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        generation = publish(
+            args.prefix,
+            get_progress(open_input(args.logfile)),
+            get_test_scores(open_input(args.visible)),
+            get_test_scores(open_input(args.hidden)),
+        )
+        eprint("Published generation {} of {}".format(generation, args.prefix))
+    elif args.command == "show":
+        snapshot = attach(args.prefix)
+        data = {"generation": snapshot.generation}
+        data["dates"] = [date_string(day) for day in snapshot.dates()]
+        for column in DAY_COLUMNS:
+            data[column] = list(snapshot.day_row(column, args.name))
+        print(json.dumps(data))
+        snapshot.close()
+    elif args.command == "unlink":
+        unlink(args.prefix)
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -0,0 +1,479 @@
+import sys
+import json
+import math
+import heapq
+import base64
+import hashlib
+import argparse
+from array import array
+from datetime import datetime
+from helper import eprint
+from helper import date_string
+from helper import open_input
+from daily_git_data import get_daily_commit_data as get_progress
+
+# Register bits of the per-student and per-day HyperLogLog sketches
+STUDENT_PRECISION = 10
+DAY_PRECISION = 7
+
+# Shape of the class-wide count-min sketch, and the number of top paths kept
+SKETCH_WIDTH = 2048
+SKETCH_DEPTH = 4
+TOP_PATHS = 20
+
+
+def hash64(item):
+    """Returns a stable 64 bit hash of the string **item**"""
+    digest = hashlib.blake2b(item.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class HyperLogLog:
+    """Estimates the number of distinct items added, in 2 ** **precision** bytes
+
+    The relative standard error of the estimate is ``1.04 / sqrt(2 ** precision)``,
+    3.3% at precision 10 and 9.2% at precision 7. Below about 2.5 items per
+    register, linear counting is used instead, which is more accurate. Sketches of
+    equal precision merge by taking the maximum of each register, and the merged
+    sketch estimates the size of the union.
+
+    **Args**:
+        **precision** (int): The number of hash bits that select a register, 4 to 16
+    """
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision=STUDENT_PRECISION, registers=None):
+        self.precision = precision
+        if registers is None:
+            registers = bytearray(1 << precision)
+        self.registers = registers
+
+    def add_hash(self, item_hash):
+        """Adds an item by its hash64"""
+        bits = 64 - self.precision
+        index = item_hash >> bits
+        rank = bits - (item_hash & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, item):
+        """Adds the string **item**"""
+        self.add_hash(hash64(item))
+
+    def count(self):
+        """Returns the estimated number of distinct items"""
+        registers = len(self.registers)
+        if registers >= 128:
+            alpha = 0.7213 / (1 + 1.079 / registers)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[registers]
+        estimate = (
+            alpha * registers * registers / sum(2.0 ** -r for r in self.registers)
+        )
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * registers and zeros:
+            estimate = registers * math.log(registers / zeros)
+        return round(estimate)
+
+    def standard_error(self):
+        """Returns the relative standard error of count"""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def merge(self, other):
+        """Adds every item of **other**, a sketch of the same precision, in place"""
+        if other.precision != self.precision:
+            raise ValueError(
+                "Cannot merge precision {} into {}".format(
+                    other.precision, self.precision
+                )
+            )
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def to_state(self):
+        """Returns the registers as a base64 string"""
+        return base64.b64encode(self.registers).decode()
+
+    @classmethod
+    def from_state(cls, state):
+        """Restores a sketch saved with to_state"""
+        registers = bytearray(base64.b64decode(state))
+        return cls(len(registers).bit_length() - 1, registers)
+
+
+class CountMinSketch:
+    """Estimates the total weight added for each item, in fixed memory
+
+    An estimate is never below the true total. With probability at least
+    ``1 - exp(-depth)``, it is above it by at most ``e / width`` times the total
+    weight of every item, about 0.13% of it for the default 2048 by 4 sketch.
+    Sketches of equal shape merge by adding their counters.
+
+    **Args**:
+        |  **width** (int): The counters per row
+        |  **depth** (int): The rows, each indexed by a different hash
+    """
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+        self.total = 0
+
+    def columns(self, item_hash):
+        """Yields the column of each row for an item's hash64"""
+        # Row hashes are combined from the two halves of one 64 bit hash
+        low = item_hash & 0xFFFFFFFF
+        high = (item_hash >> 32) | 1
+        for row in range(self.depth):
+            yield (low + row * high) % self.width
+
+    def add_hash(self, item_hash, weight=1):
+        """Adds **weight** to an item by its hash64, returning its new estimate"""
+        self.total += weight
+        estimate = None
+        for row, column in zip(self.rows, self.columns(item_hash)):
+            row[column] += weight
+            if estimate is None or row[column] < estimate:
+                estimate = row[column]
+        return estimate
+
+    def estimate_hash(self, item_hash):
+        """Returns the estimated total weight of an item by its hash64"""
+        return min(
+            row[column] for row, column in zip(self.rows, self.columns(item_hash))
+        )
+
+    def estimate(self, item):
+        """Returns the estimated total weight of the string **item**"""
+        return self.estimate_hash(hash64(item))
+
+    def error_bound(self):
+        """Returns the overestimate that is exceeded with probability exp(-depth)"""
+        return math.ceil(math.e / self.width * self.total)
+
+    def merge(self, other):
+        """Adds the counters of **other**, a sketch of the same shape, in place"""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge count-min sketches of different shapes")
+        for row, other_row in zip(self.rows, other.rows):
+            for column in range(self.width):
+                row[column] += other_row[column]
+        self.total += other.total
+
+    def to_state(self):
+        """Returns the sketch as a json-compatible dictionary"""
+        return {
+            "width": self.width,
+            "depth": self.depth,
+            "total": self.total,
+            "rows": [base64.b64encode(row.tobytes()).decode() for row in self.rows],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Restores a sketch saved with to_state"""
+        sketch = cls(state["width"], state["depth"])
+        sketch.total = state["total"]
+        for row, encoded in zip(sketch.rows, state["rows"]):
+            row[:] = array("q", base64.b64decode(encoded))
+        return sketch
+
+
+class TopPaths:
+    """Keeps the **size** items with the highest count-min estimates
+
+    Candidates are kept in a heap of (estimate, item) entries. Raising an estimate
+    pushes a new entry and leaves the old one behind, and old entries are skipped
+    when the smallest candidate is looked up, so each update is logarithmic in the
+    heap size. The heap is rebuilt once old entries make up most of it.
+    """
+
+    def __init__(self, size=TOP_PATHS):
+        self.size = size
+        self.estimates = {}
+        self.heap = []
+
+    def offer(self, item, estimate):
+        """Records **estimate** as the current estimate of **item**"""
+        if item in self.estimates:
+            self.estimates[item] = estimate
+            heapq.heappush(self.heap, (estimate, item))
+        elif len(self.estimates) < self.size:
+            self.estimates[item] = estimate
+            heapq.heappush(self.heap, (estimate, item))
+        else:
+            smallest, smallest_item = self.smallest()
+            if estimate <= smallest:
+                return
+            heapq.heappop(self.heap)
+            del self.estimates[smallest_item]
+            self.estimates[item] = estimate
+            heapq.heappush(self.heap, (estimate, item))
+        if len(self.heap) > 4 * self.size:
+            self.heap = [(estimate, item) for item, estimate in self.estimates.items()]
+            heapq.heapify(self.heap)
+
+    def smallest(self):
+        """Returns the (estimate, item) of the candidate with the lowest estimate"""
+        while self.heap[0][0] != self.estimates.get(self.heap[0][1]):
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def top(self):
+        """Returns the (item, estimate) pairs of the candidates, highest first"""
+        return sorted(self.estimates.items(), key=lambda entry: (-entry[1], entry[0]))
+
+
+class SketchCollector:
+    """Sketches distinct files and the most changed paths while parsing
+
+    An instance is passed as the **on_file** callback of get_daily_commit_data.
+    Each student gets a HyperLogLog of their distinct files, and another one per
+    day. The class gets a HyperLogLog of every distinct file, and a count-min
+    sketch of each path's additions plus deletions with the TopPaths among them.
+    Every sketch has a fixed size, however many files the class touches.
+
+    Collectors of different shards or workers are combined with merge.
+
+    **Args**:
+        |  **max_change** (int): If given, changes above it are ignored, like the
+        |      daily data ignores them
+        |  **precision**, **day_precision** (int): The precision of the student and
+        |      daily sketches
+        |  **width**, **depth** (int): The shape of the count-min sketch
+        |  **top** (int): The number of most changed paths to keep
+    """
+
+    def __init__(
+        self,
+        max_change=None,
+        precision=STUDENT_PRECISION,
+        day_precision=DAY_PRECISION,
+        width=SKETCH_WIDTH,
+        depth=SKETCH_DEPTH,
+        top=TOP_PATHS,
+    ):
+        self.max_change = int(max_change) if max_change else None
+        self.precision = precision
+        self.day_precision = day_precision
+        self.students = {}
+        self.days = {}
+        self.files = HyperLogLog(precision)
+        self.changes = CountMinSketch(width, depth)
+        self.top_paths = TopPaths(top)
+
+    def __call__(self, name, date, file_path, additions, deletions):
+        if self.max_change is not None and (
+            additions > self.max_change or deletions > self.max_change
+        ):
+            return False
+        path_hash = hash64(file_path)
+        student = self.students.get(name)
+        if student is None:
+            student = self.students[name] = HyperLogLog(self.precision)
+            self.days[name] = {}
+        student.add_hash(path_hash)
+        day = self.days[name].get(date)
+        if day is None:
+            day = self.days[name][date] = HyperLogLog(self.day_precision)
+        day.add_hash(path_hash)
+        self.files.add_hash(path_hash)
+        estimate = self.changes.add_hash(path_hash, additions + deletions)
+        self.top_paths.offer(file_path, estimate)
+        return False
+
+    def merge(self, other):
+        """Adds the sketches of **other**, a collector of the same shape, in place"""
+        for name in other.students:
+            if name in self.students:
+                self.students[name].merge(other.students[name])
+            else:
+                self.students[name] = HyperLogLog(self.precision)
+                self.students[name].merge(other.students[name])
+                self.days[name] = {}
+            for date, day in other.days[name].items():
+                if date not in self.days[name]:
+                    self.days[name][date] = HyperLogLog(self.day_precision)
+                self.days[name][date].merge(day)
+        self.files.merge(other.files)
+        self.changes.merge(other.changes)
+        # Both collectors' candidates are estimated again in the merged sketch
+        candidates = set(self.top_paths.estimates) | set(other.top_paths.estimates)
+        self.top_paths = TopPaths(self.top_paths.size)
+        for path in sorted(candidates):
+            self.top_paths.offer(path, self.changes.estimate(path))
+
+    def to_state(self):
+        """Returns every sketch as a json-compatible dictionary"""
+        return {
+            "max_change": self.max_change,
+            "precision": self.precision,
+            "day_precision": self.day_precision,
+            "students": {
+                name: {
+                    "files": self.students[name].to_state(),
+                    "days": {
+                        date_string(date): day.to_state()
+                        for date, day in self.days[name].items()
+                    },
+                }
+                for name in self.students
+            },
+            "files": self.files.to_state(),
+            "changes": self.changes.to_state(),
+            "top": self.top_paths.size,
+            "top_paths": self.top_paths.top(),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Restores a collector saved with to_state"""
+        changes = CountMinSketch.from_state(state["changes"])
+        collector = cls(
+            state["max_change"],
+            state["precision"],
+            state["day_precision"],
+            changes.width,
+            changes.depth,
+            state["top"],
+        )
+        for name, student in state["students"].items():
+            collector.students[name] = HyperLogLog.from_state(student["files"])
+            collector.days[name] = {
+                datetime.strptime(date, "%Y-%m-%d").date(): HyperLogLog.from_state(day)
+                for date, day in student["days"].items()
+            }
+        collector.files = HyperLogLog.from_state(state["files"])
+        collector.changes = changes
+        for path, estimate in state["top_paths"]:
+            collector.top_paths.offer(path, estimate)
+        return collector
+
+
+def student_report(collector, name):
+    """Returns a student's distinct file counts, overall and per day
+
+    **Returns**:
+        dict: A dictionary of the following form: ::
+
+            {
+                "files": int,
+                "standard_error": float,
+                "days": [{"date": "yyyy-mm-dd", "files": int}, ...],
+                "day_standard_error": float
+            }
+
+    """
+    days = collector.days[name]
+    return {
+        "files": collector.students[name].count(),
+        "standard_error": round(collector.students[name].standard_error(), 4),
+        "days": [
+            {"date": str(date), "files": days[date].count()} for date in sorted(days)
+        ],
+        "day_standard_error": round(1.04 / math.sqrt(1 << collector.day_precision), 4),
+    }
+
+
+def class_report(collector):
+    """Returns the class-wide distinct file count and the most changed paths
+
+    **Returns**:
+        dict: A dictionary of the following form: ::
+
+            {
+                "students": int,
+                "files": int,
+                "standard_error": float,
+                "changes": int,
+                "max_overestimate": int,
+                "top_paths": [{"path": str, "changes": int}, ...]
+            }
+
+        where each path's "changes" may be above its true total, by at most
+        "max_overestimate" with probability ``1 - exp(-depth)``.
+
+    """
+    return {
+        "students": len(collector.students),
+        "files": collector.files.count(),
+        "standard_error": round(collector.files.standard_error(), 4),
+        "changes": collector.changes.total,
+        "max_overestimate": collector.changes.error_bound(),
+        "top_paths": [
+            {"path": path, "changes": estimate}
+            for path, estimate in collector.top_paths.top()
+        ],
+    }
+
+
+def load_collector(sketch_path):
+    """Reads a collector saved by the build or merge commands"""
+    with open(sketch_path, "r") as sketch_file:
+        return SketchCollector.from_state(json.load(sketch_file))
+
+
+def save_collector(collector, sketch_path):
+    """Writes **collector** to **sketch_path** as json"""
+    with open(sketch_path, "w") as sketch_file:
+        json.dump(collector.to_state(), sketch_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    build_parser = subparsers.add_parser("build", help="sketch a commit log")
+    build_parser.add_argument("logfile", help="path to commit log file")
+    build_parser.add_argument("sketch", help="path to write the sketches to")
+    build_parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+    build_parser.add_argument(
+        "-p", "--precision", type=int, default=STUDENT_PRECISION, help="student bits"
+    )
+    build_parser.add_argument(
+        "-P", "--day-precision", type=int, default=DAY_PRECISION, help="daily bits"
+    )
+    build_parser.add_argument(
+        "-w", "--width", type=int, default=SKETCH_WIDTH, help="count-min width"
+    )
+    build_parser.add_argument(
+        "-d", "--depth", type=int, default=SKETCH_DEPTH, help="count-min depth"
+    )
+    build_parser.add_argument(
+        "-n", "--top", type=int, default=TOP_PATHS, help="most changed paths to keep"
+    )
+    merge_parser = subparsers.add_parser("merge", help="merge sketches")
+    merge_parser.add_argument("sketch", help="path to write the merged sketches to")
+    merge_parser.add_argument("inputs", nargs="+", help="paths of sketches to merge")
+    report_parser = subparsers.add_parser("report", help="report from sketches")
+    report_parser.add_argument("sketch", help="path to sketches")
+    report_parser.add_argument("name", nargs="?", help="user name, class if omitted")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        collector = SketchCollector(
+            args.limit,
+            args.precision,
+            args.day_precision,
+            args.width,
+            args.depth,
+            args.top,
+        )
+        get_progress(open_input(args.logfile), on_file=collector)
+        save_collector(collector, args.sketch)
+        eprint("Sketched {} students".format(len(collector.students)))
+    elif args.command == "merge":
+        collector = load_collector(args.inputs[0])
+        for sketch_path in args.inputs[1:]:
+            collector.merge(load_collector(sketch_path))
+        save_collector(collector, args.sketch)
+    elif args.command == "report":
+        collector = load_collector(args.sketch)
+        if args.name:
+            print(json.dumps(student_report(collector, args.name)))
+        else:
+            print(json.dumps(class_report(collector)))
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -0,0 +1,393 @@
+import sys
+import json
+import sqlite3
+import argparse
+from datetime import date
+from helper import eprint
+from helper import date_string
+from daily_git_data import get_daily_commit_data as get_progress
+from start_end import commit_data as commit_times
+from test_completion import get_test_completion as get_test_scores
+from test_completion import get_test_completion_string as test_completion_string
+import get_add_del
+import get_class_progress
+import get_git_commit_list
+import get_git_commits
+import get_individual_progress
+import get_statistics
+import get_test_summary
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS students (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS commit_days (
+    student INTEGER, position INTEGER, date TEXT, additions INTEGER,
+    deletions INTEGER, commit_count INTEGER, time_spent REAL, files TEXT
+);
+CREATE INDEX IF NOT EXISTS commit_days_student_date ON commit_days (student, date);
+CREATE TABLE IF NOT EXISTS file_changes (
+    student INTEGER, date TEXT, path TEXT, additions INTEGER, deletions INTEGER
+);
+CREATE INDEX IF NOT EXISTS file_changes_student_date ON file_changes (student, date);
+CREATE TABLE IF NOT EXISTS start_end (student INTEGER PRIMARY KEY, start TEXT, end TEXT);
+CREATE TABLE IF NOT EXISTS test_results (
+    test TEXT, student INTEGER, hidden INTEGER, result TEXT
+);
+CREATE INDEX IF NOT EXISTS test_results_test_student ON test_results (test, student);
+CREATE INDEX IF NOT EXISTS test_results_student ON test_results (student, hidden);
+CREATE TABLE IF NOT EXISTS test_totals (
+    student INTEGER, hidden INTEGER, total REAL, PRIMARY KEY (student, hidden)
+);
+"""
+
+# Rows inserted per executemany call during ingest
+BATCH_SIZE = 10000
+
+# Queries of the commit data, which depend on the limit and timeout it was loaded with
+COMMIT_ENDPOINTS = ("statistics", "add_del", "commits", "commit_list", "progress")
+
+
+def connect(database):
+    """Opens the database at **database**, creating its tables if needed"""
+    connection = sqlite3.connect(database)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def student_ids(connection, names):
+    """Returns a dictionary mapping every name in **names** to its student id"""
+    connection.executemany(
+        "INSERT OR IGNORE INTO students (name) VALUES (?)", [(name,) for name in names]
+    )
+    return dict(connection.execute("SELECT name, id FROM students"))
+
+
+def insert_batches(connection, statement, rows):
+    """Inserts **rows** with **statement** in batches of BATCH_SIZE rows"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            connection.executemany(statement, batch)
+            batch = []
+    if batch:
+        connection.executemany(statement, batch)
+
+
+def ingest_commits(connection, log_file, max_change=None, timeout=None):
+    """Loads the daily commit data and per-file changes of a commit log
+
+    Existing commit data of the students in the log is replaced. The whole load
+    runs in a single transaction.
+    """
+    changes = []
+
+    def on_file(name, day, file_path, additions, deletions):
+        changes.append((name, day, file_path, additions, deletions))
+
+    data = get_progress(
+        log_file, max_change=max_change, timeout=timeout, on_file=on_file
+    )
+    with connection:
+        ids = student_ids(connection, data.keys())
+        connection.executemany(
+            "DELETE FROM commit_days WHERE student = ?", [(ids[name],) for name in data]
+        )
+        connection.executemany(
+            "DELETE FROM file_changes WHERE student = ?",
+            [(ids[name],) for name in data],
+        )
+        insert_batches(
+            connection,
+            "INSERT INTO commit_days VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    ids[name],
+                    position,
+                    date_string(day["date"]),
+                    day["additions"],
+                    day["deletions"],
+                    day["commit_count"],
+                    day["time_spent"],
+                    json.dumps(list(day["files"])),
+                )
+                for name in data
+                for position, day in enumerate(data[name])
+            ),
+        )
+        insert_batches(
+            connection,
+            "INSERT INTO file_changes VALUES (?, ?, ?, ?, ?)",
+            (
+                (ids[name], date_string(day), file_path, additions, deletions)
+                for name, day, file_path, additions, deletions in changes
+            ),
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+            [("limit", json.dumps(max_change)), ("timeout", json.dumps(timeout))],
+        )
+
+
+def ingest_times(connection, time_file):
+    """Loads the start and end dates of a commit time file"""
+    times = commit_times(time_file)
+    with connection:
+        ids = student_ids(connection, times.keys())
+        connection.executemany(
+            "INSERT OR REPLACE INTO start_end VALUES (?, ?, ?)",
+            [(ids[name], times[name][0], times[name][1]) for name in times],
+        )
+
+
+def ingest_tests(connection, test_file, hidden):
+    """Loads the results of a visible or hidden test score file"""
+    tests = get_test_scores(test_file)
+    with connection:
+        ids = student_ids(connection, tests.keys())
+        connection.executemany(
+            "DELETE FROM test_results WHERE student = ? AND hidden = ?",
+            [(ids[name], hidden) for name in tests],
+        )
+        insert_batches(
+            connection,
+            "INSERT INTO test_results VALUES (?, ?, ?, ?)",
+            (
+                (test, ids[name], hidden, result)
+                for name in tests
+                for test, result in tests[name]["tests"].items()
+            ),
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO test_totals VALUES (?, ?, ?)",
+            [(ids[name], hidden, tests[name]["total"]) for name in tests],
+        )
+
+
+def commit_parameters(max_change=None, timeout=None):
+    """Returns **max_change** and **timeout** as get_daily_commit_data applies them"""
+    return (int(max_change) if max_change else None, float(timeout or 24))
+
+
+def check_parameters(connection, max_change=None, timeout=None):
+    """Raises ValueError unless the commit data was loaded with the same parameters
+
+    **Args**:
+        |  **max_change** (int): The limit the query is made with, as in
+        |      get_daily_commit_data
+        |  **timeout** (float): The timeout the query is made with, as in
+        |      get_daily_commit_data
+
+    """
+    meta = dict(connection.execute("SELECT key, value FROM meta"))
+    if "limit" not in meta:
+        return
+    loaded = commit_parameters(json.loads(meta["limit"]), json.loads(meta["timeout"]))
+    if loaded != commit_parameters(max_change, timeout):
+        raise ValueError(
+            "Commit data was loaded with limit {} and timeout {}, "
+            "reload it to query with limit {} and timeout {}".format(
+                *loaded, *commit_parameters(max_change, timeout)
+            )
+        )
+
+
+def student_id(connection, name):
+    """Returns the id of the student **name**, raising KeyError if it is unknown"""
+    row = connection.execute(
+        "SELECT id FROM students WHERE name = ?", (name,)
+    ).fetchone()
+    if row is None:
+        raise KeyError(name)
+    return row[0]
+
+
+def commit_days(connection, name):
+    """Returns the daily commit data of **name**, as built by get_daily_commit_data"""
+    rows = connection.execute(
+        "SELECT date, files, time_spent, additions, deletions, commit_count "
+        "FROM commit_days WHERE student = ? ORDER BY position",
+        (student_id(connection, name),),
+    )
+    days = []
+    for day, files, time_spent, additions, deletions, commit_count in rows:
+        days.append(
+            {
+                "date": date.fromisoformat(day),
+                "files": json.loads(files),
+                "time_spent": time_spent,
+                "additions": additions,
+                "deletions": deletions,
+                "commit_count": commit_count,
+            }
+        )
+    if not days:
+        raise KeyError(name)
+    return days
+
+
+def start_end_dates(connection, name):
+    """Returns the (start, end) dates of **name**, as built by start_end.commit_data"""
+    row = connection.execute(
+        "SELECT start, end FROM start_end WHERE student = ?",
+        (student_id(connection, name),),
+    ).fetchone()
+    if row is None:
+        raise KeyError(name)
+    return row
+
+
+def test_scores(connection, hidden):
+    """Returns the visible or hidden test data, as built by get_test_completion"""
+    rows = connection.execute(
+        "SELECT name, test, result FROM test_results "
+        "JOIN students ON students.id = test_results.student "
+        "WHERE hidden = ? ORDER BY test_results.rowid",
+        (hidden,),
+    )
+    tests = {}
+    for name, test, result in rows:
+        tests.setdefault(name, {"tests": {}, "total": 0})["tests"][test] = result
+    totals = connection.execute(
+        "SELECT name, total FROM test_totals "
+        "JOIN students ON students.id = test_totals.student WHERE hidden = ?",
+        (hidden,),
+    )
+    for name, total in totals:
+        tests.setdefault(name, {"tests": {}, "total": 0})["total"] = total
+    return tests
+
+
+def query_statistics(connection, name, test_string):
+    """Returns the json of get_statistics.py for **name**"""
+    totals = connection.execute(
+        "SELECT SUM(additions), SUM(deletions), SUM(commit_count), SUM(time_spent) "
+        "FROM commit_days WHERE student = ?",
+        (student_id(connection, name),),
+    ).fetchone()
+    stats = {}
+    if totals[0] is not None:
+        stats[name] = {
+            "additions": totals[0],
+            "deletions": totals[1],
+            "commit_count": totals[2],
+            "time_spent": totals[3],
+        }
+    dates = {name: start_end_dates(connection, name)}
+    tests = test_completion_string(test_string)
+    data = get_statistics.combine_statistics(dates, stats, tests)
+    return json.dumps(data[name])
+
+
+def query_add_del(connection, name):
+    """Returns the json of get_add_del.py for **name**"""
+    reformatted_data = get_add_del.reformat(commit_days(connection, name))
+    return get_add_del.jsonify_data(reformatted_data, start_end_dates(connection, name))
+
+
+def query_commits(connection, name):
+    """Returns the json of get_git_commits.py for **name**"""
+    return get_git_commits.jsonify(commit_days(connection, name))
+
+
+def query_commit_list(connection, name):
+    """Returns the json of the /commitList data for **name**"""
+    return get_git_commit_list.jsonify({name: commit_days(connection, name)})
+
+
+def query_progress(connection, name):
+    """Returns the json of get_individual_progress.py for **name**"""
+    reformatted_data = get_individual_progress.extract_changes(
+        commit_days(connection, name)
+    )
+    api_formatted_data = get_individual_progress.jsonify(
+        reformatted_data, start_end_dates(connection, name)
+    )
+    return json.dumps(api_formatted_data)
+
+
+def query_test_summary(connection):
+    """Returns the json of get_test_summary.py"""
+    formatted_visible = get_test_summary.jsonify(test_scores(connection, False), False)
+    formatted_hidden = get_test_summary.jsonify(test_scores(connection, True), True)
+    return get_test_summary.merge_data(formatted_visible, formatted_hidden)
+
+
+def query_class_progress(connection):
+    """Returns the json of get_class_progress.py"""
+    histograms = []
+    for hidden in (False, True):
+        totals = connection.execute(
+            "SELECT student, total FROM test_totals WHERE hidden = ?", (hidden,)
+        )
+        histograms.append(
+            get_class_progress.jsonify(
+                {student: {"total": total} for student, total in totals}
+            )
+        )
+    return get_class_progress.merge_data(histograms[0], histograms[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+
+    ingest_parser = subparsers.add_parser("ingest", help="load input files")
+    ingest_parser.add_argument("database", help="path to sqlite database")
+    ingest_parser.add_argument("--log", help="path to commit log file")
+    ingest_parser.add_argument("--times", help="path to commit time file")
+    ingest_parser.add_argument("--visible", help="path to visible test score file")
+    ingest_parser.add_argument("--hidden", help="path to hidden test score file")
+    ingest_parser.add_argument("-t", "--timeout", help="time spent timeout")
+    ingest_parser.add_argument("-l", "--limit", help="ignore file changes above limit")
+
+    for endpoint in COMMIT_ENDPOINTS:
+        endpoint_parser = subparsers.add_parser(endpoint, help="query " + endpoint)
+        endpoint_parser.add_argument("database", help="path to sqlite database")
+        endpoint_parser.add_argument("name", help="user name")
+        if endpoint == "statistics":
+            endpoint_parser.add_argument("tests", help="test case string")
+        endpoint_parser.add_argument("-t", "--timeout", help="time spent timeout")
+        endpoint_parser.add_argument(
+            "-l", "--limit", help="ignore file changes above limit"
+        )
+    for endpoint in ("test_summary", "class_progress"):
+        endpoint_parser = subparsers.add_parser(endpoint, help="query " + endpoint)
+        endpoint_parser.add_argument("database", help="path to sqlite database")
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
+
+    connection = connect(args.database)
+    if args.command in COMMIT_ENDPOINTS:
+        try:
+            check_parameters(connection, args.limit, args.timeout)
+        except ValueError as error:
+            eprint(error)
+            sys.exit(1)
+    if args.command == "ingest":
+        if args.log:
+            ingest_commits(connection, args.log, args.limit, args.timeout)
+        if args.times:
+            ingest_times(connection, args.times)
+        if args.visible:
+            ingest_tests(connection, args.visible, False)
+        if args.hidden:
+            ingest_tests(connection, args.hidden, True)
+        eprint("Loaded inputs into {}".format(args.database))
+    elif args.command == "statistics":
+        print(query_statistics(connection, args.name, args.tests))
+    elif args.command == "add_del":
+        print(query_add_del(connection, args.name))
+    elif args.command == "commits":
+        print(query_commits(connection, args.name))
+    elif args.command == "commit_list":
+        print(query_commit_list(connection, args.name))
+    elif args.command == "progress":
+        print(query_progress(connection, args.name))
+    elif args.command == "test_summary":
+        print(query_test_summary(connection))
+    elif args.command == "class_progress":
+        print(query_class_progress(connection))
@@ -1,14 +1,18 @@
 import sys
+from helper import input_file
+from helper import preloadable
 
 
-def commit_data(time_file):
+@preloadable("commit times")
+def commit_data(time_file, directory=None):
     """Generates commit time data for all users
 
     Takes in a specially formatted file generated by git commands, and stores the data
     from it into an eaily accessible python dictionary.
 
     **Args**
-        **time_file** (file): A specially formatted file generated from a bash script.
+        **time_file** (file): A specially formatted file generated from a bash script,
+        or a path to a plain, .gz, .bz2 or .xz copy of it.
         A small example of the formatting follows: ::
             
             Start name1
@@ -16,6 +20,9 @@ def commit_data(time_file):
                  25 2018-08-30
             End name1
 
+        **directory** (StudentDirectory): If given, students are interned into
+        **directory** and the result is a StudentColumn indexed by their IDs.
+
     **Returns**: 
         dict: A dictionary that maps students to a tuple of start and end dates.
         The dictionary is of the following form: ::
@@ -26,9 +33,10 @@ def commit_data(time_file):
             }
 
     """
+    time_file = input_file(time_file)
     line = time_file.readline()
     line = line.lstrip(" ").rstrip("\n")
-    users = {}
+    users = directory.column("commit times") if directory is not None else {}
     current_name = ""
     previous_words = []
     while line != "":
@@ -37,6 +45,8 @@ def commit_data(time_file):
         if words[0] == "Start":
             # Update the current user
             current_name = words[1]
+            if directory is not None:
+                directory.claim(current_name, "commit times")
             line = time_file.readline()
             line = line.lstrip(" ").rstrip("\n")
             words = line.split(" ")
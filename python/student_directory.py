@@ -0,0 +1,147 @@
+from helper import eprint
+
+
+class StudentDirectory:
+    """Interns student names into dense integer IDs shared by every parser
+
+    The first name interned gets ID 0, the next new name ID 1, and so on. Parsers
+    given a directory store their results in StudentColumn objects, which are lists
+    indexed by student ID, so results from different input files can be joined by
+    indexing instead of by name. Parsers claim each student when a student's entry
+    starts, so a student appearing twice in one input is reported right away.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.claimed = {}
+        self.duplicates = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """Returns the ID of **name**, giving it the next free ID if it is new"""
+        student_id = self.ids.get(name)
+        if student_id is None:
+            student_id = len(self.names)
+            self.ids[name] = student_id
+            self.names.append(name)
+        return student_id
+
+    def claim(self, name, source):
+        """Interns **name** and reports a duplicate if **source** already claimed it"""
+        student_id = self.intern(name)
+        claimed = self.claimed.setdefault(source, set())
+        if student_id in claimed:
+            self.duplicates.append((name, source))
+            eprint("Multiple entries for user {} in {}".format(name, source))
+        claimed.add(student_id)
+        return student_id
+
+    def column(self, source):
+        """Creates an empty StudentColumn for the data parsed from **source**"""
+        return StudentColumn(self, source)
+
+
+# Marks the IDs of a column that have no value
+MISSING = object()
+
+
+class StudentColumn:
+    """A list of per-student values indexed by StudentDirectory ID
+
+    Supports the dictionary operations the parsers and endpoints use, with student
+    names as keys, so it can take the place of a dictionary keyed by name.
+    """
+
+    def __init__(self, directory, source):
+        self.directory = directory
+        self.source = source
+        self.values = []
+
+    def __setitem__(self, name, value):
+        student_id = self.directory.intern(name)
+        if student_id >= len(self.values):
+            self.values.extend([MISSING] * (student_id + 1 - len(self.values)))
+        self.values[student_id] = value
+
+    def __getitem__(self, name):
+        value = self.get(name, MISSING)
+        if value is MISSING:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return self.get(name, MISSING) is not MISSING
+
+    def __iter__(self):
+        names = self.directory.names
+        for student_id in self.student_ids():
+            yield names[student_id]
+
+    def __len__(self):
+        return sum(1 for value in self.values if value is not MISSING)
+
+    def at(self, student_id, default=None):
+        """Returns the value of the student with ID **student_id**"""
+        if student_id < len(self.values) and self.values[student_id] is not MISSING:
+            return self.values[student_id]
+        return default
+
+    def get(self, name, default=None):
+        """Returns the value of the student **name**"""
+        return self.at(self.directory.ids.get(name, len(self.values)), default)
+
+    def student_ids(self):
+        """Yields the ID of every student with a value, in ID order"""
+        for student_id, value in enumerate(self.values):
+            if value is not MISSING:
+                yield student_id
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        names = self.directory.names
+        return [
+            (names[student_id], self.values[student_id])
+            for student_id in self.student_ids()
+        ]
+
+
+def join_students(primary, *columns):
+    """Joins per-student data to the students of **primary**
+
+    When **primary** is a StudentColumn, every column sharing its directory is
+    joined by student ID. Otherwise every value is looked up by name.
+
+    **Args**:
+        |  **primary** (dict or StudentColumn): The data that selects the students
+        |  **columns** (dict or StudentColumn): Data to join to each student
+
+    **Returns**:
+        list: A list of tuples of the form ``(name, primary value, value, ...)``, where
+        the value is None for a student without data in that column
+
+    """
+    rows = []
+    if isinstance(primary, StudentColumn):
+        names = primary.directory.names
+        for student_id in primary.student_ids():
+            row = [names[student_id], primary.values[student_id]]
+            for column in columns:
+                if (
+                    isinstance(column, StudentColumn)
+                    and column.directory is primary.directory
+                ):
+                    row.append(column.at(student_id))
+                else:
+                    row.append(column.get(names[student_id]))
+            rows.append(tuple(row))
+    else:
+        for name in primary.keys():
+            rows.append(
+                (name, primary[name]) + tuple(column.get(name) for column in columns)
+            )
+    return rows
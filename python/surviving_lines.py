@@ -0,0 +1,445 @@
+import os
+import re
+import sys
+import json
+import pickle
+import argparse
+import subprocess
+from array import array
+from datetime import datetime
+from datetime import timedelta
+from collections import Counter
+from helper import eprint
+from helper import input_file
+from helper import daterange
+from helper import date_string
+from response_cache import atomic_write
+
+# git log arguments that print one repository's patches in the patch log format
+LOG_ARGUMENTS = [
+    "log",
+    "--reverse",
+    "--first-parent",
+    "--diff-merges=first-parent",
+    "-p",
+    "-U0",
+    "--format=%n%ad %H",
+    "--date=format:%Y-%m-%d %H:%M:%S",
+]
+
+# Origin of starter code lines, which count towards no day
+STARTER = 0
+
+# Header line of a commit, its date, time and hash
+COMMIT_PATTERN = re.compile(r"^(\d{4}-\d\d-\d\d) \d\d:\d\d:\d\d ([0-9a-f]+)$")
+
+# Hunk header, the start and length of the hunk before and after the commit
+HUNK_PATTERN = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def patch_path(path):
+    """Returns the path of a ---, +++, rename or diff header, None for /dev/null"""
+    # git ends the ---, +++ paths containing spaces with a tab
+    path = path.rstrip("\n").rstrip("\t")
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    if path == "/dev/null":
+        return None
+    if path.startswith("a/") or path.startswith("b/"):
+        return path[2:]
+    return path
+
+
+def diff_paths(paths):
+    """Returns the old and new paths of a diff --git header
+
+    Both are the same path unless the file is renamed, when the rename lines give
+    the paths instead, so paths containing spaces split where both halves match.
+    """
+    middle = len(paths) // 2
+    if paths[middle] == " " and paths[2:middle] == paths[middle + 3 :]:
+        path = patch_path(paths[:middle])
+        return [path, path]
+    old_path, separator, new_path = paths.partition(" b/")
+    return [patch_path(old_path), patch_path("b/" + new_path)]
+
+
+def parse_commits(lines):
+    """Yields every commit of git log output printed with LOG_ARGUMENTS
+
+    Only the hunk headers of each patch are kept. The changed lines themselves are
+    skipped, counted off against the hunk header, so no line of a file is ever
+    mistaken for a header.
+
+    **Args**:
+        **lines** (iterable): The lines of the output
+
+    **Yields**:
+        **tuple**: The date and hash of a commit, and the list of its file patches,
+        each an [old path, new path, hunks] list where a created file has no old
+        path, a deleted file no new path, and each hunk is an (old start, old
+        length, new start, new length) tuple
+
+    """
+    commit = None
+    patch = None
+    remaining = 0
+    for line in lines:
+        if remaining:
+            if not line.startswith("\\"):
+                remaining -= 1
+            continue
+        if line.startswith("@@"):
+            match = HUNK_PATTERN.match(line)
+            old_length = int(match.group(2)) if match.group(2) is not None else 1
+            new_length = int(match.group(4)) if match.group(4) is not None else 1
+            hunk = (int(match.group(1)), old_length, int(match.group(3)), new_length)
+            patch[2].append(hunk)
+            remaining = old_length + new_length
+        elif line.startswith("diff --git "):
+            patch = diff_paths(line[len("diff --git ") :].rstrip("\n")) + [[]]
+            commit[2].append(patch)
+        elif line.startswith("--- "):
+            patch[0] = patch_path(line[4:])
+        elif line.startswith("+++ "):
+            patch[1] = patch_path(line[4:])
+        elif line.startswith("new file mode"):
+            patch[0] = None
+        elif line.startswith("deleted file mode"):
+            patch[1] = None
+        elif line.startswith("rename from "):
+            patch[0] = patch_path(line[len("rename from ") :])
+        elif line.startswith("rename to "):
+            patch[1] = patch_path(line[len("rename to ") :])
+        else:
+            match = COMMIT_PATTERN.match(line.rstrip("\n"))
+            if match is not None:
+                if commit is not None:
+                    yield tuple(commit)
+                date = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+                commit = [date, match.group(2), []]
+                patch = None
+    if commit is not None:
+        yield tuple(commit)
+
+
+def iter_patch_log(patch_file, names=None):
+    """Yields every student entry of a patch log with its commits
+
+    **Args**:
+        **patch_file** (file): A patch log, or a path to a plain, .gz, .bz2 or .xz
+        patch log, which frames the git log output of each student's repository
+        like the commit log. It is generated by running, in each repository: ::
+
+            echo "Start name1"
+            git log --reverse --first-parent --diff-merges=first-parent -p -U0 \\
+                --format="%n%ad %H" --date=format:"%Y-%m-%d %H:%M:%S"
+            echo "End name1"
+
+        **names** (set): If given, only the entries of these students are parsed,
+        and the lines of every other entry are skipped as they are read
+
+    **Yields**:
+        **tuple**: The name of a student and a list of their commits, as yielded by
+        parse_commits
+
+    """
+    patch_file = input_file(patch_file)
+    name = None
+    lines = []
+    for line in patch_file:
+        if line.startswith("Start "):
+            name = line[len("Start ") :].strip()
+            if names is not None and name not in names:
+                name = None
+            lines = []
+        elif line.startswith("End ") and name is not None:
+            yield name, list(parse_commits(lines))
+            name = None
+        elif name is not None:
+            lines.append(line)
+
+
+class LineOwnership:
+    """The origin of every line in one student's repository, kept up to date commit
+    by commit
+
+    Each file is an array with one origin per line, the day the line was written.
+    A commit only touches the files it changes, and within them only the lines its
+    hunks replace, so the work done is proportional to the size of the diffs
+    rather than the size of the repository. The number of lines surviving from
+    each origin is kept alongside, so counting them never walks the files.
+
+    **Args**:
+        **starter** (bool): Whether the first commit is starter code, whose lines
+        are not the student's work
+
+    """
+
+    def __init__(self, starter=False):
+        self.starter = starter
+        self.head = None
+        self.commit_count = 0
+        self.files = {}
+        self.dates = [None]
+        self.origins = {}
+        self.counts = [0]
+
+    def origin(self, date):
+        """Returns the origin of lines written on **date**, adding it if new"""
+        origin = self.origins.get(date)
+        if origin is None:
+            origin = len(self.dates)
+            self.origins[date] = origin
+            self.dates.append(date)
+            self.counts.append(0)
+        return origin
+
+    def apply(self, commit):
+        """Updates the ownership of the lines changed by **commit**
+
+        **Args**:
+            **commit** (tuple): A commit, as yielded by parse_commits
+
+        """
+        date, commit_hash, patches = commit
+        if self.starter and self.commit_count == 0:
+            origin = STARTER
+        else:
+            origin = self.origin(date)
+        counts = self.counts
+        for old_path, new_path, hunks in patches:
+            lines = self.files.pop(old_path, None) if old_path is not None else None
+            if lines is None:
+                lines = array("i")
+            for old_start, old_length, new_start, new_length in hunks:
+                # Hunks are in order, so the lines before each are already in the
+                # numbering after the commit
+                start = new_start - 1 if new_length else new_start
+                if old_length:
+                    for removed, count in Counter(
+                        lines[start : start + old_length]
+                    ).items():
+                        counts[removed] -= count
+                lines[start : start + old_length] = array("i", [origin]) * new_length
+                counts[origin] += new_length
+            if new_path is not None:
+                self.files[new_path] = lines
+            else:
+                # Deleted files without hunks, like empty files, have no lines left
+                for removed, count in Counter(lines).items():
+                    counts[removed] -= count
+        self.head = commit_hash
+        self.commit_count += 1
+
+    def surviving(self):
+        """Returns the lines surviving from each day, as a dictionary of dates"""
+        days = {}
+        for origin in range(STARTER + 1, len(self.dates)):
+            if self.counts[origin]:
+                days[self.dates[origin]] = self.counts[origin]
+        return days
+
+    def daily_series(self):
+        """Returns the lines written by each day that survive in the last commit
+
+        **Returns**:
+            list: A list of entries, one per day from the first day with surviving
+            lines to the last, of the following form: ::
+
+                {
+                    "date": "yyyy-mm-dd",
+                    "surviving": int
+                }
+
+        """
+        days = self.surviving()
+        if not days:
+            return []
+        series = []
+        total = 0
+        first = min(days)
+        last = max(days)
+        for day in daterange(first, last + timedelta(1)):
+            total += days.get(day, 0)
+            series.append({"date": date_string(day), "surviving": total})
+        return series
+
+    def progress(self, times):
+        """Returns /progress entries measuring the lines surviving in the last commit
+
+        Unlike get_individual_progress.jsonify, which counts additions minus
+        deletions, code rewritten later counts only once, and progress is never
+        negative.
+
+        **Args**:
+            **times** (str, str): The start and end dates, as in jsonify
+
+        **Returns**:
+            list: Entries like those of jsonify, where the progress of a day is the
+            percentage of surviving lines written by that day
+
+        """
+        days = self.surviving()
+        total = sum(days.values())
+        start = datetime.strptime(times[0], "%Y-%m-%d").date()
+        end = datetime.strptime(times[1], "%Y-%m-%d").date()
+        # Lines written before the start count from the first day
+        written = sum(days[day] for day in days if day < start)
+        daily_data = []
+        for day in daterange(start, end):
+            written += days.get(day, 0)
+            progress = round(written / total * 100) if total else 0
+            daily_data.append({"date": date_string(day), "progress": progress})
+        return daily_data
+
+
+class SurvivingLines:
+    """Line ownership of every student, updated incrementally from new commits
+
+    The last commit applied is kept per student, so updating from a patch log or a
+    repository only applies the commits after it.
+    """
+
+    def __init__(self, starter=False):
+        self.starter = starter
+        self.students = {}
+
+    def update(self, name, commits):
+        """Applies the commits of **name** after the last one applied
+
+        If the last commit applied is not among **commits**, the history was
+        rewritten, and the student's ownership is rebuilt from every commit.
+
+        **Returns**:
+            int: The number of commits applied
+
+        """
+        ownership = self.students.get(name)
+        if ownership is not None and ownership.head is not None:
+            hashes = [commit[1] for commit in commits]
+            if ownership.head in hashes:
+                commits = commits[hashes.index(ownership.head) + 1 :]
+            else:
+                ownership = None
+        if ownership is None:
+            ownership = self.students[name] = LineOwnership(self.starter)
+        for commit in commits:
+            ownership.apply(commit)
+        return len(commits)
+
+    def add_patch_log(self, patch_file, names=None):
+        """Updates every student of a patch log, returning the commits applied
+
+        **Args**:
+            **names** (set): If given, only these students are updated
+
+        """
+        applied = 0
+        for name, commits in iter_patch_log(patch_file, names):
+            applied += self.update(name, commits)
+        return applied
+
+    def add_repository(self, name, repository):
+        """Updates **name** from the git repository at **repository**
+
+        Only the commits after the last one applied are read from git, and each is
+        applied as git prints it.
+
+        **Returns**:
+            int: The number of commits applied
+
+        """
+        ownership = self.students.get(name)
+        revisions = ["HEAD"]
+        if ownership is not None and ownership.head is not None:
+            check = subprocess.run(
+                ["git", "-C", repository, "merge-base", "--is-ancestor"]
+                + [ownership.head, "HEAD"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            if check.returncode == 0:
+                revisions = ["{}..HEAD".format(ownership.head)]
+            else:
+                ownership = None
+        if ownership is None:
+            ownership = self.students[name] = LineOwnership(self.starter)
+        process = subprocess.Popen(
+            ["git", "-C", repository] + LOG_ARGUMENTS + revisions,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            errors="replace",
+        )
+        applied = 0
+        for commit in parse_commits(process.stdout):
+            ownership.apply(commit)
+            applied += 1
+        process.stdout.close()
+        if process.wait() != 0:
+            eprint("git log failed in {}".format(repository))
+        return applied
+
+
+def load_lines(cache_path, starter=False):
+    """Returns the line ownership stored at **cache_path**, or an empty one
+
+    Ownership stored with a different **starter** setting is not used.
+    """
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "rb") as cache_file:
+            try:
+                lines = pickle.load(cache_file)
+            except (pickle.UnpicklingError, EOFError):
+                lines = None
+        if isinstance(lines, SurvivingLines) and lines.starter == starter:
+            return lines
+    return SurvivingLines(starter)
+
+
+def save_lines(cache_path, lines):
+    """Stores the line ownership **lines** at **cache_path**"""
+    atomic_write(os.path.abspath(cache_path), pickle.dumps(lines))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    log_parser = subparsers.add_parser("log", help="read a patch log")
+    log_parser.add_argument("patchlog", help="path to patch log file")
+    repos_parser = subparsers.add_parser("repos", help="read student repositories")
+    repos_parser.add_argument(
+        "repositories", nargs="+", help="paths to repositories, named by directory"
+    )
+    for subparser in (log_parser, repos_parser):
+        subparser.add_argument("-c", "--cache", help="path to line ownership cache")
+        subparser.add_argument(
+            "-s", "--starter", action="store_true", help="first commit is starter code"
+        )
+        subparser.add_argument("-n", "--name", help="user name, everyone if omitted")
+
+    args = parser.parse_args()
+
+    if args.command not in ("log", "repos"):
+        parser.print_help()
+        sys.exit(1)
+    lines = load_lines(args.cache, args.starter)
+    if args.command == "log":
+        applied = lines.add_patch_log(args.patchlog)
+    else:
+        applied = 0
+        for repository in args.repositories:
+            name = os.path.basename(os.path.abspath(repository))
+            applied += lines.add_repository(name, repository)
+    eprint("Applied {} commits".format(applied))
+    if args.cache:
+        save_lines(args.cache, lines)
+
+    if args.name is not None:
+        if args.name not in lines.students:
+            eprint("No patch log or repository entry for {}".format(args.name))
+            sys.exit(1)
+        print(json.dumps(lines.students[args.name].daily_series()))
+    else:
+        series = {name: lines.students[name].daily_series() for name in lines.students}
+        print(json.dumps(series))
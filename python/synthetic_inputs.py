@@ -0,0 +1,132 @@
+import random
+import argparse
+from datetime import datetime
+from datetime import timedelta
+
+# Files touched by synthetic commits, binary files show up as "-" in numstat
+FILE_NAMES = [
+    "src/main.c",
+    "src/util.c",
+    "src/util.h",
+    "src/parser.c",
+    "src/parser.h",
+    "tests/test_main.c",
+    "tests/test_parser.c",
+    "README.md",
+    "Makefile",
+    "lib/data.bin",
+]
+
+
+def generate_class(students, commits=40, tests=20, seed=0, start=None):
+    """Generates a synthetic class with commits and test results
+
+    **Args**:
+        |  **students** (int): The number of students in the class
+        |  **commits** (int): The maximum number of commits per student
+        |  **tests** (int): The number of test cases
+        |  **seed** (int): The random seed, equal seeds generate equal classes
+        |  **start** (datetime): The earliest possible commit time
+
+    **Returns**:
+        dict: A dictionary mapping students to their commits and tests: ::
+
+            {
+                "name1": {
+                    "commits": [
+                        (datetime, "hash", [(additions, deletions, "path"), ...]),
+                        ...
+                    ],
+                    "visible": {"Test1": ("P" or "F"), ...},
+                    "hidden": {"Test1": ("P" or "F"), ...}
+                },
+                ...
+            }
+
+    """
+    generator = random.Random(seed)
+    if start is None:
+        start = datetime(2018, 8, 20, 9)
+    test_names = ["Test{}".format(n) for n in range(1, tests + 1)]
+    data = {}
+    for student in range(students):
+        name = "student{}".format(student)
+        time = start + timedelta(minutes=generator.randint(0, 2880))
+        student_commits = []
+        for commit in range(generator.randint(1, commits)):
+            time += timedelta(minutes=generator.randint(5, 3000))
+            changes = []
+            for path in generator.sample(FILE_NAMES, generator.randint(1, 4)):
+                if path.endswith(".bin"):
+                    changes.append(("-", "-", path))
+                else:
+                    changes.append(
+                        (generator.randint(0, 300), generator.randint(0, 100), path)
+                    )
+            student_commits.append(
+                (time, "{:040x}".format(generator.getrandbits(160)), changes)
+            )
+        data[name] = {
+            "commits": student_commits,
+            "visible": {test: generator.choice("PF") for test in test_names},
+            "hidden": {
+                test: generator.choice("PPF") for test in test_names[: tests // 2]
+            },
+        }
+    return data
+
+
+def write_commit_log(class_data, log_file):
+    """Writes the commits of **class_data** in the commit log format"""
+    for name in class_data:
+        log_file.write("Start {}\n".format(name))
+        for time, commit_hash, changes in class_data[name]["commits"]:
+            log_file.write(
+                "\n{} {} {}\n".format(
+                    time.strftime("%Y-%m-%d"), time.strftime("%H:%M:%S"), commit_hash
+                )
+            )
+            for additions, deletions, path in changes:
+                log_file.write("{}\t{}\t{}\n".format(additions, deletions, path))
+        log_file.write("End {}\n".format(name))
+
+
+def write_commit_times(class_data, time_file):
+    """Writes the commit counts per day of **class_data** in the commit time format"""
+    for name in class_data:
+        counts = {}
+        for time, commit_hash, changes in class_data[name]["commits"]:
+            date = time.strftime("%Y-%m-%d")
+            counts[date] = counts.get(date, 0) + 1
+        time_file.write("Start {}\n".format(name))
+        for date in sorted(counts):
+            time_file.write("{:>6} {}\n".format(counts[date], date))
+        time_file.write("End {}\n".format(name))
+
+
+def write_test_scores(class_data, test_file, kind="visible"):
+    """Writes the **kind** test results of **class_data** in the test score format"""
+    for name in class_data:
+        tests = class_data[name][kind]
+        results = ["{}:{}".format(test, tests[test]) for test in tests]
+        test_file.write(";".join([name] + results) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("prefix", help="path prefix for the generated files")
+    parser.add_argument("-s", "--students", type=int, default=100, help="class size")
+    parser.add_argument("-c", "--commits", type=int, default=40, help="max commits")
+    parser.add_argument("-t", "--tests", type=int, default=20, help="test count")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+
+    args = parser.parse_args()
+
+    class_data = generate_class(args.students, args.commits, args.tests, args.seed)
+    with open(args.prefix + "log.txt", "w") as log_file:
+        write_commit_log(class_data, log_file)
+    with open(args.prefix + "times.txt", "w") as time_file:
+        write_commit_times(class_data, time_file)
+    for kind in ("visible", "hidden"):
+        with open(args.prefix + kind + ".txt", "w") as test_file:
+            write_test_scores(class_data, test_file, kind)
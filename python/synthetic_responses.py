@@ -0,0 +1,239 @@
+import json
+import random
+import argparse
+from datetime import date
+from datetime import timedelta
+from synthetic_inputs import FILE_NAMES
+
+# Default class profile, about the size of a large programming course
+CLASS_SIZE = 400
+TERM_DAYS = 112
+TEST_COUNT = 30
+
+# First day of a synthetic term
+TERM_START = date(2018, 8, 20)
+
+
+class SyntheticClass:
+    """Generates the parsed inputs of the endpoints for a synthetic class
+
+    Every method returns data of the same shape as the parser it stands in for,
+    so the endpoints format, cache and encode it exactly like real data. Nothing is
+    read from or written to disk. Each student's data is generated from the seed
+    and the student's name alone, so a single student costs a pass over the term's
+    days, and any name, in the class or not, gets the same data on every request.
+    Data of the whole class is generated once per instance.
+    Random draws are scaled from ``random()`` rather than drawn with ``randint``,
+    which is several times slower.
+
+    **Args**:
+        |  **seed** (int): The random seed, equal seeds generate equal classes
+        |  **students** (int): The class size, of students named student0, student1...
+        |  **days** (int): The length of the term in days
+        |  **tests** (int): The number of visible test cases. There are half as many
+        |      hidden test cases.
+    """
+
+    def __init__(self, seed=0, students=CLASS_SIZE, days=TERM_DAYS, tests=TEST_COUNT):
+        self.seed = seed
+        self.students = students
+        self.days = days
+        self.tests = tests
+        self.class_data = {}
+        self.recent = None
+
+    def profile(self):
+        """Returns the parameters that determine the generated data"""
+        return [self.seed, self.students, self.days, self.tests]
+
+    def names(self):
+        """Returns the names of the students in the class"""
+        return ["student{}".format(n) for n in range(self.students)]
+
+    def generator(self, name, kind):
+        """Returns the random generator of one kind of data of one student"""
+        return random.Random("{}:{}:{}".format(self.seed, kind, name))
+
+    def skill(self, name):
+        """Returns a number from 0 to 1 that scales a student's activity and scores"""
+        return self.generator(name, "skill").random()
+
+    def student_days(self, name):
+        """Returns a student's days, as in the lists of get_daily_commit_data"""
+        if self.recent is not None and self.recent[0] == name:
+            return self.recent[1]
+        generator = self.generator(name, "commits")
+        draw = generator.random
+        activity = 0.15 + 0.5 * self.skill(name)
+        # Students start a little late and finish a little early
+        first = int(draw() * (self.days // 8 + 1))
+        last = self.days - 1 - int(draw() * (self.days // 8 + 1))
+        days = []
+        for offset in range(first, last + 1):
+            if offset != first and offset != last and draw() >= activity:
+                continue
+            commits = 1 + int(draw() * 6)
+            additions = commits * (5 + int(draw() * 115))
+            day = {
+                "date": TERM_START + timedelta(offset),
+                "files": tuple(generator.sample(FILE_NAMES, 1 + int(draw() * 3))),
+                "time_spent": float(int(draw() * 2400) * (commits - 1)),
+                "additions": additions,
+                "deletions": int(additions * (0.05 + 0.55 * draw())),
+                "commit_count": commits,
+            }
+            days.append(day)
+        # Endpoints needing both the days and the start and end reuse the days
+        self.recent = (name, days)
+        return days
+
+    def whole_class(self, kind, generate, names):
+        """Applies **generate** to each of **names**, or to the class if it is None"""
+        if names is not None:
+            return {name: generate(name) for name in names}
+        if kind not in self.class_data:
+            self.class_data[kind] = {name: generate(name) for name in self.names()}
+        return self.class_data[kind]
+
+    def commit_data(self, names=None):
+        """Returns data of the form of get_daily_commit_data
+
+        **Args**:
+            **names** (list): The students to generate, or None for the whole class
+
+        """
+        return self.whole_class("commits", self.student_days, names)
+
+    def commit_times(self, names=None):
+        """Returns data of the form of start_end.commit_data, matching commit_data"""
+
+        def start_end(name):
+            days = self.student_days(name)
+            return (days[0]["date"].isoformat(), days[-1]["date"].isoformat())
+
+        return self.whole_class("times", start_end, names)
+
+    def test_scores(self, hidden=False, names=None):
+        """Returns data of the form of get_test_completion
+
+        **Args**:
+            |  **hidden** (bool): True for the hidden test cases
+            |  **names** (list): The students to generate, or None for the whole class
+
+        """
+        kind = "hidden" if hidden else "visible"
+        count = self.tests // 2 if hidden else self.tests
+
+        def student_tests(name):
+            generator = self.generator(name, kind)
+            chance = 0.2 + 0.75 * self.skill(name)
+            tests = {}
+            for n in range(1, count + 1):
+                tests["Test{}".format(n)] = "P" if generator.random() < chance else "F"
+            passed = sum(1 for result in tests.values() if result == "P")
+            total = passed * 100 / len(tests) if tests else 0
+            return {"tests": tests, "total": total}
+
+        return self.whole_class(kind, student_tests, names)
+
+    def replay_files(self, on_file, names=None):
+        """Calls an **on_file** callback of get_daily_commit_data for every day's files
+
+        The day's changes are split evenly between its files.
+        """
+        commit_data = self.commit_data(names)
+        for name in commit_data:
+            for day in commit_data[name]:
+                files = len(day["files"])
+                for file_path in day["files"]:
+                    on_file(
+                        name,
+                        day["date"],
+                        file_path,
+                        day["additions"] // files,
+                        day["deletions"] // files,
+                    )
+
+
+def day_count(text):
+    """Parses a synthetic term length, which needs at least one day"""
+    days = int(text)
+    if days < 1:
+        raise argparse.ArgumentTypeError("term must last at least 1 day")
+    return days
+
+
+def add_synthetic_arguments(parser):
+    """Adds the synthetic data options to an endpoint's argument parser"""
+    parser.add_argument(
+        "-O",
+        "--obfuscate",
+        action="store_true",
+        help="respond with synthetic data, reading no input files",
+    )
+    parser.add_argument(
+        "--synthetic-seed", type=int, default=0, help="seed of the synthetic class"
+    )
+    parser.add_argument(
+        "--class-size", type=int, default=CLASS_SIZE, help="synthetic class size"
+    )
+    parser.add_argument(
+        "--term-days", type=day_count, default=TERM_DAYS, help="synthetic term length"
+    )
+    parser.add_argument(
+        "--test-count", type=int, default=TEST_COUNT, help="synthetic test cases"
+    )
+
+
+def synthetic_class(args):
+    """Returns the SyntheticClass requested by the parsed **args**, or None"""
+    if not args.obfuscate:
+        return None
+    return SyntheticClass(
+        args.synthetic_seed, args.class_size, args.term_days, args.test_count
+    )
+
+
+def cache_inputs(synthetic, arguments, inputs):
+    """Returns the cache key arguments and input files of an endpoint
+
+    A synthetic response depends on the class profile instead of the input files, so
+    no input file is hashed for its key.
+
+    **Returns**:
+        (list, list): The arguments and input files to pass to respond
+
+    """
+    if synthetic is None:
+        return arguments, inputs
+    return arguments + ["synthetic"] + synthetic.profile(), []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "kind", choices=["commits", "times", "visible", "hidden"], help="data to print"
+    )
+    parser.add_argument("names", nargs="*", help="students, the whole class if omitted")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "-s", "--students", type=int, default=CLASS_SIZE, help="class size"
+    )
+    parser.add_argument(
+        "-d", "--days", type=int, default=TERM_DAYS, help="term length in days"
+    )
+    parser.add_argument(
+        "-T", "--tests", type=int, default=TEST_COUNT, help="visible tests"
+    )
+
+    args = parser.parse_args()
+
+    synthetic = SyntheticClass(args.seed, args.students, args.days, args.tests)
+    names = args.names or None
+    if args.kind == "commits":
+        data = synthetic.commit_data(names)
+    elif args.kind == "times":
+        data = synthetic.commit_times(names)
+    else:
+        data = synthetic.test_scores(args.kind == "hidden", names)
+    print(json.dumps(data, default=str))
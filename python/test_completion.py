@@ -1,18 +1,28 @@
 import sys
 from helper import is_number as is_number
 from helper import eprint
+from helper import input_file
+from helper import preloadable
 
 
-def get_test_completion(test_file):
+@preloadable("test scores")
+def get_test_completion(test_file, directory=None, source="test scores"):
     """Generates test score dictionary for each student
     
     **Args**:
         **test_file** (file): A specially formatted file containing test data
+        A path to a plain, .gz, .bz2 or .xz test file is also accepted.
         The following is a sample of one of these files: ::
             
             name1;Test1:P;Test2:P;Test3:P;Test4:P;Test5:P
             name2;Test1:F;Test2:F;Test3:P;Test4:P;Test5:P
 
+        **directory** (StudentDirectory): If given, students are interned into
+        **directory** and the result is a StudentColumn indexed by their IDs.
+
+        **source** (str): The name duplicate students are reported under, so visible
+        and hidden test files can share **directory**.
+
     **Returns**:
         dict: A dictionary mapping students to their respective test data.
         The dictionary has the following format: ::
@@ -29,7 +39,8 @@ def get_test_completion(test_file):
             }
 
     """
-    students = {}
+    test_file = input_file(test_file)
+    students = directory.column(source) if directory is not None else {}
     for line in test_file:
         # Clean line for parsing
         line = line.strip("\n").strip(" ")
@@ -39,6 +50,8 @@ def get_test_completion(test_file):
         if len(words) == 0 or words == [""]:
             continue
         name = words[0]
+        if directory is not None:
+            directory.claim(name, source)
         # print(name)
         total_score = 0
         test_score = 0
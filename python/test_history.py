@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import argparse
+from bisect import bisect_right
+from itertools import islice
+from datetime import datetime
+from helper import open_input
+from response_cache import atomic_write
+from test_completion import get_test_completion as get_test_scores
+
+# Snapshots between full copies, bounding the deltas replayed for a reconstruction
+KEYFRAME_INTERVAL = 50
+
+
+def history_paths(history_dir):
+    """Returns the paths of the record log, the index and the latest snapshot"""
+    return (
+        os.path.join(history_dir, "snapshots.jsonl"),
+        os.path.join(history_dir, "index.json"),
+        os.path.join(history_dir, "latest.json"),
+    )
+
+
+def load_index(history_dir):
+    """Returns the index of **history_dir**, or an empty index for a new history
+
+    **Returns**:
+        dict: A dictionary of the following form: ::
+
+            {
+                "times": ["yyyy-mm-ddThh:mm:ss", ...],
+                "offsets": [int, ...],
+                "end": int,
+                "keyframes": [int, ...],
+                "first_pass": {
+                    "name1": {"Test1": "yyyy-mm-ddThh:mm:ss", ...},
+                    ...
+                }
+            }
+
+        where "offsets" are the byte offsets of each snapshot's record, "end" is
+        the byte offset just past the last of them and "keyframes" are the
+        numbers of the snapshots stored in full. Records past "end" were left by
+        an add that stopped before writing the index, and are not part of the
+        history.
+
+    """
+    index_path = history_paths(history_dir)[1]
+    if not os.path.exists(index_path):
+        return {
+            "times": [],
+            "offsets": [],
+            "end": 0,
+            "keyframes": [],
+            "first_pass": {},
+        }
+    with open(index_path, "r") as index_file:
+        return json.load(index_file)
+
+
+def results_of(test_data):
+    """Reduces test data from get_test_completion to ``{name: {test: result}}``"""
+    return {name: dict(test_data[name]["tests"]) for name in test_data}
+
+
+def snapshot_delta(previous, current):
+    """Finds the pass/fail changes from the **previous** to the **current** results
+
+    **Returns**:
+        (list, list): The [name, test, result] entries that are new or changed, and
+        the [name, test] entries that disappeared
+
+    """
+    changes = []
+    removed = []
+    for name in current:
+        before = previous.get(name, {})
+        for test, result in current[name].items():
+            if before.get(test) != result:
+                changes.append([name, test, result])
+    for name in previous:
+        after = current.get(name, {})
+        for test in previous[name]:
+            if test not in after:
+                removed.append([name, test])
+    return changes, removed
+
+
+def apply_delta(results, changes, removed):
+    """Applies a delta from snapshot_delta to **results**, in place"""
+    for name, test in removed:
+        del results[name][test]
+        if not results[name]:
+            del results[name]
+    for name, test, result in changes:
+        results.setdefault(name, {})[test] = result
+
+
+def add_snapshot(history_dir, test_file, time=None):
+    """Adds a test score file to the history as its newest snapshot
+
+    Only the changes since the previous snapshot are written, except every
+    KEYFRAME_INTERVAL snapshots, which are written in full. The first-pass index is
+    updated with every test a student passes for the first time.
+
+    **Args**:
+        |  **history_dir** (str): The directory holding the history
+        |  **test_file** (file): A test score file, as read by get_test_completion
+        |  **time** (str): The time of the snapshot, as yyyy-mm-ddThh:mm:ss. It
+        |      must not be earlier than the newest snapshot.
+
+    **Returns**:
+        int: The number of the new snapshot
+
+    """
+    os.makedirs(history_dir, exist_ok=True)
+    log_path, index_path, latest_path = history_paths(history_dir)
+    index = load_index(history_dir)
+    if time is None:
+        time = datetime.now().replace(microsecond=0).isoformat()
+    if index["times"] and time < index["times"][-1]:
+        raise ValueError(
+            "Snapshot at {} is older than {}".format(time, index["times"][-1])
+        )
+    previous = latest_snapshot(history_dir, index)
+    current = results_of(get_test_scores(test_file))
+
+    number = len(index["times"])
+    if number % KEYFRAME_INTERVAL == 0:
+        record = {"time": time, "keyframe": current}
+        index["keyframes"].append(number)
+    else:
+        changes, removed = snapshot_delta(previous, current)
+        record = {"time": time, "changes": changes, "removed": removed}
+    with open(log_path, "ab") as log_file:
+        # Drops any record left unindexed by an earlier add
+        log_file.truncate(index["end"])
+        offset = log_file.seek(0, os.SEEK_END)
+        log_file.write((json.dumps(record) + "\n").encode())
+        index["end"] = log_file.tell()
+
+    for name in current:
+        for test, result in current[name].items():
+            if result == "P" and test not in index["first_pass"].get(name, {}):
+                index["first_pass"].setdefault(name, {})[test] = time
+    index["times"].append(time)
+    index["offsets"].append(offset)
+    # The snapshot exists once the index is replaced. A crash before that leaves
+    # the record past the indexed end, where readers ignore it and the next add
+    # overwrites it, and the latest snapshot ahead of the index, where the next
+    # add ignores it.
+    latest = {"number": number, "results": current}
+    atomic_write(latest_path, json.dumps(latest).encode())
+    atomic_write(index_path, json.dumps(index).encode())
+    return number
+
+
+def latest_snapshot(history_dir, index):
+    """Returns the results of the newest snapshot in **index**
+
+    The copy kept by add_snapshot is used when it is of that snapshot. Otherwise,
+    like after a crash between writing it and writing the index, the snapshot is
+    reconstructed from the records.
+    """
+    number = len(index["times"]) - 1
+    if number < 0:
+        return {}
+    latest_path = history_paths(history_dir)[2]
+    if os.path.exists(latest_path):
+        with open(latest_path, "r") as latest_file:
+            latest = json.load(latest_file)
+        if latest.get("number") == number:
+            return latest["results"]
+    return snapshot_at(history_dir, number)
+
+
+def read_record(log_file, offset):
+    """Reads the record at byte **offset** of the open record log"""
+    log_file.seek(offset)
+    return json.loads(log_file.readline())
+
+
+def snapshot_number(index, time):
+    """Returns the number of the newest snapshot taken at or before **time**"""
+    number = bisect_right(index["times"], time) - 1
+    if number < 0:
+        raise KeyError("No snapshot at or before {}".format(time))
+    return number
+
+
+def snapshot_at(history_dir, number=None, time=None):
+    """Reconstructs a snapshot's results from its keyframe and the deltas after it
+
+    **Args**:
+        |  **number** (int): The number of the snapshot, or None for the newest
+        |  **time** (str): If given, the newest snapshot at or before **time** is
+        |      reconstructed instead
+
+    **Returns**:
+        dict: The results of the snapshot, as ``{name: {test: "P" or "F"}}``
+
+    """
+    index = load_index(history_dir)
+    if time is not None:
+        number = snapshot_number(index, time)
+    elif number is None:
+        number = len(index["times"]) - 1
+    if not 0 <= number < len(index["times"]):
+        raise KeyError("No snapshot number {}".format(number))
+    keyframe = index["keyframes"][bisect_right(index["keyframes"], number) - 1]
+    with open(history_paths(history_dir)[0], "rb") as log_file:
+        results = read_record(log_file, index["offsets"][keyframe])["keyframe"]
+        for _ in range(number - keyframe):
+            record = json.loads(log_file.readline())
+            apply_delta(results, record["changes"], record["removed"])
+    return results
+
+
+def as_test_completion(results):
+    """Converts reconstructed results into the data of get_test_completion"""
+    test_data = {}
+    for name in results:
+        tests = results[name]
+        passed = sum(1 for result in tests.values() if result == "P")
+        total = passed * 100 / len(tests) if tests else 0
+        test_data[name] = {"tests": tests, "total": total}
+    return test_data
+
+
+def pass_rate_series(history_dir, test=None):
+    """Computes the pass rate of a test, or of every test, at each snapshot
+
+    The rate is kept up to date through the deltas, so the records are read once
+    and no snapshot is reconstructed in full.
+
+    **Returns**:
+        list: A list of (time, passed, total) tuples, one per snapshot
+
+    """
+    series = []
+    results = {}
+    passed = 0
+    total = 0
+    count = len(load_index(history_dir)["times"])
+    with open(history_paths(history_dir)[0], "r") as log_file:
+        for line in islice(log_file, count):
+            record = json.loads(line)
+            if "keyframe" in record:
+                # Start over, adding every result of the keyframe as a change
+                keyframe = record["keyframe"]
+                changes = [
+                    [name, keyframe_test, result]
+                    for name in keyframe
+                    for keyframe_test, result in keyframe[name].items()
+                ]
+                removed = []
+                results = {}
+                passed = 0
+                total = 0
+            else:
+                changes = record["changes"]
+                removed = record["removed"]
+            for name, changed_test in removed:
+                if test is None or changed_test == test:
+                    passed -= results[name][changed_test] == "P"
+                    total -= 1
+            for name, changed_test, result in changes:
+                if test is not None and changed_test != test:
+                    continue
+                before = results.get(name, {}).get(changed_test)
+                if before is None:
+                    total += 1
+                passed += (result == "P") - (before == "P")
+            apply_delta(results, changes, removed)
+            series.append((record["time"], passed, total))
+    return series
+
+
+def first_pass_times(history_dir, test=None):
+    """Returns when each student first passed **test**, or every test, from the index
+
+    **Returns**:
+        dict: ``{name: time}`` for a single test, or ``{name: {test: time}}``
+
+    """
+    first_pass = load_index(history_dir)["first_pass"]
+    if test is None:
+        return first_pass
+    return {
+        name: first_pass[name][test] for name in first_pass if test in first_pass[name]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+    add_parser = subparsers.add_parser("add", help="add a test score snapshot")
+    add_parser.add_argument("history", help="path to history directory")
+    add_parser.add_argument("testfile", help="path to test score file")
+    add_parser.add_argument("--time", help="snapshot time (yyyy-mm-ddThh:mm:ss)")
+    snapshot_parser = subparsers.add_parser("snapshot", help="reconstruct a snapshot")
+    snapshot_parser.add_argument("history", help="path to history directory")
+    snapshot_parser.add_argument("--at", help="time (yyyy-mm-ddThh:mm:ss)")
+    series_parser = subparsers.add_parser("series", help="pass rate over time")
+    series_parser.add_argument("history", help="path to history directory")
+    series_parser.add_argument("--test", help="test name, all tests if omitted")
+    first_parser = subparsers.add_parser("first-pass", help="first pass times")
+    first_parser.add_argument("history", help="path to history directory")
+    first_parser.add_argument("--test", help="test name, all tests if omitted")
+
+    args = parser.parse_args()
+
+    if args.command == "add":
+        add_snapshot(args.history, open_input(args.testfile), args.time)
+    elif args.command == "snapshot":
+        print(json.dumps(as_test_completion(snapshot_at(args.history, time=args.at))))
+    elif args.command == "series":
+        print(
+            json.dumps(
+                [
+                    {"time": time, "passed": passed, "total": total}
+                    for time, passed, total in pass_rate_series(args.history, args.test)
+                ]
+            )
+        )
+    elif args.command == "first-pass":
+        print(json.dumps(first_pass_times(args.history, args.test)))
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -0,0 +1,284 @@
+import os
+import sys
+import json
+import pickle
+import argparse
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+from datetime import datetime
+from helper import eprint
+from helper import is_number
+from helper import numstat_words
+from merge_logs import iter_log_entries
+from class_statistics import source_key
+from response_cache import atomic_write
+
+# Session timeout of get_daily_commit_data when none is given, in hours
+DEFAULT_TIMEOUT = 24
+
+
+def parser_parameters(max_change=None, timeout=None):
+    """Converts --limit and --timeout values the way get_daily_commit_data does
+
+    **Returns**:
+        (int, float): The largest counted change and the timeout in seconds
+
+    """
+    max_change = int(max_change) if max_change else sys.maxsize
+    timeout = float(timeout) if timeout else DEFAULT_TIMEOUT
+    return max_change, timeout * 3600
+
+
+def cumulative(values, typecode):
+    """Returns the prefix sums of **values**, starting with 0"""
+    sums = array(typecode, [0])
+    total = 0
+    for value in values:
+        total += value
+        sums.append(total)
+    return sums
+
+
+def entry_days(commits):
+    """Splits a student's commits into days the way get_daily_commit_data does
+
+    A commit on the date of the commit before it adds the interval between the two
+    to the day's gaps, and a commit on any other date starts a new day.
+
+    **Args**:
+        **commits** (list): Commits yielded by merge_logs.iter_log_entries
+
+    **Returns**:
+        list: A list of [date, commit count, changes, gaps] lists, where each change
+        is an (additions, deletions) tuple and each gap is in seconds
+
+    """
+    days = []
+    previous = None
+    for commit in commits:
+        time = datetime.strptime(commit["timestamp"], "%Y-%m-%d %H:%M:%S")
+        if previous is not None and time.date() == previous.date():
+            day = days[-1]
+            day[1] += 1
+            day[3].append((time - previous).total_seconds())
+        else:
+            day = [time.date(), 1, [], []]
+            days.append(day)
+        previous = time
+        for line in commit["numstat"]:
+            words = numstat_words(line)
+            if len(words) != 3:
+                continue
+            additions = int(words[0]) if is_number(words[0]) else 0
+            deletions = int(words[1]) if is_number(words[1]) else 0
+            day[2].append((additions, deletions))
+    if not days:
+        # The parser gives students without commits a single empty day
+        days.append([datetime(1, 1, 1).date(), 0, [], []])
+    return days
+
+
+class StudentIndex:
+    """Every change size and commit gap of one student, sorted for threshold queries
+
+    A change counts under a --limit if neither its additions nor its deletions
+    exceed the limit, so changes are sorted by their larger side, and a gap counts
+    under a --timeout if it is shorter. Each day's changes and gaps are sorted
+    within the day's slice of one array per student, with prefix sums running
+    across the whole array, so a day's totals for any parameters take a binary
+    search and two subtractions. The student's changes and gaps are also kept
+    sorted as a whole, for the student's totals.
+    """
+
+    def __init__(self, days):
+        self.dates = [day[0] for day in days]
+        self.commit_counts = [day[1] for day in days]
+        self.change_offsets = array("q", [0])
+        self.gap_offsets = array("q", [0])
+        changes = []
+        gaps = []
+        for date, commit_count, day_changes, day_gaps in days:
+            changes += sorted((max(change), *change) for change in day_changes)
+            gaps += sorted(day_gaps)
+            self.change_offsets.append(len(changes))
+            self.gap_offsets.append(len(gaps))
+        self.sizes, self.additions, self.deletions = self.change_arrays(changes)
+        self.gaps = array("d", gaps)
+        self.gap_sums = cumulative(gaps, "d")
+
+        changes.sort()
+        self.all_sizes, self.all_additions, self.all_deletions = self.change_arrays(
+            changes
+        )
+        self.all_gaps = array("d", sorted(gaps))
+        self.all_gap_sums = cumulative(self.all_gaps, "d")
+
+    @staticmethod
+    def change_arrays(changes):
+        """Returns the sizes, and the prefix sums of the additions and deletions"""
+        sizes = array("q", (size for size, additions, deletions in changes))
+        additions = cumulative((change[1] for change in changes), "q")
+        deletions = cumulative((change[2] for change in changes), "q")
+        return sizes, additions, deletions
+
+    def day_totals(self, day, max_change, timeout):
+        """Returns the additions, deletions and time spent of day number **day**
+
+        **Args**:
+            |  **max_change** (int): The largest counted change
+            |  **timeout** (float): The longest counted gap, in seconds, exclusive
+
+        """
+        start = self.change_offsets[day]
+        end = bisect_right(self.sizes, max_change, start, self.change_offsets[day + 1])
+        gap_start = self.gap_offsets[day]
+        gap_end = bisect_left(self.gaps, timeout, gap_start, self.gap_offsets[day + 1])
+        return (
+            self.additions[end] - self.additions[start],
+            self.deletions[end] - self.deletions[start],
+            self.gap_sums[gap_end] - self.gap_sums[gap_start],
+        )
+
+    def totals(self, max_change, timeout):
+        """Returns the student's additions, deletions and time spent"""
+        end = bisect_right(self.all_sizes, max_change)
+        gap_end = bisect_left(self.all_gaps, timeout)
+        return (
+            self.all_additions[end],
+            self.all_deletions[end],
+            self.all_gap_sums[gap_end],
+        )
+
+
+class ThresholdIndex:
+    """Answers get_daily_commit_data totals for any --limit and --timeout
+
+    The commit log is parsed once, keeping every change size and commit gap
+    instead of totals for a single limit and timeout. Totals for any parameters
+    then take a binary search per student or per day, without reparsing.
+    The daily data has no "files", since the top files depend on every change.
+
+    A student with several entries in the log keeps only the last, like the parser.
+    """
+
+    def __init__(self):
+        self.students = {}
+
+    def add_log(self, progress_file):
+        """Indexes every student entry of a commit log file or path"""
+        for name, commits in iter_log_entries(progress_file):
+            self.students[name] = StudentIndex(entry_days(commits))
+
+    def daily_data(self, name, max_change=None, timeout=None):
+        """Returns a student's days, as get_daily_commit_data would with these
+        parameters, without the "files" of each day
+        """
+        student = self.students[name]
+        max_change, timeout = parser_parameters(max_change, timeout)
+        days = []
+        for day, date in enumerate(student.dates):
+            additions, deletions, time_spent = student.day_totals(
+                day, max_change, timeout
+            )
+            days.append(
+                {
+                    "date": date,
+                    "time_spent": time_spent,
+                    "additions": additions,
+                    "deletions": deletions,
+                    "commit_count": student.commit_counts[day],
+                }
+            )
+        return days
+
+    def statistics(self, max_change=None, timeout=None):
+        """Returns the totals of get_statistics.sum_statistics for these parameters"""
+        max_change, timeout = parser_parameters(max_change, timeout)
+        data = {}
+        for name, student in self.students.items():
+            additions, deletions, time_spent = student.totals(max_change, timeout)
+            data[name] = {
+                "additions": additions,
+                "deletions": deletions,
+                "commit_count": sum(student.commit_counts),
+                "time_spent": time_spent,
+            }
+        return data
+
+    def sweep(self, max_changes=(), timeouts=()):
+        """Computes every student's totals for many limits and timeouts at once
+
+        **Args**:
+            |  **max_changes** (list): The --limit values to sweep
+            |  **timeouts** (list): The --timeout values to sweep, in hours
+
+        **Returns**:
+            dict: A dictionary of the following form: ::
+
+                {
+                    "name1": {
+                        "additions": [int, ...],
+                        "deletions": [int, ...],
+                        "time_spent": [float (seconds), ...]
+                    },
+                    ...
+                }
+
+            with additions and deletions per limit and time spent per timeout
+
+        """
+        limits = [parser_parameters(max_change)[0] for max_change in max_changes]
+        seconds = [parser_parameters(None, timeout)[1] for timeout in timeouts]
+        data = {}
+        for name, student in self.students.items():
+            ends = [bisect_right(student.all_sizes, limit) for limit in limits]
+            gap_ends = [bisect_left(student.all_gaps, timeout) for timeout in seconds]
+            data[name] = {
+                "additions": [student.all_additions[end] for end in ends],
+                "deletions": [student.all_deletions[end] for end in ends],
+                "time_spent": [student.all_gap_sums[end] for end in gap_ends],
+            }
+        return data
+
+
+def cached_index(index_path, log_path):
+    """Returns the index of **log_path**, building it unless **index_path** has it
+
+    The index is stored with the size and modification time of the log, and is
+    rebuilt once the log changes.
+    """
+    key = source_key([log_path])
+    if index_path and os.path.exists(index_path):
+        with open(index_path, "rb") as index_file:
+            try:
+                cached = pickle.load(index_file)
+            except (pickle.UnpicklingError, EOFError):
+                cached = {}
+        if cached.get("key") == key:
+            return cached["index"]
+    index = ThresholdIndex()
+    index.add_log(log_path)
+    if index_path:
+        atomic_write(
+            os.path.abspath(index_path), pickle.dumps({"key": key, "index": index})
+        )
+        eprint("Indexed {} students".format(len(index.students)))
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logfile", help="path to commit log file")
+    parser.add_argument("-i", "--index", help="path to index file")
+    parser.add_argument(
+        "-l", "--limits", type=int, nargs="*", default=[], help="limits to sweep"
+    )
+    parser.add_argument(
+        "-t", "--timeouts", type=float, nargs="*", default=[], help="timeouts to sweep"
+    )
+
+    args = parser.parse_args()
+
+    index = cached_index(args.index, args.logfile)
+    print(json.dumps(index.sweep(args.limits, args.timeouts)))